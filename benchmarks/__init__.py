@@ -0,0 +1 @@
+"""Benchmarks for the inventory_manager package."""
\ No newline at end of file
@@ -0,0 +1,75 @@
+'''
+Benchmark of ColumnarInventory against find_sample for analytics queries
+over many samples, i.e., all minipreps of secondary cultures in minus80
+w/ clone other than '1' (requires NumPy)
+
+Usage (from the project directory):
+    python -m benchmarks.bench_columnar [number of samples]
+'''
+import sys
+import time
+
+from inventory_manager_py import Concentration, Culture, Prefix
+from inventory_manager_py.columnar import ColumnarInventory, AnyOf, Not
+from inventory_manager_py.inventory_manager import InventoryManager
+
+from .synthetic import make_inventory
+
+
+def best_of(func, repeat=5):
+    '''
+    Fastest of repeat calls in seconds
+    '''
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    num_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    im = InventoryManager()
+    inventory = make_inventory(num_samples)
+    start = time.perf_counter()
+    columnar = ColumnarInventory(inventory)
+    print(f'{num_samples} samples, columns built in {time.perf_counter() - start:.2f} s')
+
+    def filtered(query, location=None, not_clone=None, cultures=None):
+        # find_sample can't check box location, Not or AnyOf, the rest is checked in Python
+        def keep(loc):
+            box = inventory.boxes.get(loc.boxname)
+            sample = box.samples[loc.row][loc.col]
+            return ((location is None or box.location == location)
+                    and (not_clone is None or sample.clone != not_clone)
+                    and (cultures is None or sample.culture in cultures))
+        return [loc for loc in im.find_sample(query, inventory) if keep(loc)]
+
+    cases = [
+        ('miniprep, secondary, minus80, clone != 1',
+         lambda: filtered({'concentration': Concentration.miniprep, 'culture': Culture.secondary},
+                          'minus80', '1'),
+         {'concentration': Concentration.miniprep, 'culture': Culture.secondary,
+          'location': 'minus80', 'clone': Not('1')}),
+        ('culture primary or secondary, clone != 1',
+         lambda: filtered({}, None, '1', (Culture.primary, Culture.secondary)),
+         {'culture': AnyOf([Culture.primary, Culture.secondary]), 'clone': Not('1')}),
+        ('label prefix s1',
+         lambda: im.find_sample({'label': Prefix('s1')}, inventory),
+         {'label': Prefix('s1')}),
+        ('construct pTarg7',
+         lambda: im.find_sample({'construct': 'pTarg7'}, inventory),
+         {'construct': 'pTarg7'}),
+    ]
+    print(f'{"query":>42} {"matches":>8} {"find_sample":>12} {"columnar":>10} {"count":>10}')
+    for name, find, query in cases:
+        expected = find()
+        assert set(expected) == set(columnar.find_sample(query))
+        print(f'{name:>42} {len(expected):8d} {best_of(find) * 1000:10.2f}ms '
+              f'{best_of(lambda: columnar.find_sample(query)) * 1000:8.2f}ms '
+              f'{best_of(lambda: columnar.count(query)) * 1000:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''
+Benchmark of cold start: building an Inventory from a directory of box TSVs,
+using InventoryManager.load_inventory vs. tsv_to_box + add_box per file
+
+Usage (from the project directory):
+    python -m benchmarks.bench_load_inventory [num_boxes]
+'''
+import os
+import sys
+import tempfile
+import time
+
+from inventory_manager_py import Concentration, Culture, Inventory, Sample
+from inventory_manager_py.inventory_manager import InventoryManager
+
+
+def make_box_files(directory, num_boxes):
+    '''
+    Write num_boxes full 8x12 boxes as TSVs into directory
+    '''
+    im = InventoryManager()
+    cultures = [None, Culture.primary, Culture.secondary]
+    for b in range(num_boxes):
+        box = im.make_empty_box(f'box{b}', 'benchmark box', f'minus{20 + 60 * (b % 2)}', (8, 12))
+        for i in range(8):
+            for j in range(12):
+                box.samples[i][j] = Sample(f'l{b}_{i}_{j}', f'side {b} {i} {j}', Concentration.miniprep,
+                                           f'pTarg{(b * 96 + i * 12 + j) % 5000}', cultures[j % 3], str(j % 4))
+        im.box_to_tsv(box, os.path.join(directory, f'{box.name}.tsv'))
+
+
+def one_at_a_time(directory):
+    '''
+    Previous way of building an inventory: parse and add each box in turn
+    '''
+    im = InventoryManager()
+    inventory = Inventory([], {}, {}, {}, {})
+    for name in sorted(os.listdir(directory)):
+        inventory = im.add_box(im.tsv_to_box(os.path.join(directory, name)), inventory)
+    return inventory
+
+
+def main():
+    num_boxes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    im = InventoryManager()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        make_box_files(tmpdir, num_boxes)
+        print(f'{num_boxes} boxes, {num_boxes * 96} samples, {os.cpu_count()} CPUs')
+
+        runs = {'add_box per file': lambda: one_at_a_time(tmpdir),
+                'load_inventory (1 process)': lambda: im.load_inventory(tmpdir, max_workers=1),
+                'load_inventory (pool)': lambda: im.load_inventory(tmpdir)}
+        for name, run in runs.items():
+            start = time.perf_counter()
+            inventory = run()
+            seconds = time.perf_counter() - start
+            assert len(inventory.loc_to_conc) == num_boxes * 96
+            print(f'{name:>28}: {seconds:7.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+Memory per sample of the Sample and Location objects of an inventory:
+slotted classes w/ interned strings (current) vs. the previous unslotted
+dataclasses, where every value read from a file was a separate string
+
+Usage (from the project directory):
+    python -m benchmarks.bench_memory [num_tubes]
+'''
+from dataclasses import dataclass
+import gc
+import sys
+import tracemalloc
+
+from inventory_manager_py import Concentration, Culture, Location, Sample
+
+
+@dataclass(frozen=True)
+class LegacySample:
+    label: str
+    sidelabel: str
+    concentration: Concentration
+    construct: str
+    culture: Culture = None
+    clone: str = '0'
+
+
+@dataclass(frozen=True)
+class LegacyLocation:
+    boxname: str
+    row: int
+    col: int
+    label: str
+    sidelabel: str
+
+
+def make_tubes(num_tubes, sample_cls, location_cls, intern):
+    '''
+    (Sample, Location) for num_tubes tubes in 8x12 boxes, strings are made
+    one by one as a file parser would
+    '''
+    text = sys.intern if intern else str
+    concs = list(Concentration)
+    cultures = [None, Culture.primary, Culture.secondary]
+    tubes = []
+    for n in range(num_tubes):
+        ibox, well = divmod(n, 96)
+        row, col = divmod(well, 12)
+        # box name is read once per box, the other values once per tube
+        if well == 0:
+            boxname = text(f'box{ibox}')
+        sample = sample_cls(text(f'l{n}'), text(f'pcr primer {n % 20000}'), concs[n % len(concs)],
+                            text(f'pTarg{n % 5000}'), cultures[n % 3], text(f'{n % 4}'))
+        location = location_cls(boxname, row, col, sample.label, sample.sidelabel)
+        tubes.append((sample, location))
+    return tubes
+
+
+def measure(num_tubes, sample_cls, location_cls, intern):
+    '''
+    Bytes per tube held by the Samples, Locations and their strings
+    '''
+    gc.collect()
+    tracemalloc.start()
+    tubes = make_tubes(num_tubes, sample_cls, location_cls, intern)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tubes
+    return size / num_tubes
+
+
+def main():
+    num_tubes = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+
+    legacy = measure(num_tubes, LegacySample, LegacyLocation, intern=False)
+    slotted = measure(num_tubes, Sample, Location, intern=False)
+    current = measure(num_tubes, Sample, Location, intern=True)
+
+    print(f'{num_tubes} tubes, bytes per tube (Sample + Location + strings)')
+    print(f'{"unslotted (before)":>28}: {legacy:6.0f}')
+    print(f'{"slotted":>28}: {slotted:6.0f}')
+    print(f'{"slotted + interned (after)":>28}: {current:6.0f}')
+    print(f'saved: {legacy - current:.0f} bytes per tube, '
+          f'{(legacy - current) * num_tubes / 1e6:.0f} MB in total ({1 - current / legacy:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+'''
+Stress benchmark of SharedInventory: many threads adding and removing
+samples while others run find_sample, compared w/ one lock held around
+every change (the simple way to share an inventory between threads)
+
+Usage (from the project directory):
+    python -m benchmarks.bench_shared_inventory [seconds per run]
+'''
+import sys
+import threading
+import time
+
+from inventory_manager_py import Concentration, Inventory, Sample
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.shared_inventory import SharedInventory
+
+NUM_BOXES = 100
+
+
+class LockedInventory:
+    '''
+    Baseline: current version behind one lock, held by writers and readers
+    '''
+    def __init__(self, inventory, manager):
+        self.manager = manager
+        self.current = inventory
+        self.conflicts = 0
+        self._lock = threading.Lock()
+
+    def update(self, change):
+        with self._lock:
+            self.current = change(self.current)
+            return self.current
+
+    def find_sample(self, query):
+        with self._lock:
+            return self.manager.find_sample(query, self.current)
+
+
+def make_inventory(im):
+    '''
+    Inventory of NUM_BOXES 8x12 boxes, half full
+    '''
+    boxes = []
+    for b in range(NUM_BOXES):
+        box = im.make_empty_box(f'box{b}', 'benchmark box', 'minus20', (8, 12))
+        for i in range(0, 8, 2):
+            for j in range(12):
+                box.samples[i][j] = Sample(f'l{b}_{i}_{j}', f'side {b} {i} {j}', Concentration.uM10,
+                                           f'construct{j}', None, str(i))
+        boxes.append(box)
+    return im._build_inventory(boxes)
+
+
+def run(shared, num_writers, num_readers, seconds):
+    '''
+    Run writers (add then remove a sample in their own box) and readers
+    (find_sample) for a number of seconds
+
+    Return:
+    int, int: Number of changes and of queries made
+    '''
+    im = shared.manager
+    stop = threading.Event()
+    counts = [0] * (num_writers + num_readers)
+
+    def write(n):
+        boxname = f'box{n % NUM_BOXES}'
+        sample = Sample(f'w{n}', f'writer {n}', Concentration.uM100, 'written', None, '1')
+        col = 0
+        while not stop.is_set():
+            position = (1 + 2 * (n // NUM_BOXES % 4), col)
+            shared.update(lambda inventory: im.add_sample(sample, position, boxname, inventory))
+            shared.update(lambda inventory: im.remove_sample(position, boxname, inventory))
+            col = (col + 1) % 12
+            counts[n] += 2
+
+    def read(n):
+        while not stop.is_set():
+            shared.find_sample({'construct': f'construct{counts[n] % 12}', 'clone': '2'})
+            counts[n] += 1
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(num_writers)]
+    threads += [threading.Thread(target=read, args=(num_writers + n,)) for n in range(num_readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(counts[:num_writers]), sum(counts[num_writers:])
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    im = InventoryManager()
+    inventory = make_inventory(im)
+    print(f'{NUM_BOXES} boxes, {len(inventory.loc_to_conc)} samples, {seconds:.1f} s per run')
+    print(f'{"":>18} {"writers":>7} {"readers":>7} {"changes/s":>10} {"queries/s":>10} {"conflicts":>9}')
+
+    for num_writers, num_readers in [(1, 0), (4, 0), (16, 0), (4, 4), (16, 16)]:
+        for name, shared in [('one lock', LockedInventory(inventory, im)),
+                             ('SharedInventory', SharedInventory(inventory, im))]:
+            changes, queries = run(shared, num_writers, num_readers, seconds)
+            # every sample that was added was removed again
+            assert len(shared.current.loc_to_conc) == len(inventory.loc_to_conc)
+            print(f'{name:>18} {num_writers:7d} {num_readers:7d} {changes / seconds:10.0f} '
+                  f'{queries / seconds:10.0f} {shared.conflicts:9d}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+'''
+Benchmark of the binary snapshot (save_snapshot/load_snapshot) against the
+TSV file per box (export_inventory/load_inventory)
+
+Usage (from the project directory):
+    python -m benchmarks.bench_snapshot [num_boxes]
+'''
+import os
+import sys
+import tempfile
+import time
+
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.snapshot import read_snapshot
+
+from .bench_load_inventory import make_box_files
+
+
+def timed(func):
+    '''
+    Result of func() and the time (s) it took
+    '''
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    num_boxes = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    im = InventoryManager()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source_dir = os.path.join(tmpdir, 'source')
+        tsv_dir = os.path.join(tmpdir, 'tsv')
+        snapshot_path = os.path.join(tmpdir, 'inventory.snapshot')
+        indexed_path = os.path.join(tmpdir, 'indexed.snapshot')
+        os.mkdir(source_dir)
+        make_box_files(source_dir, num_boxes)
+        inventory = im.load_inventory(source_dir, max_workers=1)
+        print(f'{num_boxes} boxes, {len(inventory.loc_to_conc)} samples')
+
+        # save
+        _, tsv_save = timed(lambda: im.export_inventory(inventory, tsv_dir, max_workers=1))
+        _, snapshot_save = timed(lambda: im.save_snapshot(inventory, snapshot_path))
+        tsv_size = sum(os.path.getsize(os.path.join(tsv_dir, name)) for name in os.listdir(tsv_dir))
+        snapshot_size = os.path.getsize(snapshot_path)
+        _, indexed_save = timed(lambda: im.save_snapshot(inventory, indexed_path, search_indexes=True))
+        indexed_size = os.path.getsize(indexed_path)
+
+        # reading the boxes only
+        filepaths = [os.path.join(tsv_dir, name) for name in os.listdir(tsv_dir) if name.endswith('.tsv')]
+        _, tsv_read = timed(lambda: [im.tsv_to_box(filepath) for filepath in filepaths])
+        def read_boxes():
+            with open(snapshot_path, 'rb') as file:
+                return read_snapshot(file.read())
+        _, snapshot_read = timed(read_boxes)
+
+        # whole inventory, boxes + indexes
+        from_tsv, tsv_load = timed(lambda: im.load_inventory(tsv_dir, max_workers=1))
+        from_snapshot, snapshot_load = timed(lambda: im.load_snapshot(snapshot_path))
+        assert from_tsv == inventory and from_snapshot == inventory
+
+        # query-only use: open snapshot w/ search indexes in place vs load it
+        view, open_time = timed(lambda: im.open_snapshot(indexed_path))
+        label = next(iter(inventory.label_to_locations))
+        _, inventory_query = timed(lambda: [im.find_sample({'label': label}, from_snapshot) for i in range(1000)])
+        _, view_query = timed(lambda: [im.find_sample({'label': label}, view) for i in range(1000)])
+        print(f'open_snapshot {open_time * 1000:.2f} ms (load_snapshot {snapshot_load:.2f} s), '
+              f'find_sample by label: inventory {inventory_query * 1000:.1f} us, '
+              f'opened snapshot {view_query * 1000:.1f} us')
+        print(f'snapshot w/ search indexes: save {indexed_save:.3f} s, {indexed_size / 1e6:.3f} MB')
+        view.close()
+
+        rows = [('save', tsv_save, snapshot_save, 's'),
+                ('read boxes', tsv_read, snapshot_read, 's'),
+                ('load inventory', tsv_load, snapshot_load, 's'),
+                ('size', tsv_size / 1e6, snapshot_size / 1e6, 'MB')]
+        print(f'{"":>16} {"TSV files":>10} {"snapshot":>10} {"ratio":>7}')
+        for name, tsv, snapshot, unit in rows:
+            print(f'{name:>16} {tsv:8.3f}{unit:>2} {snapshot:8.3f}{unit:>2} {tsv / snapshot:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
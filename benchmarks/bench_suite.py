@@ -0,0 +1,294 @@
+'''
+Benchmark suite for the hot paths of InventoryManager at different
+inventory sizes: latency percentiles and peak memory of each operation,
+saved as JSON and compared against an earlier run to catch regressions
+
+Usage (from the project directory):
+    python -m benchmarks.bench_suite                                  # 10^3, 10^4, 10^5 samples
+    python -m benchmarks.bench_suite --sizes 1000000 --ops find_sample
+    python -m benchmarks.bench_suite --output baseline.json           # save a baseline
+    python -m benchmarks.bench_suite --compare baseline.json          # exit status 1 if slower
+
+Each operation is run on the inventory returned by the previous call, as
+an application would, so the inventory keeps about the same size.
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from inventory_manager_py import Concentration, Culture, Glob, Prefix, Sample
+from inventory_manager_py.inventory_manager import InventoryManager
+
+from .synthetic import make_boxes
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# calls w/ tracemalloc on, per operation
+MEMORY_CALLS = 5
+
+
+class Context:
+    '''
+    Current inventory and what the operations need to pick their arguments
+    '''
+    def __init__(self, im, inventory, tmpdir, seed=0):
+        self.im = im
+        self.inventory = inventory
+        self.tmpdir = tmpdir
+        self.rng = random.Random(seed)
+        self.boxnames = sorted(inventory.boxes.names())
+        self.counter = 0
+        # free wells of some boxes to add to
+        self.free = []
+        for boxname in self.rng.sample(self.boxnames, min(200, len(self.boxnames))):
+            self.free.extend((boxname, position) for position in inventory.boxes.get(boxname).free_wells())
+        self.rng.shuffle(self.free)
+        self.tsv_files = []
+
+    def next_name(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+
+# operations: function(ctx) -> function to time, arguments are picked outside the timing
+
+def add_sample(ctx):
+    boxname, position = ctx.free[ctx.counter % len(ctx.free)]
+    sample = Sample(ctx.next_name('new'), 'added sample', Concentration.uM10, 'pNew', None, '1')
+    def call():
+        ctx.inventory = ctx.im.add_sample(sample, position, boxname, ctx.inventory)
+        ctx.after = lambda: setattr(ctx, 'inventory', ctx.im.remove_sample(position, boxname, ctx.inventory))
+    return call
+
+
+def remove_sample(ctx):
+    # remove a sample that is there, then put it back untimed
+    while True:
+        boxname = ctx.rng.choice(ctx.boxnames)
+        box = ctx.inventory.boxes.get(boxname)
+        if box.get_num_samples():
+            break
+    position, sample = next(box.iter_samples())
+    def call():
+        ctx.inventory = ctx.im.remove_sample(position, boxname, ctx.inventory)
+        ctx.after = lambda: setattr(ctx, 'inventory', ctx.im.add_sample(sample, position, boxname, ctx.inventory))
+    return call
+
+
+def add_box(ctx):
+    box = ctx.im.make_empty_box(ctx.next_name('added'), 'added box', 'minus20', (8, 12))
+    for i in range(8):
+        for j in range(12):
+            box.samples[i][j] = Sample(f'{box.name}_{i}_{j}', 'added', Concentration.miniprep, 'pAdded', Culture.primary, '1')
+    def call():
+        ctx.inventory = ctx.im.add_box(box, ctx.inventory)
+        ctx.after = lambda: setattr(ctx, 'inventory', ctx.im.remove_box(box.name, ctx.inventory))
+    return call
+
+
+def remove_box(ctx):
+    boxname = ctx.rng.choice(ctx.boxnames)
+    box = ctx.inventory.boxes.get(boxname)
+    def call():
+        ctx.inventory = ctx.im.remove_box(boxname, ctx.inventory)
+        ctx.after = lambda: setattr(ctx, 'inventory', ctx.im.add_box(box, ctx.inventory))
+    return call
+
+
+def update_box(ctx):
+    boxname = ctx.rng.choice(ctx.boxnames)
+    updates = {'description': ctx.next_name('description ')}
+    def call():
+        ctx.inventory = ctx.im.update_box(boxname, updates, ctx.inventory)
+    return call
+
+
+def rename_box(ctx):
+    i = ctx.rng.randrange(len(ctx.boxnames))
+    boxname = ctx.boxnames[i]
+    new_name = ctx.next_name('renamed')
+    def call():
+        ctx.inventory = ctx.im.update_box(boxname, {'name': new_name}, ctx.inventory)
+        ctx.boxnames[i] = new_name
+    return call
+
+
+QUERIES = [{'construct': 'pTarg1'},
+           {'construct': 'pTarg2', 'clone': '1'},
+           {'concentration': Concentration.gene, 'culture': Culture.tertiary},
+           {'label': Prefix('s123')},
+           {'sidelabel': Glob('pTarg3 c*')}]
+
+
+def find_sample(ctx):
+    query = QUERIES[ctx.counter % len(QUERIES)]
+    ctx.counter += 1
+    def call():
+        ctx.im.find_sample(query, ctx.inventory)
+    return call
+
+
+def box_to_tsv(ctx):
+    box = ctx.inventory.boxes.get(ctx.rng.choice(ctx.boxnames))
+    filepath = os.path.join(ctx.tmpdir, f'{ctx.next_name("box")}.tsv')
+    ctx.tsv_files.append(filepath)
+    def call():
+        ctx.im.box_to_tsv(box, filepath)
+    return call
+
+
+def tsv_to_box(ctx):
+    if not ctx.tsv_files:
+        box_to_tsv(ctx)()
+    filepath = ctx.rng.choice(ctx.tsv_files)
+    def call():
+        ctx.im.tsv_to_box(filepath)
+    return call
+
+
+OPERATIONS = {op.__name__: op for op in [add_sample, remove_sample, add_box, remove_box, update_box,
+                                         rename_box, find_sample, box_to_tsv, tsv_to_box]}
+
+
+def percentile(sorted_values, fraction):
+    '''
+    Nearest-rank percentile of sorted values
+    '''
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_op(ctx, op, iterations, seconds, memory):
+    '''
+    Time iterations calls of op (fewer if they take more than seconds)
+
+    Return:
+    dict: Number of calls, mean/p50/p90/p99/max latency in microseconds, peak memory in KB
+    '''
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    for i in range(iterations):
+        ctx.after = None
+        call = op(ctx)
+        start = time.perf_counter_ns()
+        call()
+        latencies.append((time.perf_counter_ns() - start) / 1000)
+        # undo change untimed, so the inventory keeps its size
+        if ctx.after:
+            ctx.after()
+        if time.perf_counter() > deadline and i >= 4:
+            break
+    latencies.sort()
+    result = {'n': len(latencies),
+              'mean_us': sum(latencies) / len(latencies),
+              'p50_us': percentile(latencies, 0.50),
+              'p90_us': percentile(latencies, 0.90),
+              'p99_us': percentile(latencies, 0.99),
+              'max_us': latencies[-1]}
+
+    if memory:
+        # memory allocated by a call on top of what was there before it, traced
+        # apart from the timed calls as tracing slows them down a lot
+        tracemalloc.start()
+        peak = 0
+        for i in range(MEMORY_CALLS):
+            ctx.after = None
+            call = op(ctx)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+            if ctx.after:
+                ctx.after()
+        tracemalloc.stop()
+        result['peak_kb'] = peak / 1024
+    return result
+
+
+def run_size(num_samples, ops, iterations, seconds, memory):
+    '''
+    Build an inventory of num_samples samples and run the operations on it
+    '''
+    im = InventoryManager()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    inventory = im._build_inventory(make_boxes(num_samples))
+    result = {'build_s': time.perf_counter() - start, 'ops': {}}
+    if memory:
+        # build time is w/ tracing on
+        result['inventory_mb'] = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        ctx = Context(im, inventory, tmpdir)
+        for name in ops:
+            result['ops'][name] = run_op(ctx, OPERATIONS[name], iterations, seconds, memory)
+    return result
+
+
+def compare(results, baseline, threshold):
+    '''
+    Print p50 latency against a baseline, returns number of operations
+    slower than threshold times the baseline
+    '''
+    slower = 0
+    print(f'\n{"samples":>9} {"operation":>14} {"baseline p50":>13} {"p50":>10} {"ratio":>7}')
+    for size, result in results['sizes'].items():
+        old_result = baseline['sizes'].get(size)
+        if old_result is None:
+            continue
+        for name, stats in result['ops'].items():
+            old_stats = old_result['ops'].get(name)
+            if old_stats is None:
+                continue
+            ratio = stats['p50_us'] / old_stats['p50_us'] if old_stats['p50_us'] else float('inf')
+            flag = '  SLOWER' if ratio > threshold else ''
+            slower += ratio > threshold
+            print(f'{size:>9} {name:>14} {old_stats["p50_us"]:11.1f}us {stats["p50_us"]:8.1f}us {ratio:6.2f}x{flag}')
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark InventoryManager operations')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='numbers of samples')
+    parser.add_argument('--ops', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument('--iterations', type=int, default=200, help='calls per operation')
+    parser.add_argument('--seconds', type=float, default=2.0, help='time limit per operation')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc (faster builds)')
+    parser.add_argument('--output', help='save results as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.25, help='ratio to baseline counted as slower')
+    args = parser.parse_args()
+
+    results = {'meta': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'iterations': args.iterations, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+               'sizes': {}}
+    for num_samples in args.sizes:
+        result = run_size(num_samples, args.ops, args.iterations, args.seconds, not args.no_memory)
+        results['sizes'][str(num_samples)] = result
+        memory = f', {result["inventory_mb"]:.1f} MB' if 'inventory_mb' in result else ''
+        print(f'\n{num_samples} samples (built in {result["build_s"]:.1f} s{memory})')
+        print(f'{"operation":>14} {"n":>5} {"p50":>9} {"p90":>9} {"p99":>9} {"max":>9} {"peak":>9}')
+        for name, stats in result['ops'].items():
+            peak = f'{stats["peak_kb"]:7.0f}KB' if 'peak_kb' in stats else ''
+            print(f'{name:>14} {stats["n"]:5d} {stats["p50_us"]:7.0f}us {stats["p90_us"]:7.0f}us '
+                  f'{stats["p99_us"]:7.0f}us {stats["max_us"]:7.0f}us {peak:>9}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
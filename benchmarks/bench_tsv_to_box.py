@@ -0,0 +1,123 @@
+'''
+Benchmark of InventoryManager.tsv_to_box against the previous implementation,
+which read the whole file into a list and built two grids (dicts, then Samples)
+
+Usage (from the project directory):
+    python -m benchmarks.bench_tsv_to_box [num_rows] [num_cols]
+'''
+import csv
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from inventory_manager_py import Box, Concentration, Sample
+from inventory_manager_py.inventory_manager import InventoryManager
+
+
+def legacy_tsv_to_box(filepath):
+    '''
+    Previous tsv_to_box: whole file in memory, regex compiled per row,
+    grid of dicts followed by a second grid of Samples
+    '''
+    def calc_row_num(row_label):
+        result = 0
+        for char in row_label:
+            result = result * 26 + (ord(char) - ord('A') + 1)
+        return result - 1
+
+    def is_valid_row_label(row_label):
+        pattern = re.compile(r'^[A-Z]+$')
+        return bool(pattern.match(row_label))
+
+    with open(filepath, 'r', newline='', encoding='utf-8') as file:
+        tsv_data = list(csv.reader(file, delimiter='\t'))
+
+    box_dict = {}
+    samples = []
+    num_col = None
+    curr_attr = None
+    for row in tsv_data:
+        if not any(row):
+            continue
+        if row[0][0] == '>' and row[0][1] != '>':
+            box_dict[row[0][1:]] = row[1]
+        if row[0][0:2] == '>>':
+            if num_col == None:
+                num_col = len(row)
+            curr_attr = row[0][2:]
+        if is_valid_row_label(row[0]):
+            irow = calc_row_num(str(row[0]))
+            if irow == len(samples):
+                samples.append([{} for i in range(num_col - 1)])
+            for icol, sample in enumerate(row[1:]):
+                if sample:
+                    samples[irow][icol][curr_attr] = sample
+
+    final_samples = []
+    for irow, row in enumerate(samples):
+        final_samples.append([])
+        for sample in row:
+            if len(sample) > 0:
+                if 'concentration' in sample:
+                    sample['concentration'] = Concentration[sample['concentration']]
+                sample = Sample(**sample)
+            else:
+                sample = None
+            final_samples[irow].append(sample)
+    box_dict['samples'] = final_samples
+    return Box(**box_dict)
+
+
+def make_tsv(filepath, num_rows, num_cols):
+    '''
+    Write TSV of a box w/ every other well filled
+    '''
+    im = InventoryManager()
+    box = im.make_empty_box('bench', 'benchmark box', 'minus20', (num_rows, num_cols))
+    for i in range(num_rows):
+        for j in range(i % 2, num_cols, 2):
+            box.samples[i][j] = Sample(f'l{i}_{j}', f'side {i} {j}', Concentration.uM10,
+                                       f'construct{j}', None, str(i % 3))
+    im.box_to_tsv(box, filepath)
+
+
+def measure(func, filepath, repeats):
+    '''
+    Best time (s) and peak traced memory (bytes) of func(filepath)
+    '''
+    best = float('inf')
+    for i in range(repeats):
+        start = time.perf_counter()
+        func(filepath)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(filepath)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    num_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    im = InventoryManager()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filepath = os.path.join(tmpdir, 'bench.tsv')
+        make_tsv(filepath, num_rows, num_cols)
+        # both parsers must give the same box
+        assert im.tsv_to_box(filepath) == legacy_tsv_to_box(filepath)
+
+        print(f'box {num_rows}x{num_cols}, file {os.path.getsize(filepath) / 1e6:.1f} MB')
+        results = {'legacy': measure(legacy_tsv_to_box, filepath, 3),
+                   'streaming': measure(im.tsv_to_box, filepath, 3)}
+        for name, (seconds, peak) in results.items():
+            print(f'{name:>10}: {seconds * 1000:8.1f} ms  peak {peak / 1e6:6.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
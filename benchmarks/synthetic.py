@@ -0,0 +1,67 @@
+'''
+Synthetic inventories for benchmarks: boxes of a given size filled to a
+given fraction, w/ a chosen number of distinct constructs and a realistic
+mix of concentrations and cultures
+'''
+import random
+
+from inventory_manager_py import Box, Concentration, Culture, Sample
+from inventory_manager_py.inventory_manager import InventoryManager
+
+# share of each concentration among samples (minipreps and oligos are most common)
+CONCENTRATION_MIX = {Concentration.miniprep: 30, Concentration.uM10: 25, Concentration.uM100: 15,
+                     Concentration.zymo: 10, Concentration.uM266: 8, Concentration.dil20x: 7,
+                     Concentration.gene: 5}
+# share of each culture, most samples are not cultures
+CULTURE_MIX = {None: 70, Culture.primary: 15, Culture.secondary: 8, Culture.library: 5, Culture.tertiary: 2}
+# freezers boxes are spread over
+LOCATIONS = ['minus20', 'minus80', 'fridge']
+
+
+def make_boxes(num_samples: int, box_size=(8, 12), fill: float = 0.75, num_constructs: int = None,
+               num_clones: int = 5, seed: int = 0):
+    '''
+    Boxes holding num_samples samples
+
+    Args:
+    num_samples (int): Number of samples over all boxes
+    box_size (tuple[int, int]): Rows and columns of each box
+    fill (float): Fraction of wells of each box holding a sample (the last box can hold fewer)
+    num_constructs (int): Number of distinct constructs (default num_samples / 20)
+    num_clones (int): Number of distinct clones
+    seed (int): Seed of the random choices, same seed gives the same boxes
+
+    Return:
+    List[Box]: Boxes named box000000, box000001, ...
+    '''
+    rng = random.Random(seed)
+    num_row, num_col = box_size
+    per_box = max(1, int(num_row * num_col * fill))
+    if num_constructs is None:
+        num_constructs = max(1, num_samples // 20)
+    constructs = [f'pTarg{i}' for i in range(num_constructs)]
+    clones = [str(i + 1) for i in range(num_clones)]
+    concentrations = rng.choices(list(CONCENTRATION_MIX), weights=list(CONCENTRATION_MIX.values()), k=num_samples)
+    cultures = rng.choices(list(CULTURE_MIX), weights=list(CULTURE_MIX.values()), k=num_samples)
+
+    boxes = []
+    made = 0
+    while made < num_samples:
+        b = len(boxes)
+        grid = [[None] * num_col for i in range(num_row)]
+        wells = rng.sample(range(num_row * num_col), min(per_box, num_samples - made))
+        for well in sorted(wells):
+            construct = rng.choice(constructs)
+            grid[well // num_col][well % num_col] = Sample(
+                f's{made}', f'{construct} c{made % 7}', concentrations[made], construct,
+                cultures[made], rng.choice(clones))
+            made += 1
+        boxes.append(Box(f'box{b:06d}', f'synthetic box {b}', LOCATIONS[b % len(LOCATIONS)], grid))
+    return boxes
+
+
+def make_inventory(num_samples: int, **kwargs):
+    '''
+    Indexed Inventory of the boxes from make_boxes (same arguments)
+    '''
+    return InventoryManager()._build_inventory(make_boxes(num_samples, **kwargs))
@@ -1,9 +1,16 @@
 """Initialization file for the inventory_manager package."""
 
 from .models.box import Box
+from .models.box_registry import BoxRegistry
+from .models.change_event import ChangeEvent
 from .models.concentration import Concentration
 from .models.culture import Culture
 from .models.inventory import Inventory
+from .models.inventory_diff import InventoryDiff
 from .models.location import Location
+from .models.persistent_map import PersistentMap, PersistentSet
+from .models.prefix_index import PrefixIndex
+from .models.query import Prefix, Glob, Regex
 from .models.sample import Sample
+from .snapshot import SnapshotInventory
 from .inventory_manager import InventoryManager
\ No newline at end of file
@@ -0,0 +1,298 @@
+from .inventory_manager import InventoryManager
+from .models.change_event import ChangeEvent
+from .models.inventory import Inventory
+from .models.location import Location
+from .models.query import PATTERNS, SAMPLE_KEYS, equal_keys
+from dataclasses import dataclass
+from typing import List, Union
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # optional, only needed for ColumnarInventory
+    np = None
+
+# Column-per-field copy of every sample of an inventory, for queries over many
+# samples at once (i.e., all minipreps of secondary cultures in minus80).
+#
+# Each sample is one slot of NumPy arrays holding a code per field, codes are
+# given to values in the order they are first seen (dictionary encoding). A
+# query is turned into codes once per distinct value and then checked on all
+# samples at once w/ array operations, instead of a Python check per sample.
+# Box locations are kept per box and looked up through the box code of each
+# sample, so moving a box to another freezer changes one entry.
+#
+# The mirror follows the change feed of an InventoryManager, so it stays the
+# same as the latest inventory that manager made from it. It is meant for a
+# single line of versions (i.e., a SharedInventory), changes made on older
+# versions are applied to it all the same.
+
+# fields w/ a code per sample, box location is looked up through boxname
+_CODED_KEYS = ('label', 'sidelabel', 'concentration', 'construct', 'culture', 'clone', 'boxname')
+# every key a query can use
+QUERY_KEYS = SAMPLE_KEYS | {'boxname', 'location', 'row', 'col'}
+
+# slots to start w/, arrays double when full
+_MIN_CAPACITY = 1024
+
+
+@dataclass(frozen=True)
+class Not:
+    condition: object    # value, pattern, AnyOf or Not the field must not match
+
+
+@dataclass(frozen=True)
+class AnyOf:
+    values: tuple        # values (or patterns) of which the field must match one
+
+    def __init__(self, values):
+        object.__setattr__(self, 'values', tuple(values))
+
+
+class _Dictionary:
+    '''
+    Codes of the values of one field, in the order they were first seen
+    '''
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def matching(self, condition, prefixes=None) -> list:
+        '''
+        Codes of the values that match a value or pattern, only values w/ the
+        literal prefix of a pattern are looked at if the sorted values (prefixes) are given
+        '''
+        if isinstance(condition, PATTERNS):
+            if prefixes is not None:
+                values = prefixes.with_prefix(condition.literal_prefix())
+                return [self.codes[value] for value in values if value in self.codes and condition.matches(value)]
+            return [code for code, value in enumerate(self.values) if condition.matches(value)]
+        return [self.codes[value] for value in equal_keys(self.codes, condition)]
+
+
+class ColumnarInventory:
+    '''
+    Columns of codes for every sample of an inventory, kept in step w/ the
+    changes made by an InventoryManager (requires NumPy)
+    '''
+    def __init__(self, inventory: Inventory, manager: InventoryManager = None):
+        '''
+        Args:
+        inventory (Inventory): Inventory to copy
+        manager (InventoryManager): Manager whose changes are followed through its
+        change feed, None for a copy that never changes
+        '''
+        if np is None:
+            raise ImportError('ColumnarInventory requires NumPy (pip install numpy)')
+        self.manager = manager
+        # latest inventory the columns are the same as
+        self.inventory = inventory
+        self._dictionaries = {key: _Dictionary() for key in _CODED_KEYS + ('location',)}
+        # location code of each box, by box code
+        self._box_location = np.zeros(0, dtype=np.int32)
+        # slot of each sample and location in each slot (None if free),
+        # slots of removed samples are used again
+        self._slots = {}
+        self._locations = []
+        self._free_slots = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._fill(inventory)
+        if manager is not None:
+            manager.subscribe(self._apply)
+
+    def close(self):
+        '''
+        Stop following the changes of the manager
+        '''
+        if self.manager is not None:
+            self.manager.unsubscribe(self._apply)
+            self.manager = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def find_sample(self, query: Union[dict, List[dict]]) -> List[Location]:
+        '''
+        Find the locations of samples matching a query
+
+        Args:
+        query (dict or List[dict]): Keys of a find_sample query plus 'boxname',
+        'location' (of the box), 'row' and 'col'. Values are a value, a pattern
+        (Prefix, Glob, Regex), AnyOf([...]) or Not(...). All keys of a dict must
+        match, a list of dicts matches samples matching any of them
+
+        Return:
+        List[Location]: Locations of the matching samples, in no particular order
+        '''
+        with self._lock:
+            locations = self._locations
+            return [locations[slot] for slot in np.flatnonzero(self._mask(query)).tolist()]
+
+    def count(self, query: Union[dict, List[dict]]) -> int:
+        '''
+        Number of samples matching a query (see find_sample), without making their locations
+        '''
+        with self._lock:
+            return int(np.count_nonzero(self._mask(query)))
+
+    # HELPER FUNC
+    def _mask(self, query: Union[dict, List[dict]]):
+        '''
+        Boolean array, True for the used slots matching query (lock is held)
+        '''
+        live = self._live[:self._size]
+        if isinstance(query, dict):
+            query = [query]
+        mask = np.zeros(self._size, dtype=bool)
+        for part in query:
+            if set(part.keys()) - QUERY_KEYS:
+                raise ValueError(f'Can only search for {", ".join(sorted(QUERY_KEYS))}')
+            part_mask = live.copy()
+            for key, condition in part.items():
+                part_mask &= self._key_mask(key, condition)
+            mask |= part_mask
+        return mask
+
+    # HELPER FUNC
+    def _key_mask(self, key: str, condition):
+        '''
+        Boolean array, True for the slots whose value of key matches condition
+        '''
+        if isinstance(condition, Not):
+            return ~self._key_mask(key, condition.condition)
+        conditions = condition.values if isinstance(condition, AnyOf) else (condition,)
+
+        if key in ('row', 'col'):
+            # positions are stored as they are
+            return np.isin(self._columns[key][:self._size], [value for value in conditions])
+
+        dictionary = self._dictionaries[key]
+        prefixes = _prefix_index(self.inventory, key)
+        codes = [code for value in conditions for code in dictionary.matching(value, prefixes)]
+        if key == 'location':
+            # boxes in the matching locations, then the samples in those boxes
+            in_location = np.isin(self._box_location, codes)
+            return in_location[self._columns['boxname'][:self._size]]
+        if len(codes) == 1:
+            return self._columns[key][:self._size] == codes[0]
+        # table of matching codes, looked up for every slot at once
+        matching = np.zeros(len(dictionary.values), dtype=bool)
+        matching[codes] = True
+        return matching[self._columns[key][:self._size]]
+
+    # HELPER FUNC
+    def _apply(self, event: ChangeEvent):
+        '''
+        Change the columns like event changed the inventory (change feed callback)
+        '''
+        inventory = event.inventory
+        with self._lock:
+            for loc in event.removed:
+                slot = self._slots.pop(loc)
+                self._live[slot] = False
+                self._locations[slot] = None
+                self._free_slots.append(slot)
+            for loc in event.added:
+                self._put(loc, inventory.boxes.get(loc.boxname).samples[loc.row][loc.col])
+            # box info may have changed (i.e., moved to another freezer)
+            for boxname in event.boxnames:
+                box = inventory.boxes.get(boxname)
+                if box is not None:
+                    self._set_box_location(box.name, box.location)
+            self.inventory = inventory
+
+    # HELPER FUNC
+    def _put(self, loc: Location, sample):
+        # lock is held (or columns are being filled)
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            if self._size == len(self._live):
+                self._allocate(2 * len(self._live))
+            slot = self._size
+            self._size += 1
+            self._locations.append(None)
+        columns = self._columns
+        dictionaries = self._dictionaries
+        for key in ('label', 'sidelabel', 'concentration', 'construct', 'culture', 'clone'):
+            columns[key][slot] = dictionaries[key].encode(getattr(sample, key))
+        columns['boxname'][slot] = self._set_box_location(loc.boxname, None)
+        columns['row'][slot] = loc.row
+        columns['col'][slot] = loc.col
+        self._live[slot] = True
+        self._slots[loc] = slot
+        self._locations[slot] = loc
+
+    # HELPER FUNC
+    def _fill(self, inventory: Inventory):
+        '''
+        Fill empty columns w/ every sample of inventory
+        '''
+        codes = {key: [] for key in _CODED_KEYS + ('row', 'col')}
+        encoders = {key: self._dictionaries[key].encode for key in _CODED_KEYS}
+        for box in inventory.boxes:
+            box_code = self._set_box_location(box.name, box.location)
+            for (row, col), sample in box.iter_samples():
+                loc = Location(box.name, row, col, sample.label, sample.sidelabel)
+                self._slots[loc] = len(self._locations)
+                self._locations.append(loc)
+                for key in ('label', 'sidelabel', 'concentration', 'construct', 'culture', 'clone'):
+                    codes[key].append(encoders[key](getattr(sample, key)))
+                codes['boxname'].append(box_code)
+                codes['row'].append(row)
+                codes['col'].append(col)
+
+        # columns made in one go, w/ room to grow
+        self._size = len(self._locations)
+        self._allocate(max(_MIN_CAPACITY, 2 * self._size))
+        for key, values in codes.items():
+            self._columns[key][:self._size] = values
+        self._live[:self._size] = True
+
+    # HELPER FUNC
+    def _set_box_location(self, boxname: str, location) -> int:
+        '''
+        Code of box, w/ its location set unless location is None
+        '''
+        box = self._dictionaries['boxname'].encode(boxname)
+        if box >= len(self._box_location):
+            grown = np.zeros(max(16, 2 * (box + 1)), dtype=np.int32)
+            grown[:len(self._box_location)] = self._box_location
+            # codes of boxes not seen yet point at no location
+            grown[len(self._box_location):] = -1
+            self._box_location = grown
+        if location is not None:
+            self._box_location[box] = self._dictionaries['location'].encode(location)
+        return box
+
+    # HELPER FUNC
+    def _allocate(self, capacity: int):
+        '''
+        Make room for capacity slots, keeping the used ones
+        '''
+        old_columns = getattr(self, '_columns', None)
+        old_live = getattr(self, '_live', None)
+        self._columns = {key: np.zeros(capacity, dtype=np.int32) for key in _CODED_KEYS + ('row', 'col')}
+        self._live = np.zeros(capacity, dtype=bool)
+        if old_columns is not None:
+            for key, column in old_columns.items():
+                self._columns[key][:self._size] = column[:self._size]
+            self._live[:self._size] = old_live[:self._size]
+
+
+# HELPER FUNC
+def _prefix_index(inventory: Inventory, key: str):
+    '''
+    Sorted values of a text field of inventory, None for other fields
+    '''
+    name = {'construct': 'construct_prefixes', 'label': 'label_prefixes',
+            'sidelabel': 'sidelabel_prefixes'}.get(key)
+    return getattr(inventory, name, None) if name else None
@@ -0,0 +1,327 @@
+from .models.box import Box
+from .models.concentration import Concentration
+from .models.culture import Culture
+from .models.sample import Sample
+from typing import Iterator, List, Tuple
+import json
+import os
+import re
+import struct
+import threading
+import zlib
+
+# Write-ahead journal of inventory changes, kept in the same directory as the
+# snapshot (inventory.snapshot, or box TSV files before the first compaction)
+# that holds the state it starts from.
+#
+# The journal is split in segment files (journal-000001.log, ...). Each entry
+# is one frame: CRC-32, sequence number and length of the payload, followed
+# by the payload, a compact JSON list of redo records:
+#
+#   ['set_well', boxname, row, col, sample or None]
+#   ['put_box', name, description, location, num_row, num_col, [[row, col, sample], ...]]
+#   ['drop_box', name]
+#   ['set_box_info', name, description, location]
+#
+# where a sample is [label, sidelabel, concentration, construct, culture, clone]
+# (enums by name). Every record sets the final value of what it touches, so
+# replaying a record that is already in the snapshot changes nothing. That
+# makes it safe to replay all the segments that are left after a compaction
+# that was interrupted at any point.
+
+# frame starts w/ CRC-32 of the rest of the frame,
+# followed by the sequence number and payload length
+_CRC = struct.Struct('<I')
+_SEQ_LENGTH = struct.Struct('<QI')
+_SEGMENT_NAME = re.compile(r'^journal-(\d+)\.log$')
+
+
+def _segment_name(number: int) -> str:
+    return f'journal-{number:06d}.log'
+
+
+def _encode_sample(sample: Sample):
+    if sample is None:
+        return None
+    return [sample.label, sample.sidelabel, sample.concentration.name if sample.concentration else None,
+            sample.construct, sample.culture.name if sample.culture else None, sample.clone]
+
+
+def _decode_sample(fields) -> Sample:
+    if fields is None:
+        return None
+    label, sidelabel, conc, construct, culture, clone = fields
+    return Sample(label, sidelabel, Concentration[conc] if conc else None,
+                  construct, Culture[culture] if culture else None, clone)
+
+
+def encode_record(record: tuple) -> list:
+    '''
+    Turn a redo record into JSON compatible lists:
+        ('set_well', boxname, (row, col), sample or None)
+        ('put_box', box)
+        ('drop_box', boxname)
+        ('set_box_info', boxname, description, location)
+    '''
+    name = record[0]
+    if name == 'set_well':
+        _, boxname, (row, col), sample = record
+        return [name, boxname, row, col, _encode_sample(sample)]
+    if name == 'put_box':
+        box = record[1]
+        num_row, num_col = box.get_size()
+        samples = [[irow, icol, _encode_sample(sample)]
+                   for irow, row in enumerate(box.samples) for icol, sample in enumerate(row) if sample]
+        return [name, box.name, box.description, box.location, num_row, num_col, samples]
+    if name in ('drop_box', 'set_box_info'):
+        return list(record)
+    raise ValueError(f'Unknown journal record {name!r}')
+
+
+def decode_record(fields: list) -> tuple:
+    '''
+    Turn lists made by encode_record back into a redo record
+    '''
+    name = fields[0]
+    if name == 'set_well':
+        _, boxname, row, col, sample = fields
+        return (name, boxname, (row, col), _decode_sample(sample))
+    if name == 'put_box':
+        _, boxname, description, location, num_row, num_col, samples = fields
+        grid = [[None] * num_col for i in range(num_row)]
+        for row, col, sample in samples:
+            grid[row][col] = _decode_sample(sample)
+        return (name, Box(boxname, description, location, grid))
+    if name in ('drop_box', 'set_box_info'):
+        return tuple(fields)
+    raise ValueError(f'Unknown journal record {name!r}')
+
+
+def _read_frames(filepath: str) -> Iterator[Tuple[int, int, list]]:
+    '''
+    Iterate through (end position, sequence number, records) of the frames
+    of a segment, stops at the first incomplete or damaged frame
+    '''
+    with open(filepath, 'rb') as file:
+        data = file.read()
+    position = 0
+    while position + _CRC.size + _SEQ_LENGTH.size <= len(data):
+        (crc,) = _CRC.unpack_from(data, position)
+        seq, length = _SEQ_LENGTH.unpack_from(data, position + _CRC.size)
+        start = position + _CRC.size + _SEQ_LENGTH.size
+        end = start + length
+        if end > len(data) or zlib.crc32(data[position + _CRC.size:end]) != crc:
+            return
+        records = json.loads(data[start:end])
+        yield end, seq, records
+        position = end
+
+
+class Journal:
+    '''
+    Append-only write-ahead log of inventory changes w/ group commit
+
+    Pass it to InventoryManager(journal=...) to log every change. Each change
+    is one appended frame, and is on disk (fsync) before the changed
+    inventory is returned. Changes made at the same time from several
+    threads share one fsync
+    '''
+    def __init__(self, directory: str, fsync: bool = True, compact_bytes: int = 1 << 20):
+        '''
+        Args:
+        directory (str): Directory of the journal and of the snapshot/box TSVs it starts from (made if missing)
+        fsync (bool): Wait for every change to be on disk (turn off only for tests/imports)
+        compact_bytes (int): Size of the journal after which it is compacted in the
+        background (None to only compact when asked)
+        '''
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        # inventory after the last appended change
+        self.state = None
+
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._syncing = False
+        self._synced_seq = 0
+        self._compacting = False
+
+        # continue after the last complete frame of the last segment
+        segments = self.segments()
+        self._seq = 0
+        self._size = 0
+        end = 0
+        for filepath in segments:
+            end = 0
+            for end, seq, records in _read_frames(filepath):
+                self._seq = seq
+            self._size += end
+        if segments:
+            self._segment = int(_SEGMENT_NAME.match(os.path.basename(segments[-1])).group(1))
+            # drop a frame that was being written during a crash
+            # (end is where the last complete frame of the newest segment ends)
+            with open(segments[-1], 'r+b') as file:
+                file.truncate(end)
+        else:
+            self._segment = 1
+        self._synced_seq = self._seq
+        # state holds every logged change only if the records found here were
+        # replayed (see InventoryManager.recover) or there were none, until 
+        # then compacting would remove changes state doesn't have
+        self.recovered = self._seq == 0
+        self._file = open(os.path.join(directory, _segment_name(self._segment)), 'ab')
+
+    def segments(self) -> List[str]:
+        '''
+        Filepaths of the segment files, oldest first
+        '''
+        names = [name for name in os.listdir(self.directory) if _SEGMENT_NAME.match(name)]
+        names.sort(key=lambda name: int(_SEGMENT_NAME.match(name).group(1)))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def records(self) -> Iterator[tuple]:
+        '''
+        Iterate through every redo record in the journal, oldest first
+        '''
+        segments = self.segments()
+        for i, filepath in enumerate(segments):
+            end = 0
+            for end, seq, records in _read_frames(filepath):
+                for fields in records:
+                    yield decode_record(fields)
+            # only the newest segment can end w/ a partly written frame
+            if i < len(segments) - 1 and end != os.path.getsize(filepath):
+                raise ValueError(f'Journal segment {filepath} is damaged')
+
+    def append(self, records: List[tuple], state=None, sync: bool = True) -> int:
+        '''
+        Append redo records as one frame and wait until they are on disk
+
+        Args:
+        records (List[tuple]): Redo records of one change (see encode_record)
+        state: Inventory after the change
+        sync (bool): Wait for the frame to be on disk, else call sync later
+
+        Return:
+        int: Sequence number of the frame
+        '''
+        payload = json.dumps([encode_record(record) for record in records],
+                             separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            body = _SEQ_LENGTH.pack(seq, len(payload)) + payload
+            self._file.write(_CRC.pack(zlib.crc32(body)) + body)
+            self._size += _CRC.size + len(body)
+            self.state = state
+            if not self.fsync:
+                self._file.flush()
+            elif sync:
+                self._wait_synced(seq)
+        return seq
+
+    def sync(self, seq: int):
+        '''
+        Wait until the frame w/ sequence number seq (and all before it) is on disk
+        '''
+        if not self.fsync:
+            return
+        with self._lock:
+            self._wait_synced(seq)
+
+    def _wait_synced(self, seq: int):
+        # group commit: one thread at a time syncs everything written so far,
+        # the others wait for it instead of syncing again (lock is held)
+        while self._synced_seq < seq:
+            if self._syncing:
+                self._synced.wait()
+                continue
+            self._syncing = True
+            target = self._seq
+            self._file.flush()
+            fd = self._file.fileno()
+            self._lock.release()
+            try:
+                os.fsync(fd)
+            finally:
+                self._lock.acquire()
+                self._syncing = False
+                self._synced.notify_all()
+            self._synced_seq = max(self._synced_seq, target)
+
+    def try_start_compaction(self):
+        '''
+        Start a compaction (see start_compaction) if the journal grew past
+        compact_bytes and no compaction is running, checked and started at once
+        so only one of the writers that see a big journal starts it
+
+        Return:
+        tuple: (state, closed segments) as from start_compaction, None if not started
+        '''
+        with self._lock:
+            if (self.compact_bytes is None or self._size < self.compact_bytes or self._compacting
+                    or not self.recovered):
+                return None
+            return self._rotate()
+
+    def start_compaction(self):
+        '''
+        Start a new segment for the changes that come next, raises ValueError
+        if a compaction is running or the journal was not recovered
+
+        Return:
+        state: Inventory after the last change in the closed segments
+        List[str]: Filepaths of the closed segments, to remove once the state is saved
+        '''
+        with self._lock:
+            if self._compacting:
+                raise ValueError('Journal is already being compacted')
+            if not self.recovered:
+                raise ValueError('Journal has changes that were not recovered, call recover() first')
+            return self._rotate()
+
+    # HELPER FUNC
+    def _rotate(self):
+        '''
+        Close the current segment and open the next one (lock is held)
+        '''
+        # set before waiting, waiting lets other writers take the lock
+        self._compacting = True
+        # wait for a running fsync, it uses the current segment
+        while self._syncing:
+            self._synced.wait()
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        closed = self.segments()
+        self._segment += 1
+        self._file = open(os.path.join(self.directory, _segment_name(self._segment)), 'ab')
+        self._size = 0
+        return self.state, closed
+
+    def finish_compaction(self, closed: List[str], saved: bool):
+        '''
+        Remove the closed segments if their state was saved
+        '''
+        try:
+            if saved:
+                # make sure the renames of the saved files are on disk first
+                if self.fsync and hasattr(os, 'O_DIRECTORY'):
+                    fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                for filepath in closed:
+                    os.remove(filepath)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def close(self):
+        with self._lock:
+            while self._syncing:
+                self._synced.wait()
+            self._file.close()
@@ -0,0 +1,191 @@
+from collections import deque
+from typing import Callable, Dict, List
+import bisect
+import functools
+import logging
+import threading
+import time
+
+# Opt-in measurements of InventoryManager operations: calls, errors, latency
+# histograms and counts of the work each call did (wells scanned, index
+# entries written, ...), w/ slow calls logged.
+#
+# A manager w/o Metrics runs its methods as they are. A manager w/ Metrics
+# has its public methods wrapped on the instance (see InventoryManager.__init__).
+# Work is counted by the code doing it through count(), which only adds to
+# the counts of a call being measured in the same thread.
+
+logger = logging.getLogger(__name__)
+
+# upper bounds (seconds) of the latency histogram buckets, Prometheus style
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# slow calls kept for to_dict
+_MAX_SLOW_CALLS = 100
+
+# work counts of the call being measured in each thread
+_active = threading.local()
+
+
+def count(name: str, n: int = 1):
+    '''
+    Add n to a work counter of the call being measured in this thread, if any
+    '''
+    counts = getattr(_active, 'counts', None)
+    if counts is not None:
+        counts[name] = counts.get(name, 0) + n
+
+
+class _OperationStats:
+    '''
+    Totals of one operation
+    '''
+    def __init__(self, num_buckets: int):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        # calls per latency bucket (not cumulative), last one is +Inf
+        self.buckets = [0] * (num_buckets + 1)
+        # work counter name -> total
+        self.counts = {}
+
+
+class Metrics:
+    '''
+    Call counters, latency histograms and work counters of InventoryManager operations
+    '''
+    def __init__(self, slow_threshold: float = None, buckets=DEFAULT_BUCKETS):
+        '''
+        Args:
+        slow_threshold (float): Calls taking longer than this many seconds are
+        logged (warning on the inventory_manager_py.metrics logger) and kept
+        in slow_calls (default None, not logged)
+        buckets (tuple[float]): Upper bounds of the latency histogram buckets in seconds
+        '''
+        self.slow_threshold = slow_threshold
+        self.buckets = tuple(sorted(buckets))
+        self._ops = {}
+        # latest slow calls as (operation, seconds, work counts)
+        self.slow_calls = deque(maxlen=_MAX_SLOW_CALLS)
+        self._lock = threading.Lock()
+
+    def wrap(self, operation: str, method: Callable) -> Callable:
+        '''
+        Measured version of method, recorded under operation
+        '''
+        @functools.wraps(method)
+        def measured(*args, **kwargs):
+            # a call made inside another measured call is counted on its own
+            outer = getattr(_active, 'counts', None)
+            counts = _active.counts = {}
+            failed = True
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                seconds = time.perf_counter() - start
+                _active.counts = outer
+                self.record(operation, seconds, counts, failed)
+        return measured
+
+    def record(self, operation: str, seconds: float, counts: Dict[str, int] = None, failed: bool = False):
+        '''
+        Add one call of operation
+
+        Args:
+        operation (str): Name of operation, i.e., 'add_sample'
+        seconds (float): Time the call took
+        counts (dict): Work counts of the call, i.e., {'wells_scanned': 96}
+        failed (bool): Whether the call raised an error
+        '''
+        with self._lock:
+            stats = self._ops.get(operation)
+            if stats is None:
+                stats = self._ops[operation] = _OperationStats(len(self.buckets))
+            stats.calls += 1
+            stats.errors += failed
+            stats.total_seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.buckets[bisect.bisect_left(self.buckets, seconds)] += 1
+            if counts:
+                for name, n in counts.items():
+                    stats.counts[name] = stats.counts.get(name, 0) + n
+
+        if self.slow_threshold is not None and seconds > self.slow_threshold:
+            self.slow_calls.append((operation, seconds, dict(counts or {})))
+            logger.warning('Slow %s: %.1f ms %s', operation, seconds * 1000, counts or '')
+
+    def reset(self):
+        with self._lock:
+            self._ops = {}
+            self.slow_calls.clear()
+
+    def to_dict(self) -> dict:
+        '''
+        Totals of every operation called so far
+
+        Return:
+        dict: operation -> {'calls', 'errors', 'total_seconds', 'max_seconds',
+        'buckets' (upper bound -> number of calls at most that long, cumulative,
+        last one float('inf')), 'counts' (work counter -> total)}
+        '''
+        with self._lock:
+            result = {}
+            for operation, stats in sorted(self._ops.items()):
+                cumulative = list(_cumulative(stats.buckets))
+                result[operation] = {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'total_seconds': stats.total_seconds,
+                    'max_seconds': stats.max_seconds,
+                    'buckets': dict(zip(self.buckets + (float('inf'),), cumulative)),
+                    'counts': dict(stats.counts),
+                }
+            return result
+
+    def to_prometheus(self, prefix: str = 'inventory_manager') -> str:
+        '''
+        Totals of every operation in the Prometheus text exposition format
+
+        Args:
+        prefix (str): Start of every metric name
+
+        Return:
+        str: Metrics text, i.e., to serve on a /metrics endpoint
+        '''
+        ops = self.to_dict()
+        lines = [f'# HELP {prefix}_calls_total Calls of each operation',
+                 f'# TYPE {prefix}_calls_total counter']
+        lines += [f'{prefix}_calls_total{{operation="{op}"}} {stats["calls"]}' for op, stats in ops.items()]
+        lines += [f'# HELP {prefix}_errors_total Calls of each operation that raised an error',
+                  f'# TYPE {prefix}_errors_total counter']
+        lines += [f'{prefix}_errors_total{{operation="{op}"}} {stats["errors"]}' for op, stats in ops.items()]
+
+        lines += [f'# HELP {prefix}_duration_seconds Time taken by each call',
+                  f'# TYPE {prefix}_duration_seconds histogram']
+        for op, stats in ops.items():
+            for bound, calls in stats['buckets'].items():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_duration_seconds_bucket{{operation="{op}",le="{le}"}} {calls}')
+            lines.append(f'{prefix}_duration_seconds_sum{{operation="{op}"}} {stats["total_seconds"]!r}')
+            lines.append(f'{prefix}_duration_seconds_count{{operation="{op}"}} {stats["calls"]}')
+
+        # one counter per kind of work
+        names = sorted({name for stats in ops.values() for name in stats['counts']})
+        for name in names:
+            lines += [f'# HELP {prefix}_{name}_total Total {name.replace("_", " ")} by each operation',
+                      f'# TYPE {prefix}_{name}_total counter']
+            lines += [f'{prefix}_{name}_total{{operation="{op}"}} {stats["counts"][name]}'
+                      for op, stats in ops.items() if name in stats['counts']]
+        return '\n'.join(lines) + '\n'
+
+
+# HELPER FUNC
+def _cumulative(values: List[int]):
+    total = 0
+    for value in values:
+        total += value
+        yield total
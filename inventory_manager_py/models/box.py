@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
 from .sample import Sample
 
 @dataclass(frozen=True)
@@ -9,6 +9,13 @@ class Box:
     location: str            # i.e., which freezer
     samples: List[List[Sample]]  # What's in each well, or None
 
+    # occupancy bitmap of the grid, bit row * num_col + col is set if that
+    # well holds a sample. Only kept for boxes in an inventory: an inventory
+    # takes a copy of a box w/ its own grid and bitmap (for_inventory), which
+    # InventoryManager keeps up to date. Other boxes (i.e., being filled 
+    # after make_empty_box) read their grid every time.
+    _occupancy: Optional[int] = field(default=None, init=False, compare=False, repr=False)
+
     def get_size(self) -> tuple[int, int]:
         '''
         Get the size (number of rows, number of columns) of the box
@@ -16,26 +23,134 @@ class Box:
         # assume that box is rectangular
         num_row = len(self.samples)
         if num_row > 0:
-            num_col = len(self.samples[0]) 
+            num_col = len(self.samples[0])
         else:
             num_col = 0
 
-        return (num_row, num_col) 
-    
+        return (num_row, num_col)
+
+    @property
+    def occupancy(self) -> int:
+        '''
+        Bitmap of the filled wells, bit row * num_col + col
+        '''
+        if self._occupancy is None:
+            return _grid_bits(self.samples)
+        return self._occupancy
+
+    def for_inventory(self) -> 'Box':
+        '''
+        Box for an inventory to keep: this box if it already is one, else a
+        copy w/ its own grid and occupancy bitmap, so filling or emptying 
+        wells of this box afterwards doesn't change the inventory
+        '''
+        if self._occupancy is not None:
+            return self
+        box = Box(self.name, self.description, self.location, [list(row) for row in self.samples])
+        object.__setattr__(box, '_occupancy', _grid_bits(box.samples))
+        return box
+
     def get_num_samples(self) -> int:
         '''
         Get the number of samples stored in the box
         '''
-        num_samples = 0
-        
-        for row in self.samples:
-            # count the number of samples
-            count = sum([1 for sample in row if sample])
-            # add count to total
-            num_samples += count
+        return self.occupancy.bit_count()
+
+    def first_empty_well(self) -> Optional[Tuple[int, int]]:
+        '''
+        Get the first empty well of the box, going row by row
+
+        Return:
+        tuple[int, int]: Row and column of the well, or None if the box is full
+        '''
+        num_row, num_col = self.get_size()
+        # lowest bit that is not set
+        free = ~self.occupancy & ((1 << (num_row * num_col)) - 1)
+        if not free:
+            return None
+        return divmod((free & -free).bit_length() - 1, num_col)
 
-        return num_samples
+    def free_wells(self, skip: int = 0, limit: int = None) -> List[Tuple[int, int]]:
+        '''
+        Get the empty wells of the box, going row by row
+
+        Args:
+        skip (int): Bitmap of wells to treat as filled, i.e., reserved wells
+        limit (int): Return at most this many wells (default all)
+
+        Return:
+        List[tuple[int, int]]: Row and column of each empty well
+        '''
+        num_row, num_col = self.get_size()
+        free = ~(self.occupancy | skip) & ((1 << (num_row * num_col)) - 1)
+        wells = []
+        for i in _set_bits(free):
+            if len(wells) == limit:
+                break
+            wells.append(divmod(i, num_col))
+        return wells
+
+    def first_free_run(self, count: int, skip: int = 0) -> Optional[Tuple[int, int]]:
+        '''
+        Get the first well of count empty wells next to each other in one row
+
+        Args:
+        count (int): Number of wells
+        skip (int): Bitmap of wells to treat as filled, i.e., reserved wells
+
+        Return:
+        tuple[int, int]: Row and column of the first well, or None if no row has room
+        '''
+        num_row, num_col = self.get_size()
+        if count < 1 or count > num_col:
+            return None
+        free = ~(self.occupancy | skip) & ((1 << (num_row * num_col)) - 1)
+        # bit i stays set if wells i .. i + count - 1 are all free
+        runs = free
+        for k in range(1, count):
+            runs &= free >> k
+        # runs can't start where they would wrap into the next row
+        starts = (1 << (num_col - count + 1)) - 1
+        row_starts = 0
+        for row in range(num_row):
+            row_starts |= starts << (row * num_col)
+        runs &= row_starts
+        if not runs:
+            return None
+        return divmod((runs & -runs).bit_length() - 1, num_col)
+
+    def iter_samples(self) -> Iterator[Tuple[Tuple[int, int], Sample]]:
+        '''
+        Iterate through ((row, col), sample) for every sample in the box,
+        going row by row and skipping the empty wells
+        '''
+        num_col = self.get_size()[1]
+        for i in _set_bits(self.occupancy):
+            row, col = divmod(i, num_col)
+            yield (row, col), self.samples[row][col]
 
 
+# HELPER FUNC
+def _grid_bits(samples: List[List[Sample]]) -> int:
+    '''
+    Occupancy bitmap of a grid of samples
+    '''
+    bits = 0
+    bit = 1
+    for row in samples:
+        for sample in row:
+            if sample:
+                bits |= bit
+            bit <<= 1
+    return bits
 
 
+# HELPER FUNC
+def _set_bits(bits: int) -> Iterator[int]:
+    '''
+    Iterate through the positions of the set bits, lowest first
+    '''
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
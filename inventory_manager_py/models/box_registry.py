@@ -0,0 +1,99 @@
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List
+from .box import Box
+from .persistent_map import PersistentMap
+
+class BoxRegistry(Sequence):
+    '''
+    Immutable collection of the boxes in an inventory, indexed by box name
+
+    Behaves like a list of boxes (iteration, len, indexing, `in`), but
+    looking up a box by name is a hash lookup, and `set`/`delete` return a
+    new registry that shares everything but the changed entry with the old
+    one. Boxes are in no particular order
+    '''
+
+    def __init__(self, boxes: Iterable[Box] = ()):
+        # name -> box
+        evolver = PersistentMap().evolver()
+        for box in boxes:
+            # box names must be unique within an inventory
+            if box.name in evolver:
+                raise ValueError(f'Box with name {box.name} already exist in inventory')
+            # wells are counted from the grid the box has now
+            evolver[box.name] = box.for_inventory()
+        self._boxes = evolver.persistent()
+
+    @classmethod
+    def from_map(cls, boxes: PersistentMap) -> 'BoxRegistry':
+        '''
+        Make registry from a PersistentMap of box name -> box
+        '''
+        registry = cls.__new__(cls)
+        registry._boxes = boxes
+        return registry
+
+    @property
+    def by_name(self) -> PersistentMap:
+        '''
+        PersistentMap of box name -> box
+        '''
+        return self._boxes
+
+    def get(self, boxname: str, default: Box = None) -> Box:
+        '''
+        Get box with given name, or default if there is no such box
+        '''
+        return self._boxes.get(boxname, default)
+
+    def set(self, box: Box) -> 'BoxRegistry':
+        '''
+        New registry with box added, replacing any box with the same name
+        '''
+        return BoxRegistry.from_map(self._boxes.set(box.name, box))
+
+    def delete(self, boxname: str) -> 'BoxRegistry':
+        '''
+        New registry without the box with given name
+
+        Raises KeyError if there is no box with that name
+        '''
+        return BoxRegistry.from_map(self._boxes.delete(boxname))
+
+    def names(self) -> List[str]:
+        '''
+        Get the names of all boxes in the registry
+        '''
+        return list(self._boxes)
+
+    def copy(self) -> 'BoxRegistry':
+        # immutable, so a copy is the registry itself
+        return self
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __iter__(self) -> Iterator[Box]:
+        return iter(self._boxes.values())
+
+    def __contains__(self, box) -> bool:
+        # only a box stored under its own name can be in the registry
+        if not isinstance(box, Box):
+            return False
+        return self._boxes.get(box.name) == box
+
+    def __getitem__(self, index):
+        # positional access is kept for compatibility with the old list of boxes
+        return list(self._boxes.values())[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BoxRegistry):
+            return self._boxes == other._boxes
+        if isinstance(other, list):
+            return len(self) == len(other) and all(box in self for box in other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'BoxRegistry({list(self)!r})'
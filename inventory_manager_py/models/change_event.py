@@ -0,0 +1,12 @@
+from dataclasses import dataclass
+from typing import List
+from .inventory import Inventory
+from .location import Location
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    operation: str           # method that made the change, i.e., add_sample ('resync' see subscribe_queue)
+    boxnames: List[str]      # boxes that were added, removed or changed
+    removed: List[Location]  # locations of samples that were taken out (apply before added)
+    added: List[Location]    # locations of samples that were put in
+    inventory: Inventory     # inventory after the change
@@ -1,14 +1,230 @@
-from dataclasses import dataclass
-from typing import List, Dict, Set
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Set, Mapping, Iterable, Tuple
 from .box import Box
+from .box_registry import BoxRegistry
 from .location import Location
 from .concentration import Concentration
 from .culture import Culture
+from .persistent_map import PersistentMap, PersistentSet
+from .prefix_index import PrefixIndex
+import itertools
+
+# every Inventory made gets the next number as its version
+_versions = itertools.count(1)
 
 @dataclass(frozen=True)
 class Inventory:
-    boxes: List[Box]                                   # all the boxes in the inventory
+    boxes: BoxRegistry                                 # all the boxes in the inventory, indexed by name
     construct_to_locations: Dict[str, Set[Location]]   # Quick lookup of samples by construct name
     loc_to_conc: Dict[Location, Concentration]         # Quick lookup by Concentration
     loc_to_clone: Dict[Location, str]                  # Quick lookup by Clone
-    loc_to_culture: Dict[Location, Culture]            # Quick lookup by Culture
\ No newline at end of file
+    loc_to_culture: Dict[Location, Culture]            # Quick lookup by Culture
+    conc_to_locations: Dict[Concentration, Set[Location]] = None  # Quick search of samples by Concentration
+    clone_to_locations: Dict[str, Set[Location]] = None           # Quick search of samples by Clone
+    culture_to_locations: Dict[Culture, Set[Location]] = None     # Quick search of samples by Culture
+    label_to_locations: Dict[str, Set[Location]] = None           # Quick search of samples by label
+    sidelabel_to_locations: Dict[str, Set[Location]] = None       # Quick search of samples by sidelabel
+    construct_prefixes: PrefixIndex = None   # Sorted search of construct names by prefix
+    label_prefixes: PrefixIndex = None       # Sorted search of labels by prefix
+    sidelabel_prefixes: PrefixIndex = None   # Sorted search of sidelabels by prefix
+    version: int = field(default_factory=lambda: next(_versions), init=False, compare=False, repr=False)  # unique number of this version, i.e., for caches
+    # location -> (boxes, wells, samples) of the boxes in that location, made
+    # from the boxes the first time it is needed, afterwards carried over to 
+    # the versions InventoryManager makes from this one (see location_totals)
+    _location_totals: Optional[Dict[str, Tuple[int, int, int]]] = field(default=None, init=False, compare=False, repr=False)
+    # (location, description) -> names of the boxes w/ empty wells, made and
+    # carried over the same way (see free_boxes)
+    _free_boxes: Optional[PersistentMap] = field(default=None, init=False, compare=False, repr=False)
+
+    # All indexes are persistent (PersistentMap/PersistentSet): a new Inventory
+    # made from this one shares every part of them that it did not change.
+
+    def __post_init__(self):
+        # accept a plain list of boxes and index it by name
+        if not isinstance(self.boxes, BoxRegistry):
+            object.__setattr__(self, 'boxes', BoxRegistry(self.boxes))
+        # accept plain dicts/sets for the indexes
+        if not isinstance(self.construct_to_locations, PersistentMap):
+            object.__setattr__(self, 'construct_to_locations',
+                               _bucket_map(self.construct_to_locations))
+        for attr in ('loc_to_conc', 'loc_to_clone', 'loc_to_culture'):
+            if not isinstance(getattr(self, attr), PersistentMap):
+                object.__setattr__(self, attr, PersistentMap(getattr(self, attr)))
+
+        # search indexes are built from the loc_to_* lookups if not given
+        # (labels are part of each Location)
+        search_indexes = {'conc_to_locations': self.loc_to_conc.items,
+                          'clone_to_locations': self.loc_to_clone.items,
+                          'culture_to_locations': self.loc_to_culture.items,
+                          'label_to_locations': lambda: ((loc, loc.label) for loc in self.loc_to_conc),
+                          'sidelabel_to_locations': lambda: ((loc, loc.sidelabel) for loc in self.loc_to_conc)}
+        for attr, loc_value_pairs in search_indexes.items():
+            index = getattr(self, attr)
+            if index is None:
+                object.__setattr__(self, attr, _invert(loc_value_pairs()))
+            elif not isinstance(index, PersistentMap):
+                object.__setattr__(self, attr, _bucket_map(index))
+
+        # prefix indexes hold the keys of the matching search index
+        prefix_indexes = {'construct_prefixes': self.construct_to_locations,
+                          'label_prefixes': self.label_to_locations,
+                          'sidelabel_prefixes': self.sidelabel_to_locations}
+        for attr, value_to_locs in prefix_indexes.items():
+            if getattr(self, attr) is None:
+                object.__setattr__(self, attr, PrefixIndex(value_to_locs))
+
+    @classmethod
+    def from_locations(cls, boxes: Iterable[Box], locations: Iterable[Tuple[Location, object]]) -> 'Inventory':
+        '''
+        Make an inventory of boxes w/ every index built in one pass over the
+        (location, sample) pairs of their samples
+
+        The indexes are filled as plain dicts that become the base of their
+        persistent maps as they are (see PersistentMap), instead of dicts that 
+        __post_init__ copies into persistent indexes
+        '''
+        loc_to = {'loc_to_conc': {}, 'loc_to_clone': {}, 'loc_to_culture': {}}
+        # sample attribute -> value -> locations w/ that value (dict as a set)
+        groups = {attr: {} for attr in ('construct', 'concentration', 'clone', 'culture', 'label', 'sidelabel')}
+        for loc, sample in locations:
+            loc_to['loc_to_conc'][loc] = sample.concentration
+            loc_to['loc_to_clone'][loc] = sample.clone
+            loc_to['loc_to_culture'][loc] = sample.culture
+            for attr, value_to_locs in groups.items():
+                locs = value_to_locs.get(getattr(sample, attr))
+                if locs is None:
+                    value_to_locs[getattr(sample, attr)] = {loc: True}
+                else:
+                    locs[loc] = True
+        return cls.from_groups(boxes, loc_to, groups)
+
+    @classmethod
+    def from_groups(cls, boxes: Iterable[Box], loc_to: Dict[str, dict], groups: Dict[str, dict]) -> 'Inventory':
+        '''
+        Make an inventory of boxes from its indexes filled as plain dicts, 
+        which the persistent indexes take over w/o copying them
+
+        Args:
+        boxes (Iterable[Box]): Boxes of the inventory
+        loc_to (Dict[str, dict]): 'loc_to_conc', 'loc_to_clone' and 'loc_to_culture' -> {location: value}
+        groups (Dict[str, dict]): sample attribute -> value -> {location: True} of the samples w/ that value
+        '''
+        indexes = {attr: PersistentMap._from_dict(items) for attr, items in loc_to.items()}
+        for attr, index in [('construct_to_locations', 'construct'), ('conc_to_locations', 'concentration'),
+                            ('clone_to_locations', 'clone'), ('culture_to_locations', 'culture'),
+                            ('label_to_locations', 'label'), ('sidelabel_to_locations', 'sidelabel')]:
+            indexes[attr] = PersistentMap._from_dict({value: PersistentSet._from_map(PersistentMap._from_dict(locs))
+                                                      for value, locs in groups[index].items()})
+        # (errors if two boxes have the same name)
+        return cls(boxes, **indexes)
+
+    @property
+    def location_totals(self) -> Dict[str, Tuple[int, int, int]]:
+        '''
+        Number of boxes, wells and samples in each location (i.e., freezer)
+        '''
+        if self._location_totals is None:
+            totals = {}
+            for box in self.boxes:
+                _add_box_totals(totals, box, 1)
+            object.__setattr__(self, '_location_totals', totals)
+        return self._location_totals
+
+    @property
+    def free_boxes(self) -> PersistentMap:
+        '''
+        Names of the boxes that aren't full, in sorted order (PrefixIndex), 
+        by (location, description) of the boxes, None in either for any
+        '''
+        if self._free_boxes is None:
+            groups = {}
+            for box in self.boxes:
+                if _has_free_wells(box):
+                    for key in _free_box_keys(box):
+                        groups.setdefault(key, []).append(box.name)
+            object.__setattr__(self, '_free_boxes', PersistentMap((key, PrefixIndex(names))
+                                                                  for key, names in groups.items()))
+        return self._free_boxes
+
+    def carry_totals(self, base: 'Inventory'):
+        '''
+        Set location totals and free boxes from those of base (if made) and 
+        the boxes that differ between the two, for an inventory made from base
+        '''
+        if base._location_totals is None and base._free_boxes is None:
+            return
+        totals = dict(base._location_totals) if base._location_totals is not None else None
+        free_boxes = base._free_boxes.evolver() if base._free_boxes is not None else None
+        # (location, description) -> evolver of its box names
+        open_names = {}
+        # boxes the two versions share are skipped
+        for boxname, old_box, new_box in base.boxes.by_name.diff(self.boxes.by_name):
+            for box, sign in ((old_box, -1), (new_box, 1)):
+                if box is None:
+                    continue
+                if totals is not None:
+                    _add_box_totals(totals, box, sign)
+                if free_boxes is not None and _has_free_wells(box):
+                    for key in _free_box_keys(box):
+                        names = open_names.get(key)
+                        if names is None:
+                            names = open_names[key] = free_boxes.get(key, _EMPTY_NAMES).evolver()
+                        if sign > 0:
+                            names.add(box.name)
+                        else:
+                            names.remove(box.name)
+        if totals is not None:
+            object.__setattr__(self, '_location_totals', totals)
+        if free_boxes is not None:
+            for key, names in open_names.items():
+                if len(names):
+                    free_boxes[key] = names.persistent()
+                elif key in free_boxes:
+                    del free_boxes[key]
+            object.__setattr__(self, '_free_boxes', free_boxes.persistent())
+
+
+_EMPTY_NAMES = PrefixIndex()
+
+
+def _has_free_wells(box: Box) -> bool:
+    num_row, num_col = box.get_size()
+    return box.get_num_samples() < num_row * num_col
+
+
+def _free_box_keys(box: Box) -> set:
+    '''
+    Keys of free_boxes a box is under: its location and/or description, or any
+    '''
+    return {(location, description) for location in (None, box.location)
+            for description in (None, box.description)}
+
+
+def _add_box_totals(totals: dict, box: Box, sign: int):
+    '''
+    Add (sign 1) or take away (sign -1) box from location totals
+    '''
+    num_row, num_col = box.get_size()
+    boxes, wells, samples = totals.get(box.location, (0, 0, 0))
+    boxes += sign
+    if boxes:
+        totals[box.location] = (boxes, wells + sign * num_row * num_col, samples + sign * box.get_num_samples())
+    else:
+        del totals[box.location]
+
+
+def _bucket_map(value_to_locs: Mapping) -> PersistentMap:
+    '''
+    Convert mapping of value -> set of locations to persistent types
+    '''
+    return PersistentMap((value, PersistentSet(locs)) for value, locs in value_to_locs.items())
+
+
+def _invert(loc_value_pairs: Iterable[Tuple[Location, object]]) -> PersistentMap:
+    '''
+    Turn (location, value) pairs into mapping of value -> set of locations
+    '''
+    value_to_locs = {}
+    for loc, value in loc_value_pairs:
+        value_to_locs.setdefault(value, []).append(loc)
+    return _bucket_map(value_to_locs)
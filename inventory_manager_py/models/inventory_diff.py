@@ -0,0 +1,21 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple
+from .box import Box
+from .location import Location
+from .sample import Sample
+
+@dataclass(frozen=True)
+class InventoryDiff:
+    added_boxes: List[Box] = field(default_factory=list)    # boxes only in the new inventory (their samples are in added_samples)
+    removed_boxes: List[str] = field(default_factory=list)  # names of boxes only in the old inventory (their samples are in removed_samples)
+    changed_boxes: List[Box] = field(default_factory=list)  # boxes whose description or location changed, as in the new inventory
+    added_samples: List[Tuple[Location, Sample]] = field(default_factory=list)    # samples only in the new inventory
+    removed_samples: List[Tuple[Location, Sample]] = field(default_factory=list)  # samples only in the old inventory
+    moved_samples: List[Tuple[Location, Location, Sample]] = field(default_factory=list)  # (old location, new location, sample)
+
+    def is_empty(self) -> bool:
+        '''
+        Check if the two inventories hold the same boxes and samples
+        '''
+        return not (self.added_boxes or self.removed_boxes or self.changed_boxes
+                    or self.added_samples or self.removed_samples or self.moved_samples)
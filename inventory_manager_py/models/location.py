@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
-@dataclass(frozen=True)
+# no __dict__ per instance (slots), the indexes hold one Location per sample
+@dataclass(frozen=True, slots=True)
 class Location:
     boxname: str     # The name of the box a sample is in
     row: int         # The row within the box, starting with 0
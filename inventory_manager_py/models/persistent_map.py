@@ -0,0 +1,681 @@
+from collections.abc import Mapping, Set, KeysView, ValuesView, ItemsView
+from typing import Iterable, Iterator, Tuple
+
+# Hash array mapped trie (HAMT): every node covers 5 bits of the key's hash,
+# so a lookup or update touches at most ~13 nodes. An update copies only the
+# nodes on the path from the root to the changed entry and shares the rest
+# with the previous version, which stays valid.
+#
+# A map made from many items at once keeps them in a plain dict (the base)
+# that is never changed, and the trie only holds the changes made on top of
+# it, so making a big map costs about as much as making a dict. Every version
+# made from that map shares the base.
+
+_SHIFT = 5
+_MASK = 0x1f
+_HASH_MASK = (1 << 64) - 1
+
+# marker for a missing value (None can be a value)
+_MISSING = object()
+# value of a key of the base that was deleted
+_DELETED = object()
+
+
+def _hash(key) -> int:
+    '''
+    Hash of key as a non-negative 64 bit integer
+    '''
+    return hash(key) & _HASH_MASK
+
+
+def _is_leaf(entry) -> bool:
+    '''
+    Entries in a node are either (hash, key, value) leaves or child nodes
+    '''
+    return type(entry) is tuple
+
+
+def _same_key(leaf: tuple, h: int, key) -> bool:
+    '''
+    Check if leaf holds key with hash h
+    '''
+    return leaf[0] == h and (leaf[1] is key or leaf[1] == key)
+
+
+def _merge(shift: int, leaf1: tuple, leaf2: tuple, edit):
+    '''
+    Make a node holding two leaves whose hashes match below shift
+    '''
+    h1, h2 = leaf1[0], leaf2[0]
+    # full hashes are equal, keys can only be told apart by comparing
+    if h1 == h2:
+        return _CollisionNode(h1, [leaf1, leaf2], edit)
+
+    pos1 = (h1 >> shift) & _MASK
+    pos2 = (h2 >> shift) & _MASK
+    # still the same slot at this level, go one level down
+    if pos1 == pos2:
+        return _BitmapNode(1 << pos1, [_merge(shift + _SHIFT, leaf1, leaf2, edit)], edit)
+    # entries are kept in order of slot position
+    if pos1 < pos2:
+        return _BitmapNode((1 << pos1) | (1 << pos2), [leaf1, leaf2], edit)
+    return _BitmapNode((1 << pos1) | (1 << pos2), [leaf2, leaf1], edit)
+
+
+class _BitmapNode:
+    '''
+    Node with up to 32 entries, bitmap tells which slots are used
+    '''
+    __slots__ = ('bitmap', 'entries', 'edit')
+
+    def __init__(self, bitmap: int, entries: list, edit=None):
+        self.bitmap = bitmap
+        self.entries = entries
+        # nodes made by an evolver can be changed in place by that evolver
+        self.edit = edit
+
+    def find(self, h: int, shift: int, key, default):
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return default
+        entry = self.entries[(self.bitmap & (bit - 1)).bit_count()]
+        if type(entry) is tuple:
+            if entry[0] == h and (entry[1] is key or entry[1] == key):
+                return entry[2]
+            return default
+        return entry.find(h, shift + _SHIFT, key, default)
+
+    def assoc(self, h: int, shift: int, key, value, edit) -> Tuple['_BitmapNode', bool]:
+        '''
+        Set key to value, returns the new node and whether a key was added
+        '''
+        bit = 1 << ((h >> shift) & _MASK)
+        idx = (self.bitmap & (bit - 1)).bit_count()
+
+        # empty slot, just add a leaf
+        if not self.bitmap & bit:
+            return self._insert(idx, bit, (h, key, value), edit), True
+
+        entry = self.entries[idx]
+        if type(entry) is tuple:
+            # same key, replace value
+            if entry[0] == h and (entry[1] is key or entry[1] == key):
+                if entry[2] is value:
+                    return self, False
+                return self._replace(idx, (entry[0], entry[1], value), edit), False
+            # different key in the slot, push both down a level
+            child = _merge(shift + _SHIFT, entry, (h, key, value), edit)
+            return self._replace(idx, child, edit), True
+
+        child, added = entry.assoc(h, shift + _SHIFT, key, value, edit)
+        if child is entry:
+            return self, added
+        return self._replace(idx, child, edit), added
+
+    def dissoc(self, h: int, shift: int, key, edit) -> Tuple['_BitmapNode', bool]:
+        '''
+        Remove key, returns the new node (None if now empty) and whether key was found
+        '''
+        bit = 1 << ((h >> shift) & _MASK)
+        if not self.bitmap & bit:
+            return self, False
+        idx = (self.bitmap & (bit - 1)).bit_count()
+
+        entry = self.entries[idx]
+        if _is_leaf(entry):
+            if _same_key(entry, h, key):
+                return self._remove(idx, bit, edit), True
+            return self, False
+
+        child, removed = entry.dissoc(h, shift + _SHIFT, key, edit)
+        if not removed:
+            return self, False
+        if child is None:
+            return self._remove(idx, bit, edit), True
+        # pull a lone leaf up so the trie stays as shallow as possible
+        leaf = child.single_leaf()
+        if leaf is not None:
+            return self._replace(idx, leaf, edit), True
+        if child is entry:
+            return self, True
+        return self._replace(idx, child, edit), True
+
+    def single_leaf(self):
+        '''
+        The only entry of this node if it is a leaf, otherwise None
+        '''
+        if len(self.entries) == 1 and _is_leaf(self.entries[0]):
+            return self.entries[0]
+        return None
+
+    def _owned(self, edit) -> bool:
+        return edit is not None and self.edit is edit
+
+    def _insert(self, idx: int, bit: int, entry, edit) -> '_BitmapNode':
+        if self._owned(edit):
+            self.entries.insert(idx, entry)
+            self.bitmap |= bit
+            return self
+        entries = self.entries[:idx]
+        entries.append(entry)
+        entries.extend(self.entries[idx:])
+        return _BitmapNode(self.bitmap | bit, entries, edit)
+
+    def _replace(self, idx: int, entry, edit) -> '_BitmapNode':
+        if self._owned(edit):
+            self.entries[idx] = entry
+            return self
+        entries = self.entries.copy()
+        entries[idx] = entry
+        return _BitmapNode(self.bitmap, entries, edit)
+
+    def _remove(self, idx: int, bit: int, edit) -> '_BitmapNode':
+        bitmap = self.bitmap ^ bit
+        if not bitmap:
+            return None
+        if self._owned(edit):
+            del self.entries[idx]
+            self.bitmap = bitmap
+            return self
+        return _BitmapNode(bitmap, self.entries[:idx] + self.entries[idx + 1:], edit)
+
+
+class _CollisionNode:
+    '''
+    Node for different keys that have exactly the same hash
+    '''
+    __slots__ = ('hash', 'entries', 'edit')
+
+    def __init__(self, h: int, entries: list, edit=None):
+        self.hash = h
+        self.entries = entries
+        self.edit = edit
+
+    def find(self, h: int, shift: int, key, default):
+        if h == self.hash:
+            for leaf in self.entries:
+                if _same_key(leaf, h, key):
+                    return leaf[2]
+        return default
+
+    def assoc(self, h: int, shift: int, key, value, edit):
+        # key with a different hash, nest this node one level further down
+        if h != self.hash:
+            node = _BitmapNode(1 << ((self.hash >> shift) & _MASK), [self], edit)
+            return node.assoc(h, shift, key, value, edit)
+
+        entries = self.entries if self._owned(edit) else self.entries.copy()
+        for i, leaf in enumerate(entries):
+            if _same_key(leaf, h, key):
+                if leaf[2] is value:
+                    return self, False
+                entries[i] = (leaf[0], leaf[1], value)
+                return self._with_entries(entries, edit), False
+        entries.append((h, key, value))
+        return self._with_entries(entries, edit), True
+
+    def dissoc(self, h: int, shift: int, key, edit):
+        if h != self.hash:
+            return self, False
+        for i, leaf in enumerate(self.entries):
+            if _same_key(leaf, h, key):
+                if len(self.entries) == 1:
+                    return None, True
+                entries = self.entries if self._owned(edit) else self.entries.copy()
+                del entries[i]
+                return self._with_entries(entries, edit), True
+        return self, False
+
+    def single_leaf(self):
+        if len(self.entries) == 1:
+            return self.entries[0]
+        return None
+
+    def _owned(self, edit) -> bool:
+        return edit is not None and self.edit is edit
+
+    def _with_entries(self, entries: list, edit) -> '_CollisionNode':
+        if self._owned(edit):
+            return self
+        return _CollisionNode(self.hash, entries, edit)
+
+
+# shared root of every empty map, never changed in place
+_EMPTY_NODE = _BitmapNode(0, [])
+
+
+def _iter_leaves(root) -> Iterator[tuple]:
+    '''
+    Iterate through all (hash, key, value) leaves under root
+    '''
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for entry in node.entries:
+            if _is_leaf(entry):
+                yield entry
+            else:
+                stack.append(entry)
+
+
+def _overlay_get(root, base, key, default):
+    '''
+    Value of key in base w/ the changes in root on top
+    '''
+    value = root.find(_hash(key), 0, key, _MISSING)
+    if value is _MISSING:
+        return base.get(key, default) if base is not None else default
+    return default if value is _DELETED else value
+
+
+def _overlay_set(root, base, key, value, edit):
+    '''
+    Set key to value on top of base, returns the new root and whether a key was added
+    '''
+    h = _hash(key)
+    if base is None:
+        return root.assoc(h, 0, key, value, edit)
+    old = root.find(h, 0, key, _MISSING)
+    if old is _MISSING:
+        base_value = base.get(key, _MISSING)
+        # same value as the base, nothing to change
+        if base_value is value:
+            return root, False
+        return root.assoc(h, 0, key, value, edit)[0], base_value is _MISSING
+    return root.assoc(h, 0, key, value, edit)[0], old is _DELETED
+
+
+def _overlay_delete(root, base, key, edit):
+    '''
+    Remove key on top of base, returns the new root and whether key was found
+    '''
+    h = _hash(key)
+    if base is None or key not in base:
+        root, removed = root.dissoc(h, 0, key, edit)
+        return (root if root is not None else _EMPTY_NODE), removed
+    # key of the base is marked deleted
+    if root.find(h, 0, key, _MISSING) is _DELETED:
+        return root, False
+    return root.assoc(h, 0, key, _DELETED, edit)[0], True
+
+
+def _overlay_items(root, base) -> Iterator[tuple]:
+    '''
+    Iterate through (key, value) of base w/ the changes in root on top
+    '''
+    for leaf in _iter_leaves(root):
+        if leaf[2] is not _DELETED:
+            yield leaf[1], leaf[2]
+    if base is None:
+        return
+    if root is _EMPTY_NODE:
+        yield from base.items()
+        return
+    # keys that were changed were given above
+    for key, value in base.items():
+        if root.find(_hash(key), 0, key, _MISSING) is _MISSING:
+            yield key, value
+
+
+def _diff_nodes(old, new, shift: int) -> Iterator[Tuple[object, object, object]]:
+    '''
+    Iterate through (key, old value, new value) of keys that differ between
+    two nodes covering the same hash prefix (_MISSING if a key is only on one side)
+    '''
+    # shared node, nothing under it changed
+    if old is new:
+        return
+    if type(old) is _BitmapNode and type(new) is _BitmapNode:
+        # same slots used (i.e., only values changed), entries line up
+        pairs = zip(old.entries, new.entries) if old.bitmap == new.bitmap else _slot_pairs(old, new)
+        for old_entry, new_entry in pairs:
+            if old_entry is new_entry:
+                continue
+            if old_entry is not None and new_entry is not None and not _is_leaf(old_entry) and not _is_leaf(new_entry):
+                yield from _diff_nodes(old_entry, new_entry, shift + _SHIFT)
+            else:
+                yield from _diff_small(old_entry, new_entry)
+        return
+    yield from _diff_small(old, new)
+
+
+def _slot_pairs(old, new) -> Iterator[Tuple[object, object]]:
+    '''
+    Iterate through (old entry, new entry) of every slot used by either node (None if unused)
+    '''
+    bits = old.bitmap | new.bitmap
+    while bits:
+        bit = bits & -bits
+        bits ^= bit
+        yield (old.entries[(old.bitmap & (bit - 1)).bit_count()] if old.bitmap & bit else None,
+               new.entries[(new.bitmap & (bit - 1)).bit_count()] if new.bitmap & bit else None)
+
+
+def _diff_small(old, new) -> Iterator[Tuple[object, object, object]]:
+    '''
+    Compare two entries (leaf, node or None) of different shapes key by key
+    '''
+    def leaves(entry):
+        if entry is None:
+            return {}
+        if _is_leaf(entry):
+            return {entry[1]: entry[2]}
+        return {leaf[1]: leaf[2] for leaf in _iter_leaves(entry)}
+
+    old_items = leaves(old)
+    new_items = leaves(new)
+    for key, value in old_items.items():
+        new_value = new_items.pop(key, _MISSING)
+        if new_value is _MISSING or not (new_value is value or new_value == value):
+            yield key, value, new_value
+    for key, value in new_items.items():
+        yield key, _MISSING, value
+
+
+class _KeysView(KeysView):
+    def __iter__(self):
+        return iter(self._mapping)
+
+
+class _ValuesView(ValuesView):
+    def __iter__(self):
+        for key, value in _overlay_items(self._mapping._root, self._mapping._base):
+            yield value
+
+
+class _ItemsView(ItemsView):
+    def __iter__(self):
+        return _overlay_items(self._mapping._root, self._mapping._base)
+
+
+class PersistentMap(Mapping):
+    '''
+    Immutable mapping where updates return a new map
+
+    `set` and `delete` run in O(log n) and share all untouched structure with
+    the original map, so older versions stay valid and cost almost nothing
+    to keep around. Iteration order is not defined
+    '''
+    __slots__ = ('_root', '_count', '_base')
+
+    def __init__(self, items=None):
+        # later pairs win for repeated keys, like dict(), the copy is the base
+        # (the trie is only made once the map is changed)
+        base = dict(items) if items else None
+        self._root = _EMPTY_NODE
+        self._count = len(base) if base else 0
+        self._base = base
+
+    @classmethod
+    def _from_root(cls, root, count: int, base: dict = None) -> 'PersistentMap':
+        new_map = cls.__new__(cls)
+        new_map._root = root if root is not None else _EMPTY_NODE
+        new_map._count = count
+        new_map._base = base
+        return new_map
+
+    @classmethod
+    def _from_dict(cls, items: dict) -> 'PersistentMap':
+        '''
+        Map of the items of a dict that is never changed afterwards, taken 
+        as the base w/o copying it
+        '''
+        return cls._from_root(_EMPTY_NODE, len(items), items)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        # unchanged map made from a dict
+        if self._root is _EMPTY_NODE and self._base is not None:
+            return self._base.get(key, default)
+        return _overlay_get(self._root, self._base, key, default)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        for key, value in _overlay_items(self._root, self._base):
+            yield key
+
+    def keys(self):
+        return _KeysView(self)
+
+    def values(self):
+        return _ValuesView(self)
+
+    def items(self):
+        return _ItemsView(self)
+
+    def set(self, key, value) -> 'PersistentMap':
+        '''
+        New map with key set to value
+        '''
+        root, added = _overlay_set(self._root, self._base, key, value, None)
+        if root is self._root:
+            return self
+        return PersistentMap._from_root(root, self._count + added, self._base)
+
+    def delete(self, key) -> 'PersistentMap':
+        '''
+        New map without key, raises KeyError if key is not in the map
+        '''
+        root, removed = _overlay_delete(self._root, self._base, key, None)
+        if not removed:
+            raise KeyError(key)
+        return PersistentMap._from_root(root, self._count - 1, self._base)
+
+    def update(self, items) -> 'PersistentMap':
+        '''
+        New map with all the given key/value pairs set
+        '''
+        evolver = self.evolver()
+        pairs = items.items() if isinstance(items, Mapping) else items
+        for key, value in pairs:
+            evolver[key] = value
+        return evolver.persistent()
+
+    def evolver(self) -> 'PersistentMapEvolver':
+        '''
+        Mutable working copy for making many changes at once
+        '''
+        return PersistentMapEvolver(self)
+
+    def diff(self, other: 'PersistentMap', missing=None) -> Iterator[Tuple[object, object, object]]:
+        '''
+        Iterate through (key, value here, value in other) for every key whose
+        value differs between the two maps, using missing for a key that is
+        only in one of them
+
+        Parts of the trie the two maps share are skipped, so comparing a map
+        w/ an earlier version of itself costs about the number of changes
+        '''
+        if self._base is not other._base:
+            # nothing shared, compare key by key
+            yield from self._diff_items(other, missing)
+            return
+        base = self._base
+        for key, old, new in _diff_nodes(self._root, other._root, 0):
+            # key not changed on one side has its value in the base
+            if old is _MISSING or old is _DELETED:
+                old = base.get(key, _MISSING) if old is _MISSING and base is not None else _MISSING
+            if new is _MISSING or new is _DELETED:
+                new = base.get(key, _MISSING) if new is _MISSING and base is not None else _MISSING
+            if old is new or (old is not _MISSING and new is not _MISSING and old == new):
+                continue
+            yield key, missing if old is _MISSING else old, missing if new is _MISSING else new
+
+    def _diff_items(self, other: 'PersistentMap', missing) -> Iterator[Tuple[object, object, object]]:
+        other_items = dict(other.items())
+        for key, value in self.items():
+            other_value = other_items.pop(key, _MISSING)
+            if other_value is _MISSING or not (other_value is value or other_value == value):
+                yield key, value, missing if other_value is _MISSING else other_value
+        for key, value in other_items.items():
+            yield key, missing, value
+
+    def copy(self) -> 'PersistentMap':
+        # immutable, so a copy is the map itself
+        return self
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        if len(self) != len(other):
+            return False
+        for key, value in self.items():
+            if other.get(key, _MISSING) != value:
+                return False
+        return True
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'PersistentMap({dict(self.items())!r})'
+
+
+class PersistentMapEvolver:
+    '''
+    Mutable working copy of a PersistentMap
+
+    Nodes copied by the evolver are changed in place on later edits, so a
+    batch of N changes costs about N single changes without repeated path
+    copies. The original map is never changed
+    '''
+    __slots__ = ('_root', '_count', '_base', '_edit')
+
+    def __init__(self, pmap: PersistentMap):
+        self._root = pmap._root
+        self._count = pmap._count
+        self._base = pmap._base
+        # token identifying nodes owned by this evolver
+        self._edit = object()
+
+    def __getitem__(self, key):
+        value = _overlay_get(self._root, self._base, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        return _overlay_get(self._root, self._base, key, default)
+
+    def __contains__(self, key) -> bool:
+        return _overlay_get(self._root, self._base, key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __setitem__(self, key, value):
+        self._root, added = _overlay_set(self._root, self._base, key, value, self._edit)
+        self._count += added
+
+    def __delitem__(self, key):
+        self._root, removed = _overlay_delete(self._root, self._base, key, self._edit)
+        if not removed:
+            raise KeyError(key)
+        self._count -= 1
+
+    def persistent(self) -> PersistentMap:
+        '''
+        Freeze current contents into a PersistentMap
+        '''
+        # nodes made so far now belong to the returned map, later edits copy them
+        self._edit = object()
+        return PersistentMap._from_root(self._root, self._count, self._base)
+
+
+class PersistentSet(Set):
+    '''
+    Immutable set where `add` and `remove` return a new set in O(log n)
+    '''
+    __slots__ = ('_map',)
+
+    def __init__(self, items: Iterable = ()):
+        self._map = PersistentMap._from_dict(dict.fromkeys(items, True))
+
+    @classmethod
+    def _from_map(cls, pmap: PersistentMap) -> 'PersistentSet':
+        new_set = cls.__new__(cls)
+        new_set._map = pmap
+        return new_set
+
+    def __contains__(self, item) -> bool:
+        return item in self._map
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def add(self, item) -> 'PersistentSet':
+        '''
+        New set with item added
+        '''
+        new_map = self._map.set(item, True)
+        if new_map is self._map:
+            return self
+        return PersistentSet._from_map(new_map)
+
+    def remove(self, item) -> 'PersistentSet':
+        '''
+        New set without item, raises KeyError if item is not in the set
+        '''
+        return PersistentSet._from_map(self._map.delete(item))
+
+    def evolver(self) -> 'PersistentSetEvolver':
+        '''
+        Mutable working copy for making many changes at once
+        '''
+        return PersistentSetEvolver(self)
+
+    def copy(self) -> set:
+        '''
+        Mutable (built-in) set with the same items
+        '''
+        return set(self._map)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'PersistentSet({set(self._map)!r})'
+
+
+class PersistentSetEvolver:
+    '''
+    Mutable working copy of a PersistentSet, the original is never changed
+    '''
+    __slots__ = ('_evolver',)
+
+    def __init__(self, pset: PersistentSet):
+        self._evolver = pset._map.evolver()
+
+    def add(self, item):
+        self._evolver[item] = True
+
+    def remove(self, item):
+        '''
+        Remove item, raises KeyError if item is not in the set
+        '''
+        del self._evolver[item]
+
+    def __contains__(self, item) -> bool:
+        return item in self._evolver
+
+    def __len__(self) -> int:
+        return len(self._evolver)
+
+    def persistent(self) -> PersistentSet:
+        '''
+        Freeze current contents into a PersistentSet
+        '''
+        return PersistentSet._from_map(self._evolver.persistent())
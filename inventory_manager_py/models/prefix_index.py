@@ -0,0 +1,294 @@
+from bisect import bisect_left
+from typing import Iterable, Iterator
+import heapq
+from .persistent_map import PersistentSet
+
+# Persistent trie of strings. Like PersistentMap, an update copies only the
+# nodes on the path of the changed key, so older versions stay valid.
+#
+# Also like PersistentMap, an index made from many keys at once keeps them
+# as a sorted list (the base, searched by bisection) and the trie only holds
+# the keys added afterwards. Removed keys of the base are kept in a set.
+
+class _TrieNode:
+    __slots__ = ('terminal', 'children', 'edit')
+
+    def __init__(self, terminal: bool, children: dict, edit=None):
+        self.terminal = terminal    # a key ends at this node
+        self.children = children    # next character -> node
+        # nodes made by an evolver can be changed in place by that evolver
+        self.edit = edit
+
+    def owned(self, edit) -> bool:
+        return edit is not None and self.edit is edit
+
+
+# shared root of every empty index, never changed in place
+_EMPTY_NODE = _TrieNode(False, {})
+
+
+def _insert(node: _TrieNode, key: str, i: int, edit) -> _TrieNode:
+    '''
+    Add key[i:] below node, returns the new node (node itself if key was there)
+    '''
+    # end of key, mark node
+    if i == len(key):
+        if node.terminal:
+            return node
+        if node.owned(edit):
+            node.terminal = True
+            return node
+        # copy children, an evolver changes the children of nodes it owns
+        return _TrieNode(True, node.children.copy(), edit)
+
+    char = key[i]
+    child = node.children.get(char, _EMPTY_NODE)
+    new_child = _insert(child, key, i + 1, edit)
+    if new_child is child:
+        return node
+    if node.owned(edit):
+        node.children[char] = new_child
+        return node
+    children = node.children.copy()
+    children[char] = new_child
+    return _TrieNode(node.terminal, children, edit)
+
+
+def _remove(node: _TrieNode, key: str, i: int, edit) -> _TrieNode:
+    '''
+    Remove key[i:] below node, returns the new node (None if now empty)
+
+    Raises KeyError if key is not in the trie
+    '''
+    # end of key, unmark node
+    if i == len(key):
+        if not node.terminal:
+            raise KeyError(key)
+        if not node.children:
+            return None
+        if node.owned(edit):
+            node.terminal = False
+            return node
+        return _TrieNode(False, node.children.copy(), edit)
+
+    char = key[i]
+    child = node.children.get(char)
+    if child is None:
+        raise KeyError(key)
+    new_child = _remove(child, key, i + 1, edit)
+
+    # drop branches that no longer lead to any key
+    if new_child is None and len(node.children) == 1 and not node.terminal:
+        return None
+    children = node.children if node.owned(edit) else node.children.copy()
+    if new_child is None:
+        del children[char]
+    else:
+        children[char] = new_child
+    if node.owned(edit):
+        return node
+    return _TrieNode(node.terminal, children, edit)
+
+
+def _trie_with_prefix(root: _TrieNode, prefix: str) -> Iterator[str]:
+    '''
+    Iterate through the keys of the trie starting with prefix, in sorted order
+    '''
+    # walk down to the node for the prefix
+    node = root
+    for char in prefix:
+        node = node.children.get(char)
+        if node is None:
+            return
+
+    # depth first search below it, smallest character first
+    stack = [(prefix, node)]
+    while stack:
+        key, node = stack.pop()
+        if node.terminal:
+            yield key
+        for char in sorted(node.children, reverse=True):
+            stack.append((key + char, node.children[char]))
+
+
+def _base_with_prefix(sorted_keys: list, removed, prefix: str) -> Iterator[str]:
+    '''
+    Iterate through the keys of the base starting with prefix that were not removed
+    '''
+    i = bisect_left(sorted_keys, prefix)
+    while i < len(sorted_keys) and sorted_keys[i].startswith(prefix):
+        if not removed or sorted_keys[i] not in removed:
+            yield sorted_keys[i]
+        i += 1
+
+
+def _contains(root: _TrieNode, base: frozenset, removed, key) -> bool:
+    if not isinstance(key, str):
+        return False
+    if base is not None and key in base:
+        return key not in removed
+    node = root
+    for char in key:
+        node = node.children.get(char)
+        if node is None:
+            return False
+    return node.terminal
+
+
+# no base keys removed
+_NONE_REMOVED = PersistentSet()
+
+
+class PrefixIndex:
+    '''
+    Immutable set of strings that can be searched by prefix
+
+    `add` and `remove` return a new index and share all untouched nodes with
+    the old one. Finding the k keys with a prefix p takes O(len(p) + k)
+    (plus a bisection of the keys the index was made from)
+    '''
+    __slots__ = ('_root', '_count', '_sorted', '_base', '_removed')
+
+    def __init__(self, keys: Iterable[str] = ()):
+        # distinct string keys are the base, no trie is made for them
+        base = frozenset(key for key in keys if isinstance(key, str))
+        self._root = _EMPTY_NODE
+        self._count = len(base)
+        self._sorted = sorted(base) if base else None
+        self._base = base if base else None
+        self._removed = _NONE_REMOVED
+
+    @classmethod
+    def _from_root(cls, root: _TrieNode, count: int, sorted_keys: list = None,
+                   base: frozenset = None, removed: PersistentSet = _NONE_REMOVED) -> 'PrefixIndex':
+        index = cls.__new__(cls)
+        index._root = root if root is not None else _EMPTY_NODE
+        index._count = count
+        index._sorted = sorted_keys
+        index._base = base
+        index._removed = removed
+        return index
+
+    def add(self, key: str) -> 'PrefixIndex':
+        '''
+        New index with key added (only strings are indexed)
+        '''
+        if not isinstance(key, str):
+            return self
+        # key of the base is added back
+        if self._base is not None and key in self._base:
+            if key not in self._removed:
+                return self
+            return PrefixIndex._from_root(self._root, self._count + 1, self._sorted, self._base,
+                                          self._removed.remove(key))
+        root = _insert(self._root, key, 0, None)
+        if root is self._root:
+            return self
+        return PrefixIndex._from_root(root, self._count + 1, self._sorted, self._base, self._removed)
+
+    def remove(self, key: str) -> 'PrefixIndex':
+        '''
+        New index without key, raises KeyError if key is not in the index
+        '''
+        if not isinstance(key, str):
+            raise KeyError(key)
+        if self._base is not None and key in self._base:
+            if key in self._removed:
+                raise KeyError(key)
+            return PrefixIndex._from_root(self._root, self._count - 1, self._sorted, self._base,
+                                          self._removed.add(key))
+        return PrefixIndex._from_root(_remove(self._root, key, 0, None), self._count - 1,
+                                      self._sorted, self._base, self._removed)
+
+    def with_prefix(self, prefix: str) -> Iterator[str]:
+        '''
+        Iterate through the keys starting with prefix, in sorted order
+        '''
+        added = _trie_with_prefix(self._root, prefix)
+        if self._sorted is None:
+            return added
+        # keys in the trie are never in the base, so the two don't overlap
+        return heapq.merge(_base_with_prefix(self._sorted, self._removed, prefix), added)
+
+    def evolver(self) -> 'PrefixIndexEvolver':
+        '''
+        Mutable working copy for making many changes at once
+        '''
+        return PrefixIndexEvolver(self)
+
+    def __contains__(self, key) -> bool:
+        return _contains(self._root, self._base, self._removed, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.with_prefix('')
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PrefixIndex):
+            return NotImplemented
+        return self is other or (len(self) == len(other) and list(self) == list(other))
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'PrefixIndex({list(self)!r})'
+
+
+class PrefixIndexEvolver:
+    '''
+    Mutable working copy of a PrefixIndex, the original is never changed
+    '''
+    __slots__ = ('_root', '_count', '_sorted', '_base', '_removed', '_edit')
+
+    def __init__(self, index: PrefixIndex):
+        self._root = index._root
+        self._count = index._count
+        self._sorted = index._sorted
+        self._base = index._base
+        self._removed = index._removed.evolver()
+        # token identifying nodes owned by this evolver
+        self._edit = object()
+
+    def add(self, key: str):
+        '''
+        Add key (only strings are indexed)
+        '''
+        if not isinstance(key, str) or key in self:
+            return
+        if self._base is not None and key in self._base:
+            self._removed.remove(key)
+        else:
+            self._root = _insert(self._root, key, 0, self._edit)
+        self._count += 1
+
+    def remove(self, key: str):
+        '''
+        Remove key, raises KeyError if key is not in the index
+        '''
+        if not isinstance(key, str):
+            raise KeyError(key)
+        if self._base is not None and key in self._base:
+            if key in self._removed:
+                raise KeyError(key)
+            self._removed.add(key)
+        else:
+            root = _remove(self._root, key, 0, self._edit)
+            self._root = root if root is not None else _EMPTY_NODE
+        self._count -= 1
+
+    def __contains__(self, key) -> bool:
+        return _contains(self._root, self._base, self._removed, key)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def persistent(self) -> PrefixIndex:
+        '''
+        Freeze current contents into a PrefixIndex
+        '''
+        # nodes made so far now belong to the returned index
+        self._edit = object()
+        return PrefixIndex._from_root(self._root, self._count, self._sorted, self._base,
+                                      self._removed.persistent())
@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+import fnmatch
+import re
+
+# Pattern predicates that can be used as values in a find_sample query for
+# 'label', 'sidelabel' and 'construct', e.g. {'construct': Prefix('pTarg')}
+
+@dataclass(frozen=True)
+class Prefix:
+    prefix: str      # text the value must start with
+
+    def matches(self, value) -> bool:
+        return isinstance(value, str) and value.startswith(self.prefix)
+
+    def literal_prefix(self) -> str:
+        '''
+        Text every matching value starts with
+        '''
+        return self.prefix
+
+@dataclass(frozen=True)
+class Glob:
+    pattern: str     # shell style wildcard pattern, i.e., 'oVT1*' ('*', '?', '[seq]')
+
+    def matches(self, value) -> bool:
+        return isinstance(value, str) and fnmatch.fnmatchcase(value, self.pattern)
+
+    def literal_prefix(self) -> str:
+        '''
+        Text every matching value starts with (the part before any wildcard)
+        '''
+        match = re.match(r'[^*?\[]*', self.pattern)
+        return match.group(0)
+
+@dataclass(frozen=True)
+class Regex:
+    pattern: str     # regular expression searched for in the value (use '^'/'$' to anchor)
+    compiled: re.Pattern = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # compile once instead of for every value checked
+        object.__setattr__(self, 'compiled', re.compile(self.pattern))
+
+    def matches(self, value) -> bool:
+        return isinstance(value, str) and self.compiled.search(value) is not None
+
+    def literal_prefix(self) -> str:
+        # any value might match a regular expression
+        return ''
+
+
+# predicates that can be used as query values
+PATTERNS = (Prefix, Glob, Regex)
+# fields of a Sample that can be searched
+SAMPLE_KEYS = {'label', 'sidelabel', 'concentration', 'construct', 'culture', 'clone'}
+# fields holding text, the only ones that can be searched w/ a pattern
+TEXT_KEYS = {'label', 'sidelabel', 'construct'}
+
+def check_query(query: dict):
+    '''
+    Check that query is a valid find_sample query, raises ValueError if not
+    '''
+    # check if query has invalid keys
+    if set(query.keys()) - SAMPLE_KEYS:
+        raise ValueError('Can only search for sample attributes')
+
+    # pattern predicates only work on text fields
+    for key, value in query.items():
+        if isinstance(value, PATTERNS) and key not in TEXT_KEYS:
+            raise ValueError('Prefix, Glob and Regex can only be used for label, sidelabel and construct')
+
+def equal_keys(mapping, value) -> list:
+    '''
+    Keys of mapping (i.e., an index by field value) equal to a query value
+
+    A query compares values w/ ==, so a value that can't be hashed (i.e., a 
+    list) is compared w/ every key instead of being looked up, it usually 
+    matches nothing
+    '''
+    try:
+        return [value] if value in mapping else []
+    except TypeError:
+        return [key for key in mapping if key == value]
+
+def matches_query(query: dict, sample) -> bool:
+    '''
+    Check if sample matches every key of a (checked) find_sample query
+    '''
+    for key, value in query.items():
+        sample_value = getattr(sample, key)
+        if isinstance(value, PATTERNS):
+            if not value.matches(sample_value):
+                return False
+        elif sample_value != value:
+            return False
+    return True
@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from .concentration import Concentration
 from .culture import Culture
 
-@dataclass(frozen=True)
+# slots: no __dict__ per instance, an inventory holds hundreds of thousands
+@dataclass(frozen=True, slots=True)
 class Sample:
     label: str                  # What's written on the top of the tube
     sidelabel: str              # What's written on the side of the tube
@@ -0,0 +1,108 @@
+from .models.query import matches_query
+from collections import OrderedDict
+from typing import Hashable, List
+import threading
+
+# LRU cache of find_sample results, keyed by Inventory.version and query.
+#
+# Inventories never change, so a result stays right for its version. When
+# InventoryManager makes a new version from an old one, it passes the samples
+# that were taken out or put in (carry_forward). Results of queries that can't
+# match any of them are the same for the new version and are copied to it,
+# the others are left to be computed again. A change to construct X only
+# drops the queries that could match a sample of X.
+
+# changes w/ more samples than this (i.e., adding a full box) don't carry
+# results over, checking every cached query against them would cost more
+# than running the queries again
+_MAX_CARRIED_SAMPLES = 256
+
+
+class QueryCache:
+    '''
+    Least recently used find_sample results for up to max_size (version, query) pairs
+    '''
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        # (version, query key) -> (query, tuple of locations), oldest first
+        self._entries = OrderedDict()
+        # version -> query keys cached for it
+        self._keys_by_version = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.carried = 0       # results copied to a newer version
+        self.invalidated = 0   # results not copied because the change could affect them
+
+    @staticmethod
+    def key(query: dict) -> Hashable:
+        '''
+        Same key for queries w/ the same keys and values, in any order
+        (None if a value can't be hashed)
+        '''
+        try:
+            return frozenset(query.items())
+        except TypeError:
+            return None
+
+    def get(self, version: int, key: Hashable) -> List:
+        '''
+        Cached locations for query key on version, or None
+        '''
+        with self._lock:
+            entry = self._entries.get((version, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((version, key))
+            self.hits += 1
+        return list(entry[1])
+
+    def put(self, version: int, key: Hashable, query: dict, locations: List):
+        with self._lock:
+            self._put(version, key, query, tuple(locations))
+
+    def carry_forward(self, old_version: int, new_version: int, changed_samples: List):
+        '''
+        Copy results of old_version that can't be affected by the changed
+        samples (taken out or put in) to new_version
+        '''
+        if len(changed_samples) > _MAX_CARRIED_SAMPLES:
+            return
+        with self._lock:
+            carried = []
+            for key in self._keys_by_version.get(old_version, ()):
+                query, locations = self._entries[(old_version, key)]
+                if any(matches_query(query, sample) for sample in changed_samples):
+                    self.invalidated += 1
+                else:
+                    carried.append((key, query, locations))
+            # put after the loop, putting can evict the entries of old_version
+            for key, query, locations in carried:
+                self._put(new_version, key, query, locations)
+            self.carried += len(carried)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_version.clear()
+
+    def stats(self) -> dict:
+        '''
+        Hit/miss counts, number of carried/invalidated results and cache size
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'carried': self.carried,
+                    'invalidated': self.invalidated, 'size': len(self._entries), 'max_size': self.max_size}
+
+    def _put(self, version: int, key: Hashable, query: dict, locations: tuple):
+        # lock is held
+        self._entries[(version, key)] = (query, locations)
+        self._entries.move_to_end((version, key))
+        self._keys_by_version.setdefault(version, set()).add(key)
+        while len(self._entries) > self.max_size:
+            (old_version, old_key), _ = self._entries.popitem(last=False)
+            keys = self._keys_by_version[old_version]
+            keys.discard(old_key)
+            if not keys:
+                del self._keys_by_version[old_version]
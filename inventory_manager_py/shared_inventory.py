@@ -0,0 +1,184 @@
+from .inventory_manager import InventoryManager
+from .models.box import Box
+from .models.inventory import Inventory
+from .models.inventory_diff import InventoryDiff
+from .models.location import Location
+from .models.sample import Sample
+from collections import deque
+from typing import Callable, List
+import threading
+
+# Current version of an inventory shared by many threads (i.e., a web backend).
+#
+# Inventories are never changed in place, so readers just take the current
+# version and use it without a lock. A writer makes its change on the version
+# it read and then swaps it in only if that is still the current version
+# (compare-and-swap). If another writer got there first, the change is made
+# again on the newer version. Only the swap itself holds a lock.
+#
+# Journal records and change events of an attempt are held back until its
+# swap succeeds, so the journal and the change feed see each change once,
+# in the order of the versions. Records are logged during the swap, events
+# are queued then and sent after the lock is released (one thread sends at a
+# time), so a subscriber can make changes to the same SharedInventory.
+
+
+class ConflictError(ValueError):
+    '''
+    Raised when a change could not be swapped in because other writers kept
+    changing the inventory
+    '''
+
+
+class SharedInventory:
+    '''
+    Thread-safe front-end holding the current version of an inventory
+    '''
+    def __init__(self, inventory: Inventory, manager: InventoryManager = None, max_retries: int = 100):
+        '''
+        Args:
+        inventory (Inventory): First version
+        manager (InventoryManager): Manager making the changes, i.e., w/ a journal (default a new one)
+        max_retries (int): How often a change is made again on a newer version before
+        ConflictError is raised (0 to report every conflict)
+        '''
+        self.manager = manager if manager is not None else InventoryManager()
+        self.max_retries = max_retries
+        self._current = inventory
+        # number of changes swapped in so far
+        self._version = 0
+        # held only to compare and swap the current version
+        self._lock = threading.Lock()
+        # change events of swapped in versions not sent yet, in order, and 
+        # whether a thread is sending them
+        self._events = deque()
+        self._sending = False
+        # changes that had to be made again
+        self.conflicts = 0
+
+    @property
+    def current(self) -> Inventory:
+        '''
+        Current version of the inventory, never changes once read
+        '''
+        return self._current
+
+    @property
+    def version(self) -> int:
+        '''
+        Number of changes made so far
+        '''
+        return self._version
+
+    def compare_and_swap(self, expected: Inventory, new: Inventory) -> bool:
+        '''
+        Make new the current version if expected still is
+
+        Return:
+        bool: True if swapped
+        '''
+        with self._lock:
+            if self._current is not expected:
+                return False
+            self._current = new
+            self._version += 1
+            return True
+
+    def update(self, change: Callable[[Inventory], Inventory], max_retries: int = None) -> Inventory:
+        '''
+        Make a change and swap it in, making it again on the newer version if
+        another writer changed the inventory in the meantime
+
+        change can call any number of InventoryManager methods on self.manager,
+        they are all swapped in as one change. It can be called more than once,
+        so it should have no other side effects
+
+        Args:
+        change (Callable[[Inventory], Inventory]): Function making the new version from the current one
+        max_retries (int): Overrides max_retries of the SharedInventory
+
+        Return:
+        Inventory: New current version
+        '''
+        if max_retries is None:
+            max_retries = self.max_retries
+        manager = self.manager
+        for attempt in range(max_retries + 1):
+            base = self._current
+            # an error in change (i.e., the well was filled by another writer) is
+            # raised as it is, nothing was swapped in
+            with manager._holding_changes() as held:
+                new = change(base)
+
+            with self._lock:
+                if self._current is base:
+                    self._current = new
+                    self._version += 1
+                    # log/queue events in the order of the versions
+                    seq, events = manager._release_changes(held)
+                    self._events.extend(events)
+                    break
+                self.conflicts += 1
+        else:
+            raise ConflictError(f'Change conflicted w/ other changes {max_retries + 1} times')
+
+        # send events and wait for the journal outside the lock, writers share the fsync
+        self._send_events()
+        manager._sync_changes(seq)
+        return new
+
+    # HELPER FUNC
+    def _send_events(self):
+        '''
+        Send queued change events in order, unless another thread (or this 
+        one, for a change made by a subscriber) is already sending them
+        '''
+        with self._lock:
+            if self._sending:
+                return
+            self._sending = True
+        while True:
+            # checked and cleared under the lock, events queued after this are 
+            # sent by their writer
+            with self._lock:
+                if not self._events:
+                    self._sending = False
+                    return
+                event = self._events.popleft()
+            try:
+                self.manager._send(event)
+            except BaseException:
+                with self._lock:
+                    self._sending = False
+                raise
+
+    # write methods, same as InventoryManager's without the inventory
+
+    def add_sample(self, sample: Sample, position: tuple[int, int], boxname: str) -> Inventory:
+        return self.update(lambda inventory: self.manager.add_sample(sample, position, boxname, inventory))
+
+    def remove_sample(self, position: tuple[int, int], boxname: str) -> Inventory:
+        return self.update(lambda inventory: self.manager.remove_sample(position, boxname, inventory))
+
+    def add_box(self, box: Box) -> Inventory:
+        return self.update(lambda inventory: self.manager.add_box(box, inventory))
+
+    def remove_box(self, boxname: str) -> Inventory:
+        return self.update(lambda inventory: self.manager.remove_box(boxname, inventory))
+
+    def update_box(self, boxname: str, updates: dict) -> Inventory:
+        return self.update(lambda inventory: self.manager.update_box(boxname, updates, inventory))
+
+    def apply_batch(self, ops: list) -> Inventory:
+        return self.update(lambda inventory: self.manager.apply_batch(ops, inventory))
+
+    def apply_diff(self, diff: InventoryDiff) -> Inventory:
+        return self.update(lambda inventory: self.manager.apply_diff(diff, inventory))
+
+    # read methods, run on the current version without a lock
+
+    def find_sample(self, query: dict) -> List[Location]:
+        return self.manager.find_sample(query, self._current)
+
+    def retrieve_box_contents(self, boxname: str) -> List[List[Sample]]:
+        return self.manager.retrieve_box_contents(boxname, self._current)
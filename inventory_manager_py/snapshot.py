@@ -0,0 +1,793 @@
+from .models.box import Box
+from .models.concentration import Concentration
+from .models.culture import Culture
+from .models.inventory import Inventory
+from .models.location import Location
+from .models.query import PATTERNS, check_query, equal_keys
+from .models.sample import Sample
+from itertools import accumulate, groupby, repeat
+from operator import attrgetter, sub
+from typing import BinaryIO, Iterable, List, Optional
+import bisect
+import mmap
+import struct
+import zlib
+
+# Binary snapshot of all the boxes of an inventory. All numbers are little
+# endian. A file starts w/ a magic number and a version, and there are two
+# layouts:
+#
+# Version 3 (compact, written by default): header (magic, version, number of
+# boxes and samples, CRC-32 and size of the payload), then the payload as
+# one zlib stream of
+#
+#   string tables   box texts (names, descriptions and locations), labels,
+#                   sidelabels, constructs and clones: each its own table
+#                   of distinct strings in sorted order, as the number of
+#                   strings, the size of their UTF-8 text, the length of 
+#                   each string (in characters) and the text
+#   enum names      Concentration then Culture names in code order (same form)
+#   boxes           columns (uint32) of name, description and location ids,
+#                   num_row, num_col and number of samples, sorted by name
+#   samples         columns, grouped by box in row-major order: the well
+#                   (row * num_col + col) minus the well before it in the
+#                   box (-1 for the first), the label, sidelabel, construct
+#                   and clone ids minus those of the sample before (int32),
+#                   the concentration and culture codes (uint8)
+#
+# Strings are ids into the table of their field (id = size of the table
+# means None) and enums are codes (0 means None, i the ith name). Columns
+# of small numbers are mostly zero bytes and the tables are sorted, so the
+# payload deflates well, and reading it back is a few C calls per column
+# (struct, accumulate) instead of a loop per sample. load_snapshot makes
+# the indexes of the inventory from the columns (see read_inventory).
+#
+# Version 2 (indexed, written w/ search_indexes=True) is laid out for
+# random access in the file instead (see SnapshotInventory):
+#
+#   header          magic, version, counts, positions of the sections, CRC-32
+#   string offsets  (num_strings + 1) uint32 byte offsets into string data
+#   string data     every distinct string once, UTF-8, in sorted order
+#   enum names      Concentration then Culture names, as string ids
+#   boxes           one record per box, sorted by name
+#   samples         one record per sample, grouped by box, in row-major order
+#   search indexes  for label, sidelabel, construct, clone, concentration
+#                   and culture: the uint32 numbers of all samples sorted
+#                   by the id/code of that field
+#
+# Here the string table is shared by all fields (id num_strings means None),
+# enums are codes as above and the well is row * num_col + col. As the 
+# string table is sorted, the samples w/ a value (or all values w/ a prefix)
+# are next to each other in a search index, so they can be found by binary
+# search directly in the file. Version 1 is version 2 w/o search indexes.
+
+SNAPSHOT_MAGIC = b'INVSNAP\x00'
+SNAPSHOT_VERSION = 3
+# version of the indexed layout
+INDEXED_VERSION = 2
+# versions that can still be read
+_READABLE_VERSIONS = (1, 2, 3)
+
+# magic, version (first for every version)
+_PREFIX = struct.Struct('<8sI')
+
+# (version 3) magic, version, num_boxes, num_samples, CRC-32 of the payload
+# (compressed), size of the payload (uncompressed)
+_COMPACT_HEADER = struct.Struct('<8sIIIIQ')
+# string tables of the sample fields, in the order they are stored
+_TABLES = ('label', 'sidelabel', 'construct', 'clone')
+# fastest zlib level, higher levels make the payload <1% smaller and take 
+# 2-10x as long
+_COMPRESS_LEVEL = 1
+
+# (versions 1, 2) magic, version, num_strings, num_boxes, num_samples, CRC-32
+# of everything after the header, positions of: string offsets, string data,
+# enum names, boxes, samples
+_HEADER = struct.Struct('<8sIIIIIQQQQQ')
+# name, description, location, num_row, num_col, first sample, number of samples
+_BOX = struct.Struct('<IIIIIII')
+# (version 2) positions of the search indexes, right after the header
+_INDEXES = struct.Struct('<QQQQQQ')
+# well, label, sidelabel, construct, clone, concentration, culture
+_SAMPLE = struct.Struct('<IIIIIBB')
+_INDEX_ENTRY = struct.Struct('<I')
+
+# searchable sample field -> its position in a sample record,
+# in the order of the search indexes
+_FIELDS = {'label': 1, 'sidelabel': 2, 'construct': 3, 'clone': 4, 'concentration': 5, 'culture': 6}
+
+_CONCENTRATIONS = list(Concentration)
+_CULTURES = list(Culture)
+
+# marker for a string that was not decoded yet
+_MISSING = object()
+
+
+def write_snapshot(boxes: Iterable[Box], file: BinaryIO, search_indexes: bool = False):
+    '''
+    Write snapshot of boxes to a file opened in binary mode
+
+    Args:
+    boxes (Iterable[Box]): Boxes to save (names must be unique)
+    file (BinaryIO): File the snapshot is written to
+    search_indexes (bool): Write the indexed layout (version 2) that 
+        SnapshotInventory can search in place, instead of the compact one
+
+    Raises ValueError if a text attribute is not a string (or None), or an
+    enum attribute is not a Concentration/Culture (or None)
+    '''
+    boxes = sorted(boxes, key=lambda box: box.name)
+    if search_indexes:
+        _write_indexed(boxes, file)
+    else:
+        _write_compact(boxes, file)
+
+
+# HELPER FUNC
+def _write_compact(boxes: List[Box], file: BinaryIO):
+    '''
+    Write boxes (sorted by name) in the compact layout (version 3)
+    '''
+    # samples of all boxes in the order they are stored, w/ their wells
+    samples = []
+    wells = []
+    box_columns = [[] for i in range(6)]
+    for box in boxes:
+        num_row, num_col = box.get_size()
+        num_samples = len(samples)
+        well_before = -1
+        for irow, row in enumerate(box.samples):
+            for icol, sample in enumerate(row):
+                if sample:
+                    samples.append(sample)
+                    wells.append(irow * num_col + icol - well_before)
+                    well_before = irow * num_col + icol
+        for column, value in zip(box_columns, (box.name, box.description, box.location,
+                                               num_row, num_col, len(samples) - num_samples)):
+            column.append(value)
+
+    # sorted table of the distinct strings of each field, the ids of the samples in it
+    box_strings = _sorted_strings(set(box_columns[0] + box_columns[1] + box_columns[2]))
+    box_ids = _string_ids(box_strings)
+    box_columns[:3] = [list(map(box_ids.__getitem__, column)) for column in box_columns[:3]]
+    tables = []
+    columns = []
+    for key in _TABLES:
+        values = list(map(attrgetter(key), samples))
+        tables.append(_sorted_strings(set(values)))
+        columns.append(list(map(_string_ids(tables[-1]).__getitem__, values)))
+
+    codes = []
+    for key, members in (('concentration', _CONCENTRATIONS), ('culture', _CULTURES)):
+        member_codes = {member: code for code, member in enumerate([None] + members)}
+        try:
+            codes.append(list(map(member_codes.__getitem__, map(attrgetter(key), samples))))
+        except (KeyError, TypeError):
+            sample = next(sample for sample in samples if getattr(sample, key) not in members + [None])
+            box = next(box for box in boxes if any(sample in row for row in box.samples))
+            raise ValueError(f'Can not save sample {sample.label} of box {box.name} in a snapshot, '
+                             'concentration/culture must be a Concentration/Culture or None')
+
+    parts = [_pack_table(table) for table in [box_strings] + tables]
+    parts += [_pack_table([conc.name for conc in _CONCENTRATIONS]), _pack_table([culture.name for culture in _CULTURES])]
+    parts += [_pack_column(column, 'I') for column in box_columns]
+    parts.append(_pack_column(wells, 'I'))
+    # ids minus the id before, ids of nearby samples are close in their sorted table
+    parts += [_pack_column(list(map(sub, column, [0] + column)), 'i') for column in columns]
+    parts += [_pack_column(column, 'B') for column in codes]
+
+    payload = b''.join(parts)
+    compressed = zlib.compress(payload, _COMPRESS_LEVEL)
+    file.write(_COMPACT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(boxes), len(samples),
+                                    zlib.crc32(compressed), len(payload)))
+    file.write(compressed)
+
+
+# HELPER FUNC
+def _write_indexed(boxes: List[Box], file: BinaryIO):
+    '''
+    Write boxes (sorted by name) in the indexed layout (version 2)
+    '''
+    # collect every distinct string
+    strings = {name for enum in (Concentration, Culture) for name in enum.__members__}
+    for box in boxes:
+        strings.update((box.name, box.description, box.location))
+        for row in box.samples:
+            for sample in row:
+                if sample:
+                    strings.update((sample.label, sample.sidelabel, sample.construct, sample.clone))
+    strings = _sorted_strings(strings)
+
+    # string -> id, None gets the id after the last string
+    string_ids = _string_ids(strings)
+    conc_codes = {conc: code for code, conc in enumerate([None] + _CONCENTRATIONS)}
+    culture_codes = {culture: code for code, culture in enumerate([None] + _CULTURES)}
+
+    # string table
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    string_offsets = struct.pack(f'<{len(offsets)}I', *offsets)
+    string_data = b''.join(encoded)
+
+    # enum names
+    enum_names = [len(_CONCENTRATIONS)] + [string_ids[conc.name] for conc in _CONCENTRATIONS]
+    enum_names += [len(_CULTURES)] + [string_ids[culture.name] for culture in _CULTURES]
+    enum_names = struct.pack(f'<{len(enum_names)}I', *enum_names)
+
+    # box and sample records
+    box_records = []
+    sample_records = []
+    for box in boxes:
+        num_row, num_col = box.get_size()
+        first_sample = len(sample_records)
+        for irow, row in enumerate(box.samples):
+            for icol, sample in enumerate(row):
+                if not sample:
+                    continue
+                try:
+                    conc_code = conc_codes[sample.concentration]
+                    culture_code = culture_codes[sample.culture]
+                except (KeyError, TypeError):
+                    raise ValueError(f'Can not save sample {sample.label} of box {box.name} in a snapshot, '
+                                     'concentration/culture must be a Concentration/Culture or None')
+                sample_records.append((irow * num_col + icol, string_ids[sample.label],
+                                       string_ids[sample.sidelabel], string_ids[sample.construct],
+                                       string_ids[sample.clone], conc_code, culture_code))
+        box_records.append(_BOX.pack(string_ids[box.name], string_ids[box.description], string_ids[box.location],
+                                     num_row, num_col, first_sample, len(sample_records) - first_sample))
+
+    # search indexes, sample numbers sorted by field
+    # (sort is stable, so samples w/ the same value stay in order)
+    search_indexes = []
+    for field in _FIELDS.values():
+        values = [record[field] for record in sample_records]
+        order = sorted(range(len(values)), key=values.__getitem__)
+        search_indexes.append(struct.pack(f'<{len(order)}I', *order))
+
+    # sections in the order they are written
+    pack_sample = _SAMPLE.pack
+    sections = [string_offsets, string_data, enum_names, b''.join(box_records),
+                b''.join(pack_sample(*record) for record in sample_records)] + search_indexes
+    positions = []
+    position = _HEADER.size + _INDEXES.size
+    crc = 0
+    for section in sections:
+        positions.append(position)
+        position += len(section)
+        crc = zlib.crc32(section, crc)
+
+    file.write(_HEADER.pack(SNAPSHOT_MAGIC, INDEXED_VERSION, len(strings), len(boxes),
+                            len(sample_records), crc, *positions[:5]))
+    file.write(_INDEXES.pack(*positions[5:]))
+    for section in sections:
+        file.write(section)
+
+
+# HELPER FUNC
+def _sorted_strings(strings: set) -> List[str]:
+    '''
+    Strings of a table in sorted order, w/o None
+    '''
+    strings.discard(None)
+    for string in strings:
+        if not isinstance(string, str):
+            raise ValueError(f'Can not save {string!r} in a snapshot, text must be a str or None')
+    return sorted(strings)
+
+
+# HELPER FUNC
+def _string_ids(strings: List[str]) -> dict:
+    # None gets the id after the last string
+    string_ids = {string: i for i, string in enumerate(strings)}
+    string_ids[None] = len(strings)
+    return string_ids
+
+
+# HELPER FUNC
+def _pack_table(strings: List[str]) -> bytes:
+    text = ''.join(strings).encode('utf-8')
+    return struct.pack(f'<II{len(strings)}I', len(strings), len(text), *map(len, strings)) + text
+
+
+# HELPER FUNC
+def _pack_column(values: List[int], code: str) -> bytes:
+    return struct.pack(f'<{len(values)}{code}', *values)
+
+
+class _Payload:
+    '''
+    Reads the tables and columns of a version 3 payload in order
+    '''
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def column(self, count: int, code: str) -> tuple:
+        values = struct.unpack_from(f'<{count}{code}', self.data, self.position)
+        self.position += count * struct.calcsize(code)
+        return values
+
+    def table(self) -> List[str]:
+        count, size = self.column(2, 'I')
+        offsets = list(accumulate(self.column(count, 'I'), initial=0))
+        if self.position + size > len(self.data):
+            raise ValueError('Snapshot is truncated or corrupted')
+        text = str(self.data[self.position:self.position + size], 'utf-8')
+        self.position += size
+        if offsets[-1] != len(text):
+            raise ValueError('Snapshot is truncated or corrupted')
+        return list(map(text.__getitem__, map(slice, offsets, offsets[1:])))
+
+
+def read_snapshot(data) -> List[Box]:
+    '''
+    Read the boxes saved in a snapshot
+
+    Args:
+    data (bytes-like): Content of a snapshot file (bytes, mmap, ...)
+
+    Return:
+    List[Box]: Boxes in the snapshot, sorted by name
+
+    Raises ValueError if data is not a valid snapshot
+    '''
+    header = read_header(data)
+    if header['version'] >= 3:
+        return _read_compact(data, header)[0]
+
+    strings = read_strings(data, header)
+    conc_table, culture_table = read_enum_tables(data, header, strings.__getitem__)
+
+    # boxes and their samples
+    boxes = []
+    samples_pos = header['samples_pos']
+    for name, description, location, num_row, num_col, first_sample, num_samples in _BOX.iter_unpack(
+            data[header['boxes_pos']:header['boxes_pos'] + header['num_boxes'] * _BOX.size]):
+        grid = [[None] * num_col for i in range(num_row)]
+        start = samples_pos + first_sample * _SAMPLE.size
+        for well, label, sidelabel, construct, clone, conc, culture in _SAMPLE.iter_unpack(
+                data[start:start + num_samples * _SAMPLE.size]):
+            grid[well // num_col][well % num_col] = Sample(strings[label], strings[sidelabel], conc_table[conc],
+                                                           strings[construct], culture_table[culture], strings[clone])
+        boxes.append(Box(strings[name], strings[description], strings[location], grid))
+    return boxes
+
+
+def read_inventory(data) -> Inventory:
+    '''
+    Read a snapshot as an inventory
+
+    The indexes of the inventory are made from the columns of the snapshot:
+    the samples are grouped by value by sorting their ids, so no loop over
+    the samples adds them to the indexes one by one (see 
+    Inventory.from_groups)
+
+    Args:
+    data (bytes-like): Content of a snapshot file
+
+    Return:
+    Inventory: Inventory w/ the boxes in the snapshot
+
+    Raises ValueError if data is not a valid snapshot
+    '''
+    header = read_header(data)
+    if header['version'] < 3:
+        boxes = read_snapshot(data)
+        return Inventory.from_locations(boxes, ((Location(box.name, i, j, sample.label, sample.sidelabel), sample)
+                                                for box in boxes for i, row in enumerate(box.samples)
+                                                for j, sample in enumerate(row) if sample))
+
+    boxes, locations, values, ids, tables = _read_compact(data, header, with_locations=True)
+    groups = {}
+    for key, column in ids.items():
+        # sample numbers in order of their id, i.e. grouped by value
+        order = sorted(range(len(column)), key=column.__getitem__)
+        table = tables[key]
+        groups[key] = {table[value_id]: dict.fromkeys(map(locations.__getitem__, numbers), True)
+                       for value_id, numbers in groupby(order, column.__getitem__)}
+    # lookups from location are the groups put together (copying a dict
+    # into another reuses the hashes of its keys, a Location is hashed
+    # in Python)
+    loc_to = {}
+    for attr, key in (('loc_to_conc', 'concentration'), ('loc_to_clone', 'clone'), ('loc_to_culture', 'culture')):
+        loc_to[attr] = {}
+        for value, locs in groups[key].items():
+            loc_to[attr].update(dict.fromkeys(locs, value))
+    return Inventory.from_groups(boxes, loc_to, groups)
+
+
+# HELPER FUNC
+def _read_compact(data, header: dict, with_locations: bool = False) -> tuple:
+    '''
+    Decode a version 3 snapshot
+
+    Return:
+    tuple: boxes, the Location of each sample (if with_locations, else 
+    empty), sample field -> value of each sample, sample field -> id/code
+    of each sample and sample field -> table of its ids/codes
+    '''
+    num_boxes, num_samples = header['num_boxes'], header['num_samples']
+    try:
+        payload = _Payload(zlib.decompress(data[_COMPACT_HEADER.size:]))
+        if len(payload.data) != header['payload_size']:
+            raise ValueError('Snapshot is truncated or corrupted')
+        box_strings = payload.table() + [None]
+        tables = {key: payload.table() + [None] for key in _TABLES}
+        for key, enum in (('concentration', Concentration), ('culture', Culture)):
+            try:
+                tables[key] = [None] + [enum[name] for name in payload.table()]
+            except KeyError as e:
+                raise ValueError(f'Snapshot has unknown {enum.__name__} {e}')
+        box_columns = [payload.column(num_boxes, 'I') for i in range(6)]
+        well_steps = payload.column(num_samples, 'I')
+        ids = {key: list(accumulate(payload.column(num_samples, 'i'))) for key in _TABLES}
+        ids['concentration'] = payload.column(num_samples, 'B')
+        ids['culture'] = payload.column(num_samples, 'B')
+        if payload.position != len(payload.data) or sum(box_columns[5]) != num_samples:
+            raise ValueError('Snapshot is truncated or corrupted')
+        if any(column and min(column) < 0 for column in ids.values()):
+            raise ValueError('Snapshot is truncated or corrupted')
+        values = {key: list(map(tables[key].__getitem__, column)) for key, column in ids.items()}
+        samples = list(map(Sample, values['label'], values['sidelabel'], values['concentration'],
+                           values['construct'], values['culture'], values['clone']))
+
+        boxes = []
+        locations = []
+        start = 0
+        for name, description, location, num_row, num_col, count in zip(*box_columns):
+            name = box_strings[name]
+            end = start + count
+            wells = list(accumulate(well_steps[start:end], initial=-1))[1:]
+            rows = [well // num_col for well in wells]
+            cols = [well % num_col for well in wells]
+            grid = [[None] * num_col for i in range(num_row)]
+            for row, col, sample in zip(rows, cols, samples[start:end]):
+                grid[row][col] = sample
+            if with_locations:
+                locations.extend(map(Location, repeat(name, count), rows, cols,
+                                     values['label'][start:end], values['sidelabel'][start:end]))
+            boxes.append(Box(name, box_strings[description], box_strings[location], grid))
+            start = end
+    except (zlib.error, struct.error, IndexError, UnicodeDecodeError):
+        raise ValueError('Snapshot is truncated or corrupted')
+
+    return boxes, locations, values, ids, tables
+
+
+def read_header(data, check_crc: bool = True) -> dict:
+    '''
+    Read and check the header of a snapshot
+
+    Args:
+    data (bytes-like): Content of a snapshot file
+    check_crc (bool): Also check the CRC-32 of the rest of the file
+
+    Return:
+    dict: Fields of the header
+    '''
+    if len(data) < _PREFIX.size:
+        raise ValueError('Not a snapshot: file is too short')
+    magic, version = _PREFIX.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError('Not a snapshot: wrong magic number')
+    if version not in _READABLE_VERSIONS:
+        raise ValueError(f'Snapshot version {version} is not supported (supported: {_READABLE_VERSIONS})')
+
+    if version >= 3:
+        if len(data) < _COMPACT_HEADER.size:
+            raise ValueError('Snapshot is truncated or corrupted')
+        _, _, num_boxes, num_samples, crc, payload_size = _COMPACT_HEADER.unpack_from(data)
+        if check_crc and zlib.crc32(data[_COMPACT_HEADER.size:]) != crc:
+            raise ValueError('Snapshot is corrupted: CRC-32 does not match')
+        return {'version': version, 'num_boxes': num_boxes, 'num_samples': num_samples,
+                'payload_size': payload_size}
+
+    if len(data) < _HEADER.size:
+        raise ValueError('Snapshot is truncated or corrupted')
+    (magic, version, num_strings, num_boxes, num_samples, crc,
+     offsets_pos, strings_pos, enums_pos, boxes_pos, samples_pos) = _HEADER.unpack_from(data)
+
+    # version 1 has no search indexes
+    header_size = _HEADER.size
+    index_positions = {}
+    end = samples_pos + num_samples * _SAMPLE.size
+    if version >= 2:
+        if len(data) < _HEADER.size + _INDEXES.size:
+            raise ValueError('Snapshot is truncated or corrupted')
+        header_size += _INDEXES.size
+        index_positions = dict(zip(_FIELDS, _INDEXES.unpack_from(data, _HEADER.size)))
+        end = index_positions['culture'] + num_samples * _INDEX_ENTRY.size
+
+    if len(data) != end:
+        raise ValueError('Snapshot is truncated or corrupted')
+    if check_crc and zlib.crc32(data[header_size:]) != crc:
+        raise ValueError('Snapshot is corrupted: CRC-32 does not match')
+    return {'version': version, 'num_strings': num_strings, 'num_boxes': num_boxes, 'num_samples': num_samples,
+            'offsets_pos': offsets_pos, 'strings_pos': strings_pos, 'enums_pos': enums_pos,
+            'boxes_pos': boxes_pos, 'samples_pos': samples_pos, 'index_positions': index_positions}
+
+
+def read_strings(data, header: dict) -> List[str]:
+    '''
+    Decode the string table (versions 1, 2), the last item is None (id num_strings)
+    '''
+    num_strings = header['num_strings']
+    offsets = struct.unpack_from(f'<{num_strings + 1}I', data, header['offsets_pos'])
+    string_data = bytes(data[header['strings_pos']:header['strings_pos'] + offsets[-1]])
+    strings = [string_data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+    strings.append(None)
+    return strings
+
+
+def read_enum_tables(data, header: dict, string):
+    '''
+    Tables of code -> Concentration and code -> Culture (code 0 is None) of
+    versions 1, 2, string(id) gives the string w/ an id
+    '''
+    position = header['enums_pos']
+    tables = []
+    for enum in (Concentration, Culture):
+        (count,) = struct.unpack_from('<I', data, position)
+        ids = struct.unpack_from(f'<{count}I', data, position + 4)
+        position += 4 + 4 * count
+        try:
+            tables.append([None] + [enum[string(i)] for i in ids])
+        except KeyError as e:
+            raise ValueError(f'Snapshot has unknown {enum.__name__} {e}')
+    return tables
+
+
+class SnapshotInventory:
+    '''
+    Read-only inventory backed by a memory-mapped snapshot file (indexed
+    layout, i.e. saved w/ search_indexes=True)
+
+    Nothing is decoded when the file is opened: `find_sample` uses the search
+    indexes of the snapshot by binary search in the file, and only the
+    Samples/Locations that are returned are made. Processes that open the
+    same file share one copy of it in memory (the OS page cache)
+    '''
+    def __init__(self, filepath: str, verify: bool = False):
+        '''
+        Args:
+        filepath (str): Filepath of a snapshot saved by save_snapshot w/ search_indexes=True
+        verify (bool): Check the CRC-32 of the whole file (reads all of it)
+        '''
+        # will error if unable to access filepath (or the file is empty)
+        with open(filepath, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header = read_header(self._data, check_crc=verify)
+            if header['version'] != INDEXED_VERSION:
+                raise ValueError(f'Snapshot version {header["version"]} has no search indexes, '
+                                 'load it and save it again w/ search_indexes=True to open it')
+        except BaseException:
+            self._data.close()
+            raise
+
+        self._num_strings = header['num_strings']
+        self._num_samples = header['num_samples']
+        self._offsets_pos = header['offsets_pos']
+        self._strings_pos = header['strings_pos']
+        self._samples_pos = header['samples_pos']
+        self._index_positions = header['index_positions']
+        # id -> string, for the strings decoded so far
+        self._strings = {self._num_strings: None}
+
+        conc_table, culture_table = read_enum_tables(self._data, header, self._string)
+        self._enum_tables = {'concentration': conc_table, 'culture': culture_table}
+        self._enum_codes = {key: {member: code for code, member in enumerate(table)}
+                            for key, table in self._enum_tables.items()}
+
+        # box records are small, boxes are found by name id or sample number
+        self._boxes = list(_BOX.iter_unpack(
+            self._data[header['boxes_pos']:header['boxes_pos'] + header['num_boxes'] * _BOX.size]))
+        self._box_name_ids = [box[0] for box in self._boxes]
+        self._box_first_samples = [box[5] for box in self._boxes]
+
+    def close(self):
+        '''
+        Unmap the file, the inventory can't be used after
+        '''
+        self._data.close()
+
+    def __enter__(self) -> 'SnapshotInventory':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        # number of samples
+        return self._num_samples
+
+    def box_names(self) -> List[str]:
+        '''
+        Names of all the boxes, in sorted order
+        '''
+        return [self._string(name_id) for name_id in self._box_name_ids]
+
+    def get_box(self, boxname: str) -> Optional[Box]:
+        '''
+        Box w/ boxname (samples are decoded now), or None if there is no such box
+        '''
+        name_id = self._find_string(boxname)
+        ibox = bisect.bisect_left(self._box_name_ids, name_id) if name_id is not None else len(self._boxes)
+        if ibox == len(self._boxes) or self._box_name_ids[ibox] != name_id:
+            return None
+
+        name, description, location, num_row, num_col, first_sample, num_samples = self._boxes[ibox]
+        grid = [[None] * num_col for i in range(num_row)]
+        for number in range(first_sample, first_sample + num_samples):
+            record = self._record(number)
+            grid[record[0] // num_col][record[0] % num_col] = self._sample(record)
+        return Box(boxname, self._string(description), self._string(location), grid)
+
+    def retrieve_box_contents(self, boxname: str) -> List[List[Sample]]:
+        '''
+        Contents of box w/ boxname, same as InventoryManager.retrieve_box_contents
+        '''
+        box = self.get_box(boxname)
+        if box == None:
+            raise ValueError(f'Box: {boxname} does not exist in inventory')
+        return box.samples
+
+    def find_sample(self, query: dict) -> List[Location]:
+        '''
+        Locations of samples matching query, same as InventoryManager.find_sample
+        (locations are sorted by box name, then row and column)
+        '''
+        check_query(query)
+
+        # (number of samples, ranges of a search index, field, accepted ids/codes) for each key
+        sources = []
+        for key, value in query.items():
+            values = self._matching_values(key, value)
+            ranges = self._index_ranges(key, values)
+            sources.append((sum(end - start for start, end in ranges), ranges, key, set(values)))
+
+        # no keys, every sample matches
+        if not sources:
+            numbers = range(self._num_samples)
+        else:
+            # start from the smallest (most selective) key and check the others on it
+            sources.sort(key=lambda source: source[0])
+            _, ranges, key, _ = sources[0]
+            index_pos = self._index_positions[key]
+            numbers = [_INDEX_ENTRY.unpack_from(self._data, index_pos + i * _INDEX_ENTRY.size)[0]
+                       for start, end in ranges for i in range(start, end)]
+            numbers.sort()
+
+        checks = [(_FIELDS[key], accepted) for _, _, key, accepted in sources[1:]]
+        locations = []
+        for number in numbers:
+            record = self._record(number)
+            if all(record[field] in accepted for field, accepted in checks):
+                locations.append(self._location(number, record))
+        return locations
+
+    # HELPER FUNC
+    def _matching_values(self, key: str, value) -> List[int]:
+        '''
+        Sorted string ids/enum codes that match a query value for key
+        '''
+        if key in self._enum_codes:
+            codes = self._enum_codes[key]
+            return sorted(codes[member] for member in equal_keys(codes, value))
+
+        if isinstance(value, PATTERNS):
+            # only strings w/ the literal prefix can match
+            start, end = self._prefix_range(value.literal_prefix())
+            return [i for i in range(start, end) if value.matches(self._string(i))]
+
+        string_id = self._find_string(value)
+        return [] if string_id is None else [string_id]
+
+    # HELPER FUNC
+    def _index_ranges(self, key: str, values: List[int]) -> List[tuple]:
+        '''
+        Ranges of the search index for key holding the samples w/ one of values
+        '''
+        # consecutive values are next to each other in the index, find them at once
+        runs = []
+        for value in values:
+            if runs and runs[-1][1] == value:
+                runs[-1][1] = value + 1
+            else:
+                runs.append([value, value + 1])
+        ranges = [(self._index_bound(key, start), self._index_bound(key, end)) for start, end in runs]
+        return [(start, end) for start, end in ranges if start < end]
+
+    # HELPER FUNC
+    def _index_bound(self, key: str, value: int) -> int:
+        '''
+        First position in the search index for key whose sample has a value >= value
+        '''
+        index_pos = self._index_positions[key]
+        field = _FIELDS[key]
+        low, high = 0, self._num_samples
+        while low < high:
+            mid = (low + high) // 2
+            number = _INDEX_ENTRY.unpack_from(self._data, index_pos + mid * _INDEX_ENTRY.size)[0]
+            if self._record(number)[field] < value:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    # HELPER FUNC
+    def _string(self, string_id: int) -> str:
+        '''
+        Decode string w/ an id (None for id num_strings)
+        '''
+        string = self._strings.get(string_id, _MISSING)
+        if string is _MISSING:
+            start, end = struct.unpack_from('<II', self._data, self._offsets_pos + 4 * string_id)
+            string = str(self._data[self._strings_pos + start:self._strings_pos + end], 'utf-8')
+            self._strings[string_id] = string
+        return string
+
+    # HELPER FUNC
+    def _find_string(self, text) -> Optional[int]:
+        '''
+        Id of text in the string table (binary search), None if it is not there
+        '''
+        if text is None:
+            return self._num_strings
+        if not isinstance(text, str):
+            return None
+        low, high = 0, self._num_strings
+        while low < high:
+            mid = (low + high) // 2
+            if self._string(mid) < text:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self._num_strings and self._string(low) == text:
+            return low
+        return None
+
+    # HELPER FUNC
+    def _prefix_range(self, prefix: str) -> tuple:
+        '''
+        Range of ids of the strings starting w/ prefix
+        '''
+        # first string >= prefix
+        low, high = 0, self._num_strings
+        while low < high:
+            mid = (low + high) // 2
+            if self._string(mid) < prefix:
+                low = mid + 1
+            else:
+                high = mid
+        start = low
+        # strings w/ the prefix come right after it
+        high = self._num_strings
+        while low < high:
+            mid = (low + high) // 2
+            if self._string(mid).startswith(prefix):
+                low = mid + 1
+            else:
+                high = mid
+        return start, low
+
+    # HELPER FUNC
+    def _record(self, number: int) -> tuple:
+        return _SAMPLE.unpack_from(self._data, self._samples_pos + number * _SAMPLE.size)
+
+    # HELPER FUNC
+    def _sample(self, record: tuple) -> Sample:
+        well, label, sidelabel, construct, clone, conc, culture = record
+        return Sample(self._string(label), self._string(sidelabel), self._enum_tables['concentration'][conc],
+                      self._string(construct), self._enum_tables['culture'][culture], self._string(clone))
+
+    # HELPER FUNC
+    def _location(self, number: int, record: tuple) -> Location:
+        # box holding sample w/ this number
+        # (a box w/o samples has the same first sample as the box after it)
+        ibox = bisect.bisect_right(self._box_first_samples, number) - 1
+        name_id, num_col = self._boxes[ibox][0], self._boxes[ibox][4]
+        return Location(self._string(name_id), record[0] // num_col, record[0] % num_col,
+                        self._string(record[1]), self._string(record[2]))
@@ -39,4 +39,51 @@ class TestInventoryManager(unittest.TestCase):
         num_samples = box.get_num_samples()
 
         # check result
-        self.assertEqual(num_samples, 6)
\ No newline at end of file
+        self.assertEqual(num_samples, 6)
+
+    def test_free_wells(self):
+        im = InventoryManager()
+        inventory = Inventory([], {}, {}, {}, {})
+        box = im.make_empty_box('primers1', 'box for primers', 'minus20', (2,3))
+        inventory = im.add_box(box, inventory)
+
+        # empty box
+        self.assertEqual(box.first_empty_well(), (0, 0))
+        self.assertEqual(len(box.free_wells()), 6)
+        self.assertEqual(list(box.iter_samples()), [])
+
+        # fill first row and one well of the second
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        for position in [(0, 0), (0, 1), (0, 2), (1, 1)]:
+            inventory = im.add_sample(sample, position, 'primers1', inventory)
+        box = inventory.boxes.get('primers1')
+        self.assertEqual(box.get_num_samples(), 4)
+        self.assertEqual(box.first_empty_well(), (1, 0))
+        self.assertEqual(box.free_wells(), [(1, 0), (1, 2)])
+        self.assertEqual([position for position, s in box.iter_samples()],
+                         [(0, 0), (0, 1), (0, 2), (1, 1)])
+
+        # bitmap follows removed samples
+        inventory = im.remove_sample((0, 1), 'primers1', inventory)
+        box = inventory.boxes.get('primers1')
+        self.assertEqual(box.get_num_samples(), 3)
+        self.assertEqual(box.first_empty_well(), (0, 1))
+
+        # full box, filled before it was first counted
+        full = im.make_empty_box('full', 'full box', 'minus20', (2,2))
+        for i in range(2):
+            for j in range(2):
+                full.samples[i][j] = sample
+        self.assertIsNone(full.first_empty_well())
+        self.assertEqual(full.free_wells(), [])
+        self.assertEqual(full.get_num_samples(), 4)
+
+        # box filled directly after it was counted, then added
+        filled = im.make_empty_box('filled', 'filled box', 'minus20', (2,2))
+        self.assertEqual(filled.get_num_samples(), 0)
+        filled.samples[1][0] = sample
+        self.assertEqual(filled.get_num_samples(), 1)
+        self.assertEqual(filled.free_wells(), [(0, 0), (0, 1), (1, 1)])
+        inventory = im.add_box(filled, inventory)
+        self.assertEqual(inventory.boxes.get('filled').get_num_samples(), 1)
+        self.assertNotIn(('filled', (1, 0)), im.find_free_wells(inventory, count=3, location='minus20'))
@@ -0,0 +1,77 @@
+import unittest
+from inventory_manager_py import Inventory, Box, BoxRegistry, Sample, Concentration
+from inventory_manager_py.inventory_manager import InventoryManager
+
+class TestBoxRegistry(unittest.TestCase):
+    def test_lookup_by_name(self):
+        im = InventoryManager()
+        # create registry with a few boxes
+        box1 = im.make_empty_box('primers1', 'box for primers', 'minus20', (2,2))
+        box2 = im.make_empty_box('primers2', 'box for primers', 'minus20', (2,2))
+        registry = BoxRegistry([box1, box2])
+
+        # check boxes can be found by name
+        self.assertEqual(registry.get('primers1'), box1)
+        self.assertEqual(registry.get('primers2'), box2)
+        self.assertIsNone(registry.get('primers3'))
+        # registry keeps its own copies, filling a given box doesn't change it
+        box1.samples[0][0] = Sample('primer1', 'pcr primer1', Concentration.uM10, 'p1', None, '1')
+        self.assertIsNone(registry.get('primers1').samples[0][0])
+        self.assertEqual(registry.get('primers1').get_num_samples(), 0)
+        self.assertEqual(box1.get_num_samples(), 1)
+        box1.samples[0][0] = None
+        # a box already in a registry is not copied again
+        self.assertIs(BoxRegistry([registry.get('primers1')]).get('primers1'), registry.get('primers1'))
+
+        # check registry still acts like a list of boxes
+        self.assertEqual(len(registry), 2)
+        self.assertIn(registry[0], [box1, box2])
+        self.assertIn(box2, registry)
+        self.assertCountEqual(list(registry), [box1, box2])
+
+        # boxes with the same name are not allowed
+        with self.assertRaises(ValueError):
+            BoxRegistry([box1, box1])
+
+    def test_set_and_delete(self):
+        im = InventoryManager()
+        box1 = im.make_empty_box('primers1', 'box for primers', 'minus20', (2,2))
+        box2 = im.make_empty_box('primers2', 'box for primers', 'minus20', (2,2))
+        registry = BoxRegistry([box1, box2])
+        box1 = registry.get('primers1')
+
+        # replacing a box gives a new registry
+        new_box1 = Box('primers1', 'new description', 'minus80', box1.samples)
+        new_registry = registry.set(new_box1)
+        self.assertEqual(len(new_registry), 2)
+        self.assertIs(new_registry.get('primers1'), new_box1)
+        self.assertNotIn(box1, new_registry)
+        # old registry is unchanged
+        self.assertIs(registry.get('primers1'), box1)
+
+        # deleting a box gives a new registry
+        smaller_registry = new_registry.delete('primers2')
+        self.assertEqual(len(smaller_registry), 1)
+        self.assertEqual(len(new_registry), 2)
+
+        # deleting a missing box errors
+        with self.assertRaises(KeyError):
+            smaller_registry.delete('primers2')
+
+    def test_inventory_uses_registry(self):
+        im = InventoryManager()
+        # inventory made from a plain list gets a registry
+        inventory = Inventory([], {}, {}, {}, {})
+        self.assertIsInstance(inventory.boxes, BoxRegistry)
+
+        box = im.make_empty_box('primers1', 'box for primers', 'minus20', (8,8))
+        sample = Sample('primer1', 'pcr primer1', Concentration.uM10, 'p1', None, '1')
+        inventory = im.add_box(box, inventory)
+        inventory = im.add_sample(sample, (0, 0), 'primers1', inventory)
+
+        # updated box replaces the old one under the same name
+        self.assertEqual(len(inventory.boxes), 1)
+        self.assertEqual(inventory.boxes.get('primers1').samples[0][0], sample)
+
+if __name__ == '__main__':
+    unittest.main()
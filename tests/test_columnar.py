@@ -0,0 +1,74 @@
+import unittest
+from inventory_manager_py import Inventory, Sample, Concentration, Culture, Prefix
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.columnar import ColumnarInventory, AnyOf, Not, np
+
+
+@unittest.skipUnless(np is not None, 'requires NumPy')
+class TestColumnarInventory(unittest.TestCase):
+    def make_inventory(self, im):
+        inventory = Inventory([], {}, {}, {}, {})
+        for name, location in [('minis1', 'minus80'), ('minis2', 'minus20')]:
+            box = im.make_empty_box(name, 'box for minipreps', location, (2,3))
+            for i in range(2):
+                for j in range(3):
+                    culture = Culture.secondary if j < 2 else Culture.primary
+                    box.samples[i][j] = Sample(f'{name}_{i}{j}', f'side{j}', Concentration.miniprep,
+                                               f'pTarg{j}', culture, str(i))
+            inventory = im.add_box(box, inventory)
+        return inventory
+
+    def test_find_sample(self):
+        im = InventoryManager()
+        inventory = self.make_inventory(im)
+        columnar = ColumnarInventory(inventory)
+        self.assertEqual(len(columnar), 12)
+
+        # same results as find_sample for find_sample queries
+        for query in [{'construct': 'pTarg1'}, {'concentration': Concentration.miniprep, 'clone': '1'},
+                      {'label': Prefix('minis2')}, {'construct': 'missing'}]:
+            self.assertEqual(set(columnar.find_sample(query)), set(im.find_sample(query, inventory)))
+        # values that can't be hashed match nothing
+        self.assertEqual(columnar.count({'construct': ['pTarg1']}), 0)
+
+        # box location, Not and AnyOf
+        query = {'concentration': Concentration.miniprep, 'culture': Culture.secondary,
+                 'location': 'minus80', 'clone': Not('0')}
+        self.assertEqual({loc.label for loc in columnar.find_sample(query)}, {'minis1_10', 'minis1_11'})
+        self.assertEqual(columnar.count({'construct': AnyOf(['pTarg0', 'pTarg2']), 'row': 0}), 4)
+        # list of queries matches any of them
+        self.assertEqual(columnar.count([{'boxname': 'minis1', 'col': 0}, {'label': 'minis2_12'}]), 3)
+        self.assertEqual(columnar.count({}), 12)
+
+        # error for unknown keys
+        with self.assertRaises(ValueError):
+            columnar.count({'freezer': 'minus80'})
+
+    def test_follows_changes(self):
+        im = InventoryManager()
+        columnar = ColumnarInventory(self.make_inventory(im), im)
+        inventory = columnar.inventory
+
+        inventory = im.remove_sample((0, 0), 'minis1', inventory)
+        sample = Sample('new', 'new side', Concentration.uM10, 'pNew', None, '1')
+        inventory = im.add_sample(sample, (0, 0), 'minis2', im.remove_sample((0, 0), 'minis2', inventory))
+        # box moved to another freezer and renamed
+        inventory = im.update_box('minis1', {'location': 'minus20'}, inventory)
+        inventory = im.update_box('minis1', {'name': 'minis3'}, inventory)
+        inventory = im.add_box(im.make_empty_box('empty', '', 'fridge', (1,1)), inventory)
+
+        self.assertIs(columnar.inventory, inventory)
+        self.assertEqual(len(columnar), 11)
+        self.assertEqual(columnar.find_sample({'construct': 'pNew'})[0].label, 'new')
+        self.assertEqual(columnar.count({'location': 'minus80'}), 0)
+        self.assertEqual(columnar.count({'boxname': 'minis3', 'location': 'minus20'}), 5)
+        for query in [{'construct': 'pTarg0'}, {'clone': '1'}, {}]:
+            self.assertEqual(set(columnar.find_sample(query)), set(im.find_sample(query, inventory)))
+
+        # no longer follows changes once closed
+        columnar.close()
+        im.remove_box('minis2', inventory)
+        self.assertEqual(len(columnar), 11)
+
+if __name__ == '__main__':
+    unittest.main()
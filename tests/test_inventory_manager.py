@@ -1,6 +1,12 @@
+import asyncio
+import os
+import tempfile
 import unittest
+from dataclasses import replace
 from inventory_manager_py import Inventory, Box, Sample, Location, Culture, Concentration
+from inventory_manager_py import Prefix, Glob, Regex
 from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.metrics import Metrics
 
 
 class TestInventoryManager(unittest.TestCase):
@@ -63,6 +69,21 @@ class TestInventoryManager(unittest.TestCase):
         self.assertIn(box3, new_inventory.boxes)
         self.assertIn(box4, new_inventory.boxes)
 
+        # fill/empty wells of an added box directly
+        box3.samples[0][0] = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        box3.samples[7] = [Sample(f'q{i}', 'pcr primer', Concentration.uM10, 'o1', None, '1') for i in range(8)]
+        # check box counts its wells from its grid
+        self.assertEqual(box3.get_num_samples(), 9)
+        self.assertNotIn((0, 0), box3.free_wells())
+        box3.samples[0][0] = None
+        self.assertEqual(box3.get_num_samples(), 8)
+        self.assertEqual(box3.first_empty_well(), (0, 0))
+        # check box in the inventory is unchanged
+        added = new_inventory.boxes.get('primers2')
+        self.assertEqual(added.get_num_samples(), 0)
+        self.assertEqual(added.samples[7], [None] * 8)
+        self.assertEqual(len(im.find_free_wells(new_inventory, 64 * 3)), 64 * 3)
+
     def test_add_sample(self):
         im = InventoryManager()
         # make inventory, box, sample
@@ -74,8 +95,10 @@ class TestInventoryManager(unittest.TestCase):
         inventory = im.add_box(box, inventory)
         inventory = im.add_sample(sample, (0, 0), 'primers1', inventory)
         # check box has a sample at (0,0)
-        check_sample = box.samples[0][0]
+        check_sample = inventory.boxes.get('primers1').samples[0][0]
         self.assertEqual(check_sample, sample)
+        # box that was added is not changed
+        self.assertIsNone(box.samples[0][0])
 
         # define expected location 
         loc = Location('primers1', 0, 0, 'primer1', 'pcr primer1')
@@ -173,13 +196,15 @@ class TestInventoryManager(unittest.TestCase):
 
         # add box, sample
         inventory = im.add_box(box, inventory)
-        inventory = im.add_sample(sample, (0, 0), 'primers1', inventory)
+        old_inventory = im.add_sample(sample, (0, 0), 'primers1', inventory)
 
         # remove sample
-        inventory = im.remove_sample((0,0), 'primers1', inventory)
+        inventory = im.remove_sample((0,0), 'primers1', old_inventory)
         
         # check that location is empty 
-        self.assertIsNone(box.samples[0][0])
+        self.assertIsNone(inventory.boxes.get('primers1').samples[0][0])
+        # check that older inventory still has the sample
+        self.assertEqual(old_inventory.boxes.get('primers1').samples[0][0], sample)
 
         # check that inventory is updated 
         num_cons = len(inventory.construct_to_locations)
@@ -203,6 +228,46 @@ class TestInventoryManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             im.remove_sample((1, 1), 'primers', inventory)
     
+    def test_old_inventory_indexes(self):
+        im = InventoryManager()
+        # create inventory, box, samples
+        inventory = Inventory([], {}, {}, {}, {})
+        box = im.make_empty_box('primers1', 'box for primers', 'minus20', (8,8))
+        sample1 = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        sample2 = Sample('p2', 'pcr primer2', Concentration.uM10, 'o1', None, '1')
+
+        # keep every version of the inventory
+        inventory1 = im.add_box(box, inventory)
+        inventory2 = im.add_sample(sample1, (0, 0), 'primers1', inventory1)
+        inventory3 = im.add_sample(sample2, (0, 1), 'primers1', inventory2)
+        inventory4 = im.remove_sample((0, 0), 'primers1', inventory3)
+
+        # check indexes of older versions are unchanged
+        self.assertEqual(len(inventory1.construct_to_locations), 0)
+        self.assertEqual(len(inventory2.construct_to_locations['o1']), 1)
+        self.assertEqual(len(inventory3.construct_to_locations['o1']), 2)
+        self.assertEqual(len(inventory4.construct_to_locations['o1']), 1)
+        self.assertEqual(len(inventory2.loc_to_conc), 1)
+        self.assertEqual(len(inventory3.loc_to_conc), 2)
+        self.assertEqual(len(inventory4.loc_to_conc), 1)
+
+        # removing the box leaves the older versions alone
+        inventory5 = im.remove_box('primers1', inventory4)
+        self.assertEqual(len(inventory5.boxes), 0)
+        self.assertEqual(len(inventory4.boxes), 1)
+        self.assertEqual(len(inventory4.loc_to_clone), 1)
+
+        # check grids of older versions are unchanged
+        contents = [im.retrieve_box_contents('primers1', inv)[0][:2]
+                    for inv in (inventory1, inventory2, inventory3, inventory4)]
+        self.assertEqual(contents, [[None, None], [sample1, None], [sample1, sample2], [None, sample2]])
+        self.assertEqual([inv.boxes.get('primers1').get_num_samples()
+                          for inv in (inventory1, inventory2, inventory3, inventory4)], [0, 1, 2, 1])
+        self.assertIsNone(box.samples[0][0])
+        # only the touched row is copied, the other rows are shared
+        self.assertIs(inventory3.boxes.get('primers1').samples[1], inventory1.boxes.get('primers1').samples[1])
+        self.assertIsNot(inventory3.boxes.get('primers1').samples[0], inventory2.boxes.get('primers1').samples[0])
+
     def test_find_sample(self): 
         im = InventoryManager()
         # create inventory, box, samples
@@ -270,6 +335,181 @@ class TestInventoryManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             im.find_sample(query5, inventory)
 
+    def test_find_sample_indexes(self):
+        im = InventoryManager()
+        # create inventory with samples in two boxes
+        inventory = Inventory([], {}, {}, {}, {})
+        box1 = im.make_empty_box('minipreps1', 'minipreps', 'minus20', (4,4))
+        box2 = im.make_empty_box('minipreps2', 'minipreps', 'minus80', (4,4))
+        inventory = im.add_box(box1, inventory)
+        inventory = im.add_box(box2, inventory)
+        sample1 = Sample('m1', 'pTarg1 c1', Concentration.miniprep, 'pTarg1', Culture.primary, '1')
+        sample2 = Sample('m2', 'pTarg1 c2', Concentration.miniprep, 'pTarg1', Culture.secondary, '2')
+        sample3 = Sample('m3', 'pTarg2 c1', Concentration.miniprep, 'pTarg2', Culture.primary, '1')
+        sample4 = Sample('z1', 'pTarg1 zymo', Concentration.zymo, 'pTarg1', None, '0')
+        inventory = im.add_sample(sample1, (0, 0), 'minipreps1', inventory)
+        inventory = im.add_sample(sample2, (0, 1), 'minipreps1', inventory)
+        inventory = im.add_sample(sample3, (1, 0), 'minipreps2', inventory)
+        inventory = im.add_sample(sample4, (1, 1), 'minipreps2', inventory)
+
+        # check search indexes are kept up to date
+        self.assertEqual(len(inventory.conc_to_locations[Concentration.miniprep]), 3)
+        self.assertEqual(len(inventory.clone_to_locations['1']), 2)
+        self.assertEqual(len(inventory.culture_to_locations[Culture.primary]), 2)
+
+        # several indexed keys are intersected
+        query1 = {'concentration': Concentration.miniprep, 'construct': 'pTarg1', 'clone': '1'}
+        query1_result = im.find_sample(query1, inventory)
+        self.assertEqual(len(query1_result), 1)
+        self.assertEqual(query1_result[0].label, 'm1')
+
+        # labels are indexed too
+        self.assertEqual(len(inventory.label_to_locations['m3']), 1)
+        self.assertEqual(len(inventory.sidelabel_to_locations['pTarg1 zymo']), 1)
+        query2 = {'culture': Culture.primary, 'label': 'm3'}
+        query2_result = im.find_sample(query2, inventory)
+        self.assertEqual(len(query2_result), 1)
+        self.assertEqual(query2_result[0].boxname, 'minipreps2')
+
+        # query w/ only a sidelabel
+        query3 = {'sidelabel': 'pTarg1 zymo'}
+        self.assertEqual(len(im.find_sample(query3, inventory)), 1)
+
+        # empty query matches every sample
+        self.assertEqual(len(im.find_sample({}, inventory)), 4)
+
+        # values that can't be hashed are compared w/ every sample (w/ and w/o a cache)
+        class OddClone:
+            __hash__ = None
+            def __eq__(self, other):
+                return other in ('1', '2')
+        for manager in (im, InventoryManager(cache_size=4)):
+            self.assertEqual(manager.find_sample({'clone': ['1']}, inventory), [])
+            self.assertEqual(manager.find_sample({'construct': 'pTarg1', 'label': ['m1']}, inventory), [])
+            self.assertEqual(sorted(loc.label for loc in manager.find_sample({'clone': OddClone()}, inventory)),
+                             ['m1', 'm2', 'm3'])
+            self.assertEqual(len(manager.find_sample({'construct': 'pTarg1', 'clone': OddClone()}, inventory)), 2)
+
+        # search indexes are updated when a sample is removed
+        inventory = im.remove_sample((0, 0), 'minipreps1', inventory)
+        self.assertEqual(len(im.find_sample(query1, inventory)), 0)
+        self.assertEqual(len(im.find_sample({'label': 'm1'}, inventory)), 0)
+        self.assertEqual(len(inventory.culture_to_locations[Culture.primary]), 1)
+        self.assertNotIn('m1', inventory.label_to_locations)
+
+        # label indexes follow a renamed box
+        inventory = im.update_box('minipreps2', {'name': 'minipreps3'}, inventory)
+        query4_result = im.find_sample({'label': 'm3'}, inventory)
+        self.assertEqual(query4_result[0].boxname, 'minipreps3')
+
+    def test_find_sample_patterns(self):
+        im = InventoryManager()
+        # create inventory, box, samples
+        inventory = Inventory([], {}, {}, {}, {})
+        box = im.make_empty_box('oligos1', 'oligos', 'minus20', (4,4))
+        inventory = im.add_box(box, inventory)
+        sample1 = Sample('oVT101', 'pTarg1 F', Concentration.uM10, 'pTarg1', None, '1')
+        sample2 = Sample('oVT102', 'pTarg1 R', Concentration.uM10, 'pTarg1', None, '1')
+        sample3 = Sample('oVT201', 'pTarget F', Concentration.uM100, 'pTarget', None, '1')
+        sample4 = Sample('oAB1', 'pBad F', Concentration.uM10, 'pBad', None, '1')
+        for i, sample in enumerate([sample1, sample2, sample3, sample4]):
+            inventory = im.add_sample(sample, (0, i), 'oligos1', inventory)
+
+        # check prefix indexes are kept up to date
+        self.assertEqual(list(inventory.construct_prefixes.with_prefix('pTarg')), ['pTarg1', 'pTarget'])
+        self.assertEqual(len(inventory.label_prefixes), 4)
+
+        # search by prefix
+        self.assertEqual(len(im.find_sample({'construct': Prefix('pTarg')}, inventory)), 3)
+        self.assertEqual(len(im.find_sample({'label': Prefix('oVT1')}, inventory)), 2)
+
+        # search by wildcard pattern
+        self.assertEqual(len(im.find_sample({'label': Glob('oVT?01')}, inventory)), 2)
+        self.assertEqual(len(im.find_sample({'sidelabel': Glob('* F')}, inventory)), 3)
+
+        # search by regular expression
+        self.assertEqual(len(im.find_sample({'construct': Regex(r'^pTarg\d$')}, inventory)), 2)
+
+        # patterns combine w/ other keys
+        query = {'construct': Prefix('pTarg'), 'concentration': Concentration.uM100}
+        query_result = im.find_sample(query, inventory)
+        self.assertEqual(len(query_result), 1)
+        self.assertEqual(query_result[0].label, 'oVT201')
+        query = {'label': Prefix('oVT'), 'construct': Glob('pTarg?')}
+        self.assertEqual(len(im.find_sample(query, inventory)), 2)
+
+        # prefix indexes are updated when the last sample w/ a value is removed
+        inventory = im.remove_sample((0, 2), 'oligos1', inventory)
+        self.assertEqual(len(im.find_sample({'construct': Prefix('pTarg')}, inventory)), 2)
+        self.assertNotIn('pTarget', inventory.construct_prefixes)
+
+        # patterns only work on text fields
+        with self.assertRaises(ValueError):
+            im.find_sample({'clone': Prefix('1')}, inventory)
+
+    def test_find_sample_cache(self):
+        im = InventoryManager(cache_size=4)
+        plain = InventoryManager()
+        # create inventory w/ samples of two constructs
+        inventory = Inventory([], {}, {}, {}, {})
+        inventory = im.add_box(im.make_empty_box('minipreps1', 'minipreps', 'minus20', (8,8)), inventory)
+        inventory = im.add_sample(Sample('m1', 'pTarg1 c1', Concentration.miniprep, 'pTarg1', Culture.primary, '1'), (0, 0), 'minipreps1', inventory)
+        inventory = im.add_sample(Sample('m2', 'pCtrl c1', Concentration.uM100, 'pCtrl', Culture.primary, '1'), (0, 1), 'minipreps1', inventory)
+        by_construct = {'construct': 'pTarg1'}
+        by_conc = {'concentration': Concentration.uM100, 'culture': Culture.primary}
+
+        # second query is answered from the cache, w/ the same result
+        result = im.find_sample(by_construct, inventory)
+        self.assertEqual(im.find_sample({'construct': 'pTarg1'}, inventory), result)
+        self.assertEqual(im.cache_stats()['hits'], 1)
+        self.assertEqual(im.cache_stats()['misses'], 1)
+        # changing a returned list doesn't change the cache
+        result.clear()
+        self.assertEqual(len(im.find_sample(by_construct, inventory)), 1)
+        # keys in another order are the same query
+        im.find_sample(by_conc, inventory)
+        self.assertEqual(im.find_sample({'culture': Culture.primary, 'concentration': Concentration.uM100}, inventory),
+                         plain.find_sample(by_conc, inventory))
+
+        # change to another construct keeps the construct query, but not the concentration one
+        new = im.add_sample(Sample('m3', 'pCtrl c2', Concentration.uM100, 'pCtrl', Culture.primary, '2'), (0, 2), 'minipreps1', inventory)
+        hits = im.cache_stats()['hits']
+        self.assertEqual(im.find_sample(by_construct, new), plain.find_sample(by_construct, new))
+        self.assertEqual(im.cache_stats()['hits'], hits + 1)
+        self.assertEqual(len(im.find_sample(by_conc, new)), 2)
+        self.assertEqual(im.cache_stats()['hits'], hits + 1)
+        self.assertEqual(im.cache_stats()['invalidated'], 1)
+
+        # change to the construct drops the queries that could match it
+        pattern = {'construct': Prefix('pTarg')}
+        im.find_sample(pattern, new)
+        newer = im.remove_sample((0, 0), 'minipreps1', new)
+        self.assertEqual(im.find_sample(by_construct, newer), [])
+        self.assertEqual(im.find_sample(pattern, newer), [])
+        # older versions are still cached
+        self.assertEqual(len(im.find_sample(pattern, new)), 1)
+
+        # least recently used results are dropped
+        self.assertEqual(im.cache_stats()['size'], 4)
+        im.clear_cache()
+        self.assertEqual(im.cache_stats()['size'], 0)
+
+        # check for error w/o a cache
+        with self.assertRaises(ValueError):
+            plain.cache_stats()
+
+        # change made while the cache is full, carried results evict the old ones
+        # (both orders, so the least recently used one is carried first or last)
+        for queries in [({'construct': 'pCtrl'}, {'clone': '2'}), ({'clone': '2'}, {'construct': 'pCtrl'})]:
+            small = InventoryManager(cache_size=2)
+            for query in queries:
+                small.find_sample(query, inventory)
+            new = small.add_sample(Sample('m3', 'pCtrl c2', Concentration.uM10, 'pNew', None, '3'), (0, 2), 'minipreps1', inventory)
+            self.assertEqual(small.cache_stats()['carried'], 2)
+            self.assertEqual(small.cache_stats()['size'], 2)
+            self.assertEqual(len(small.find_sample({'construct': 'pCtrl'}, new)), 1)
+            self.assertEqual(small.cache_stats()['hits'], 1)
+
     def test_update_box(self):
         im = InventoryManager()
         # create inventory, box, sample
@@ -314,6 +554,234 @@ class TestInventoryManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             im.update_box('box1', updates, inventory)
 
+    def test_rename_box(self):
+        im = InventoryManager()
+        # create inventory w/ two boxes sharing a construct
+        inventory = Inventory([], {}, {}, {}, {})
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (8,8)), inventory)
+        inventory = im.add_box(im.make_empty_box('primers2', 'box for primers', 'minus20', (8,8)), inventory)
+        sample1 = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        sample2 = Sample('p2', 'pcr primer2', Concentration.uM10, 'o1', None, '1')
+        inventory = im.add_sample(sample1, (0, 0), 'primers1', inventory)
+        inventory = im.add_sample(sample2, (1, 1), 'primers2', inventory)
+
+        # rename box
+        renamed = im.update_box('primers1', {'name': 'primers3'}, inventory)
+        loc = Location('primers3', 0, 0, 'p1', 'pcr primer1')
+        self.assertEqual(im.find_sample({'label': 'p1'}, renamed), [loc])
+        self.assertEqual(renamed.construct_to_locations['o1'],
+                         {loc, Location('primers2', 1, 1, 'p2', 'pcr primer2')})
+        self.assertEqual(renamed.loc_to_conc[loc], Concentration.uM10)
+        self.assertEqual(renamed.boxes.get('primers3').get_num_samples(), 1)
+        self.assertIsNone(renamed.boxes.get('primers1'))
+
+        # other box's entries and the prefix indexes are not copied
+        self.assertIs(renamed.label_to_locations['p2'], inventory.label_to_locations['p2'])
+        self.assertIs(renamed.boxes.get('primers2'), inventory.boxes.get('primers2'))
+        self.assertEqual(renamed.label_prefixes, inventory.label_prefixes)
+        # old inventory is unchanged
+        self.assertEqual(im.find_sample({'label': 'p1'}, inventory), [Location('primers1', 0, 0, 'p1', 'pcr primer1')])
+
+        # renamed box can be changed w/o changing the old one
+        renamed = im.add_sample(sample2, (0, 1), 'primers3', renamed)
+        self.assertIsNone(inventory.boxes.get('primers1').samples[0][1])
+
+        # check for error when renaming to the name of another box
+        with self.assertRaises(ValueError):
+            im.update_box('primers3', {'name': 'primers2'}, renamed)
+
+    def test_apply_batch(self):
+        im = InventoryManager()
+        # create inventory w/ one box
+        inventory = Inventory([], {}, {}, {}, {})
+        box1 = im.make_empty_box('primers1', 'box for primers', 'minus20', (8,8))
+        inventory = im.add_box(box1, inventory)
+        sample1 = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        sample2 = Sample('p2', 'pcr primer2', Concentration.uM10, 'o2', None, '1')
+        sample3 = Sample('p3', 'pcr primer3', Concentration.uM10, 'o3', None, '1')
+        box2 = im.make_empty_box('primers2', 'box for primers', 'minus20', (8,8))
+
+        # add/remove boxes and samples in one batch
+        ops = [
+            ('add_sample', sample1, (0, 0), 'primers1'),
+            ('add_sample', sample2, (0, 1), 'primers1'),
+            ('add_box', box2),
+            ('add_sample', sample3, (0, 0), 'primers2'),
+            ('remove_sample', (0, 1), 'primers1'),
+        ]
+        new_inventory = im.apply_batch(ops, inventory)
+
+        # check new inventory has all changes
+        self.assertEqual(len(new_inventory.boxes), 2)
+        self.assertEqual(len(new_inventory.loc_to_conc), 2)
+        self.assertEqual(set(new_inventory.construct_to_locations), {'o1', 'o3'})
+        self.assertEqual(im.retrieve_box_contents('primers2', new_inventory)[0][0], sample3)
+        self.assertIsNone(im.retrieve_box_contents('primers1', new_inventory)[0][1])
+
+        # check original inventory and boxes are unchanged
+        self.assertEqual(len(inventory.boxes), 1)
+        self.assertEqual(len(inventory.loc_to_conc), 0)
+        self.assertIsNone(box1.samples[0][0])
+        self.assertIsNone(box2.samples[0][0])
+
+        # remove a box in a batch
+        new_inventory = im.apply_batch([('remove_box', 'primers2')], new_inventory)
+        self.assertEqual(len(new_inventory.boxes), 1)
+        self.assertNotIn('o3', new_inventory.construct_to_locations)
+
+        # batch w/ an invalid operation is not applied at all
+        bad_ops = [
+            ('add_sample', sample2, (1, 1), 'primers1'),
+            ('add_sample', sample3, (1, 1), 'primers1'),
+        ]
+        with self.assertRaises(ValueError):
+            im.apply_batch(bad_ops, new_inventory)
+        self.assertIsNone(im.retrieve_box_contents('primers1', new_inventory)[1][1])
+        self.assertNotIn('o2', new_inventory.construct_to_locations)
+
+        # unknown operation
+        with self.assertRaises(ValueError):
+            im.apply_batch([('move_sample', (0, 0), 'primers1')], new_inventory)
+
+    def test_diff(self):
+        im = InventoryManager()
+        # create inventory w/ two boxes and samples
+        inventory = Inventory([], {}, {}, {}, {})
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (8,8)), inventory)
+        inventory = im.add_box(im.make_empty_box('lysis1', 'lysis', 'minus20', (2,2)), inventory)
+        sample1 = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        sample2 = Sample('p2', 'pcr primer2', Concentration.uM10, 'o2', None, '1')
+        sample3 = Sample('l1', 'lysis1', None, 'pTarg1', Culture.primary, '1')
+        old = im.add_sample(sample1, (0, 0), 'primers1', inventory)
+        old = im.add_sample(sample2, (0, 1), 'primers1', old)
+        old = im.add_sample(sample3, (0, 0), 'lysis1', old)
+
+        # same inventory has no changes
+        self.assertTrue(im.diff(old, old).is_empty())
+
+        # move one sample, remove one, add one, change and add boxes
+        new = im.remove_sample((0, 0), 'primers1', old)
+        new = im.add_sample(sample1, (5, 5), 'primers1', new)
+        new = im.remove_sample((0, 1), 'primers1', new)
+        new = im.update_box('lysis1', {'location': 'minus80'}, new)
+        new = im.add_box(im.make_empty_box('primers2', 'box for primers', 'minus20', (2,2)), new)
+        new = im.add_sample(sample2, (1, 1), 'primers2', new)
+
+        diff = im.diff(old, new)
+        self.assertEqual([box.name for box in diff.added_boxes], ['primers2'])
+        self.assertEqual(diff.removed_boxes, [])
+        self.assertEqual([box.location for box in diff.changed_boxes], ['minus80'])
+        # sample2 was removed from one box and added to another, so it moved too
+        self.assertEqual(diff.moved_samples, [(Location('primers1', 0, 0, 'p1', 'pcr primer1'),
+                                               Location('primers1', 5, 5, 'p1', 'pcr primer1'), sample1),
+                                              (Location('primers1', 0, 1, 'p2', 'pcr primer2'),
+                                               Location('primers2', 1, 1, 'p2', 'pcr primer2'), sample2)])
+        self.assertEqual(diff.removed_samples, [])
+        self.assertEqual(diff.added_samples, [])
+        self.assertEqual(len(im.diff(new, old).moved_samples), 2)
+
+        # replay diff onto a copy of the old inventory
+        replica = im.apply_diff(diff, old)
+        self.assertTrue(im.diff(replica, new).is_empty())
+        self.assertEqual(replica.loc_to_conc, new.loc_to_conc)
+        self.assertEqual(replica.construct_to_locations, new.construct_to_locations)
+        # and back again
+        self.assertTrue(im.diff(im.apply_diff(im.diff(new, old), replica), old).is_empty())
+
+        # removed box is reported w/ its samples
+        diff = im.diff(old, im.remove_box('lysis1', old))
+        self.assertEqual(diff.removed_boxes, ['lysis1'])
+        self.assertEqual(diff.removed_samples, [(Location('lysis1', 0, 0, 'l1', 'lysis1'), sample3)])
+
+        # check for error when the diff doesn't fit, inventory is unchanged
+        with self.assertRaises(ValueError):
+            im.apply_diff(im.diff(old, new), new)
+        self.assertEqual(new.boxes.get('primers1').samples[5][5], sample1)
+
+    def test_change_feed(self):
+        im = InventoryManager()
+        events = []
+        callback = im.subscribe(events.append)
+        inventory = Inventory([], {}, {}, {}, {})
+        box = im.make_empty_box('primers1', 'box for primers', 'minus20', (8,8))
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        loc = Location('primers1', 0, 0, 'p1', 'pcr primer1')
+
+        # one event per change w/ the affected locations
+        inventory = im.add_box(box, inventory)
+        inventory = im.add_sample(sample, (0, 0), 'primers1', inventory)
+        inventory = im.update_box('primers1', {'name': 'primers2'}, inventory)
+        inventory = im.update_box('primers2', {'location': 'minus80'}, inventory)
+        inventory = im.remove_sample((0, 0), 'primers2', inventory)
+        inventory = im.remove_box('primers2', inventory)
+        self.assertEqual([event.operation for event in events],
+                         ['add_box', 'add_sample', 'update_box', 'update_box', 'remove_sample', 'remove_box'])
+        self.assertEqual(events[1].added, [loc])
+        self.assertEqual(events[1].removed, [])
+        self.assertEqual(events[2].removed, [loc])
+        self.assertEqual(events[2].added, [Location('primers2', 0, 0, 'p1', 'pcr primer1')])
+        self.assertEqual(events[2].boxnames, ['primers1', 'primers2'])
+        self.assertEqual(events[3].added + events[3].removed, [])
+        self.assertIs(events[-1].inventory, inventory)
+
+        # sample put in and taken out in one batch is not reported
+        events.clear()
+        inventory = im.apply_batch([('add_box', box), ('add_sample', sample, (0, 0), 'primers1'),
+                                    ('add_sample', sample, (0, 1), 'primers1'),
+                                    ('remove_sample', (0, 0), 'primers1')], inventory)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].added, [Location('primers1', 0, 1, 'p1', 'pcr primer1')])
+        self.assertEqual(events[0].removed, [])
+
+        # broken subscriber gives a warning, the change is still made
+        def broken(event):
+            raise RuntimeError('broken')
+        im.subscribe(broken)
+        with self.assertWarns(RuntimeWarning):
+            inventory = im.remove_sample((0, 1), 'primers1', inventory)
+        self.assertIsNone(inventory.boxes.get('primers1').samples[0][1])
+        self.assertEqual(len(events), 2)
+
+        # unsubscribed callbacks get no more events
+        im.unsubscribe(broken)
+        im.unsubscribe(callback)
+        im.add_sample(sample, (0, 1), 'primers1', inventory)
+        self.assertEqual(len(events), 2)
+        with self.assertRaises(ValueError):
+            im.unsubscribe(callback)
+
+        # events from another thread go into an asyncio queue
+        async def consume():
+            queue = im.subscribe_queue()
+            await asyncio.to_thread(im.add_sample, sample, (0, 2), 'primers1', inventory)
+            event = await asyncio.wait_for(queue.get(), 5)
+            im.unsubscribe(queue)
+            return event
+        event = asyncio.run(consume())
+        self.assertEqual(event.operation, 'add_sample')
+        self.assertEqual(event.added, [Location('primers1', 0, 2, 'p1', 'pcr primer1')])
+
+        # more changes than a bounded queue holds before it is read
+        async def consume_late():
+            queue = im.subscribe_queue(maxsize=2)
+            changed = inventory
+            for col in range(2, 6):
+                changed = im.add_sample(sample, (1, col), 'primers1', changed)
+            # let the loop put the events in the queue
+            await asyncio.sleep(0)
+            events = [queue.get_nowait() for _ in range(queue.qsize())]
+            changed = im.remove_sample((1, 5), 'primers1', changed)
+            events.append(await asyncio.wait_for(queue.get(), 5))
+            im.unsubscribe(queue)
+            return events, changed
+        events, changed = asyncio.run(consume_late())
+        # check queued events are replaced by a resync w/ the newest inventory
+        self.assertEqual([event.operation for event in events], ['resync', 'add_sample', 'remove_sample'])
+        self.assertEqual(events[0].inventory.boxes.get('primers1').samples[1][2:6], [sample] * 3 + [None])
+        self.assertEqual(events[0].added + events[0].removed, [])
+        self.assertEqual(events[1].added, [Location('primers1', 1, 5, 'p1', 'pcr primer1')])
+        self.assertIs(events[2].inventory, changed)
+
     def test_retrieve_box(self):
         im = InventoryManager()
         # create inventory, box, samples
@@ -358,6 +826,151 @@ class TestInventoryManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             im.retrieve_box_contents('box1', inventory)
 
+    def test_free_wells(self):
+        im = InventoryManager()
+        # create inventory w/ two boxes in one freezer and one in another
+        inventory = Inventory([], {}, {}, {}, {})
+        inventory = im.add_box(im.make_empty_box('primers2', 'box for primers', 'minus20', (2,3)), inventory)
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (2,3)), inventory)
+        inventory = im.add_box(im.make_empty_box('lysis1', 'lysis', 'minus80', (2,3)), inventory)
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        inventory = im.add_sample(sample, (0, 1), 'primers1', inventory)
+
+        # wells are taken row by row from boxes in order of name
+        wells = im.find_free_wells(inventory, 3, location='minus20')
+        self.assertEqual(wells, [('primers1', (0, 0)), ('primers1', (0, 2)), ('primers1', (1, 0))])
+        # next box is used when one is full
+        wells = im.find_free_wells(inventory, 7, description='box for primers')
+        self.assertEqual(wells[-2:], [('primers2', (0, 0)), ('primers2', (0, 1))])
+        # contiguous wells are in one row
+        wells = im.find_free_wells(inventory, 3, location='minus20', contiguous=True)
+        self.assertEqual(wells, [('primers1', (1, 0)), ('primers1', (1, 1)), ('primers1', (1, 2))])
+        self.assertEqual(im.find_free_wells(inventory, 1, location='minus80'), [('lysis1', (0, 0))])
+
+        # reserved wells are not handed out again
+        reserved = im.reserve_wells(inventory, 2, location='minus20')
+        self.assertEqual(reserved, [('primers1', (0, 0)), ('primers1', (0, 2))])
+        self.assertEqual(im.find_free_wells(inventory, 1, location='minus20'), [('primers1', (1, 0))])
+
+        # reserved wells go straight into add_sample, which ends the reservation
+        for boxname, position in reserved:
+            inventory = im.add_sample(sample, position, boxname, inventory)
+        self.assertEqual(inventory.boxes.get('primers1').get_num_samples(), 3)
+        self.assertEqual(im._reserved, {})
+
+        # released wells can be handed out again
+        reserved = im.reserve_wells(inventory, 3, location='minus20', contiguous=True)
+        im.release_wells(reserved, inventory)
+        self.assertEqual(im.reserve_wells(inventory, 3, location='minus20', contiguous=True), reserved)
+
+        # reserved wells keep their box when it is renamed
+        inventory = im.update_box('primers1', {'name': 'primers0'}, inventory)
+        self.assertEqual(im._reserved, {'primers0': 0b111000})
+        self.assertEqual(im.find_free_wells(inventory, 1, location='minus20'), [('primers2', (0, 0))])
+        # and go w/ the box when it is removed
+        inventory = im.remove_box('primers0', inventory)
+        self.assertEqual(im._reserved, {})
+        inventory = im.add_box(im.make_empty_box('primers0', 'box for primers', 'minus20', (2,3)), inventory)
+        self.assertEqual(im.find_free_wells(inventory, 1, location='minus20'), [('primers0', (0, 0))])
+
+        # check for error when there are not enough free wells
+        with self.assertRaises(ValueError):
+            im.find_free_wells(inventory, 7, location='minus80')
+        with self.assertRaises(ValueError):
+            im.find_free_wells(inventory, 4, contiguous=True)
+        with self.assertRaises(ValueError):
+            im.find_free_wells(inventory, 0)
+
+    def test_free_boxes(self):
+        im = InventoryManager(metrics=Metrics())
+        inventory = Inventory([], {}, {}, {}, {})
+        for i in range(20):
+            inventory = im.add_box(im.make_empty_box(f'primers{i:02}', 'box for primers', 'minus20', (1,2)), inventory)
+        inventory = im.add_box(im.make_empty_box('lysis1', 'lysis', 'minus80', (1,2)), inventory)
+        im.find_free_wells(inventory)
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+
+        # fill every primer box but the last
+        ops = [('add_sample', sample, (0, col), f'primers{i:02}') for i in range(19) for col in range(2)]
+        inventory = im.apply_batch(ops, inventory)
+        im.metrics.reset()
+        self.assertEqual(im.find_free_wells(inventory, 2, location='minus20'),
+                         [('primers19', (0, 0)), ('primers19', (0, 1))])
+        # check full boxes are not looked at
+        self.assertEqual(im.metrics.to_dict()['find_free_wells']['counts']['boxes_scanned'], 1)
+        self.assertEqual(list(inventory.free_boxes[('minus20', 'box for primers')]), ['primers19'])
+
+        # emptied, moved, renamed and removed boxes
+        inventory = im.remove_sample((0, 1), 'primers03', inventory)
+        inventory = im.update_box('primers19', {'location': 'minus80'}, inventory)
+        inventory = im.update_box('lysis1', {'name': 'lysis0', 'description': 'old lysis'}, inventory)
+        inventory = im.remove_box('primers00', inventory)
+        self.assertEqual(im.find_free_wells(inventory, 2), [('lysis0', (0, 0)), ('lysis0', (0, 1))])
+        self.assertEqual(im.find_free_wells(inventory, 1, 'minus80', 'box for primers'), [('primers19', (0, 0))])
+        self.assertEqual(im.find_free_wells(inventory, 1, 'minus20', 'box for primers'), [('primers03', (0, 1))])
+        with self.assertRaises(ValueError):
+            im.find_free_wells(inventory, 1, 'minus20', 'lysis')
+        # check free boxes carried over are the same as ones made from the boxes
+        self.assertEqual(dict(inventory.free_boxes), dict(replace(inventory).free_boxes))
+
+    def test_aggregation(self):
+        im = InventoryManager()
+        inventory = Inventory([], {}, {}, {}, {})
+        for name, location in [('minis1', 'minus80'), ('minis2', 'minus80'), ('primers1', 'minus20')]:
+            box = im.make_empty_box(name, 'box', location, (2,2))
+            box.samples[0][0] = Sample(f'{name}_a', 'side', Concentration.miniprep, 'pTarg1', Culture.primary, '1')
+            box.samples[0][1] = Sample(f'{name}_b', 'side', Concentration.uM10, 'o1', None, '1')
+            inventory = im.add_box(box, inventory)
+
+        # counts per group
+        self.assertEqual(im.count_by('location', inventory), {'minus80': 4, 'minus20': 2})
+        self.assertEqual(im.count_by('construct', inventory), {'pTarg1': 3, 'o1': 3})
+        self.assertEqual(im.count_by('culture', inventory), {Culture.primary: 3, None: 3})
+        self.assertEqual(im.count_by('boxname', inventory)['minis2'], 2)
+        self.assertEqual(im.occupancy(inventory)['minus80'],
+                         {'boxes': 2, 'wells': 8, 'samples': 4, 'percent': 50.0})
+        self.assertEqual(im.occupancy(inventory, by='boxname')['primers1']['percent'], 50.0)
+
+        # totals are carried over to every new version
+        sample = Sample('new', 'side', Concentration.uM10, 'o2', None, '1')
+        inventory = im.add_sample(sample, (1, 1), 'primers1', inventory)
+        inventory = im.remove_sample((0, 0), 'minis1', inventory)
+        inventory = im.update_box('minis2', {'location': 'minus20'}, inventory)
+        inventory = im.update_box('minis1', {'name': 'minis3'}, inventory)
+        inventory = im.apply_batch([('add_box', im.make_empty_box('empty', '', 'fridge', (1,1))),
+                                    ('remove_box', 'primers1')], inventory)
+        self.assertIsNotNone(inventory._location_totals)
+        totals = {'minus80': {'boxes': 1, 'wells': 4, 'samples': 1, 'percent': 25.0},
+                  'minus20': {'boxes': 1, 'wells': 4, 'samples': 2, 'percent': 50.0},
+                  'fridge': {'boxes': 1, 'wells': 1, 'samples': 0, 'percent': 0.0}}
+        self.assertEqual(im.occupancy(inventory), totals)
+        # same as totals made from the boxes
+        self.assertEqual(im.occupancy(Inventory(list(inventory.boxes), {}, {}, {}, {})), totals)
+        self.assertEqual(im.count_by('construct', inventory), {'pTarg1': 1, 'o1': 2})
+
+        # box counted while empty, then filled directly and added
+        box = im.make_empty_box('filled', 'box', 'minus80', (2,3))
+        self.assertEqual(box.get_num_samples(), 0)
+        for j in range(3):
+            box.samples[1][j] = Sample(f'filled_{j}', 'side', Concentration.uM10, 'o3', None, '1')
+        inventory = im.add_box(box, inventory)
+        inventory = im.remove_sample((1, 0), 'filled', inventory)
+        # same as a walk of the wells of every box
+        walked = {}
+        for b in inventory.boxes:
+            samples = sum(sample is not None for row in b.samples for sample in row)
+            walked[b.location] = walked.get(b.location, 0) + samples
+        self.assertEqual(im.count_by('location', inventory), walked)
+        self.assertEqual({key: value['samples'] for key, value in im.occupancy(inventory).items()}, walked)
+        self.assertEqual(im.occupancy(inventory)['minus80'],
+                         {'boxes': 2, 'wells': 10, 'samples': 3, 'percent': 30.0})
+
+        # error for other keys
+        with self.assertRaises(ValueError):
+            im.count_by('description', inventory)
+        with self.assertRaises(ValueError):
+            im.occupancy(inventory, by='construct')
+
     def test_tsv_to_box(self):
         im = InventoryManager()
 
@@ -375,6 +988,124 @@ class TestInventoryManager(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             im.tsv_to_box('primers.tsv')
 
+    def test_tsv_to_box_errors(self):
+        im = InventoryManager()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        filepath = os.path.join(tmpdir.name, 'box.tsv')
+
+        # box w/ a culture and an empty row between samples
+        box = im.make_empty_box('minipreps1', 'minipreps', 'minus20', (3,2))
+        box.samples[0][0] = Sample('m1', 'pTarg1 c1', Concentration.miniprep, 'pTarg1', Culture.primary, '1')
+        box.samples[2][1] = Sample('m2', 'pTarg1 c2', Concentration.miniprep, 'pTarg1', Culture.secondary, '2')
+        im.box_to_tsv(box, filepath)
+
+        # check culture is read back as a Culture
+        new_box = im.tsv_to_box(filepath)
+        self.assertEqual(new_box, box)
+        self.assertEqual(new_box.samples[2][1].culture, Culture.secondary)
+        # equal values are read as one string, samples have no __dict__
+        self.assertIs(new_box.samples[0][0].construct, new_box.samples[2][1].construct)
+        self.assertFalse(hasattr(new_box.samples[0][0], '__dict__'))
+
+        # file w/ a skipped row
+        with open(filepath, 'w') as file:
+            file.write('>name\tbox\n>>label\t1\t2\nA\tp1\t\nC\tp2\t\n')
+        with self.assertRaises(ValueError):
+            im.tsv_to_box(filepath)
+
+        # file w/ a row w/ the wrong number of columns
+        with open(filepath, 'w') as file:
+            file.write('>name\tbox\n>>label\t1\t2\nA\tp1\n')
+        with self.assertRaises(ValueError):
+            im.tsv_to_box(filepath)
+
+    def test_load_inventory(self):
+        im = InventoryManager()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+
+        # save a few boxes w/ samples as TSVs
+        for b in range(3):
+            box = im.make_empty_box(f'primers{b}', 'box for primers', 'minus20', (4,4))
+            for i in range(b + 1):
+                box.samples[0][i] = Sample(f'p{b}{i}', f'pcr primer{b}{i}', Concentration.uM10, f'o{i}', None, '1')
+            im.box_to_tsv(box, os.path.join(tmpdir.name, f'{box.name}.tsv'))
+        # files that are not TSVs are ignored
+        with open(os.path.join(tmpdir.name, 'notes.txt'), 'w') as file:
+            file.write('not a box')
+
+        # load using a pool of processes and in this process
+        for max_workers in (2, 1):
+            inventory = im.load_inventory(tmpdir.name, max_workers=max_workers)
+            # check all boxes and samples are in inventory
+            self.assertEqual(len(inventory.boxes), 3)
+            self.assertEqual(len(inventory.loc_to_conc), 6)
+            self.assertEqual(len(inventory.construct_to_locations['o0']), 3)
+            self.assertEqual(len(im.find_sample({'label': 'p21'}, inventory)), 1)
+            self.assertEqual(im.retrieve_box_contents('primers1', inventory)[0][1].label, 'p11')
+
+        # every index is the same as in an inventory built one box at a time
+        one_at_a_time = Inventory([], {}, {}, {}, {})
+        for box in inventory.boxes:
+            one_at_a_time = im.add_box(box, one_at_a_time)
+        for attr in ('construct_to_locations', 'loc_to_conc', 'loc_to_clone', 'loc_to_culture',
+                     'conc_to_locations', 'clone_to_locations', 'culture_to_locations', 'label_to_locations',
+                     'sidelabel_to_locations', 'construct_prefixes', 'label_prefixes', 'sidelabel_prefixes'):
+            self.assertEqual(getattr(inventory, attr), getattr(one_at_a_time, attr))
+
+        # inventory can be updated as usual
+        sample = Sample('p99', 'pcr primer99', Concentration.uM10, 'o9', None, '1')
+        inventory = im.add_sample(sample, (3, 3), 'primers0', inventory)
+        self.assertEqual(len(im.find_sample({'construct': 'o9'}, inventory)), 1)
+
+        # directory that doesn't exist
+        with self.assertRaises(FileNotFoundError):
+            im.load_inventory(os.path.join(tmpdir.name, 'missing'))
+
+    def test_export_inventory(self):
+        im = InventoryManager()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+
+        # create inventory w/ a few boxes
+        inventory = Inventory([], {}, {}, {}, {})
+        for b in range(3):
+            box = im.make_empty_box(f'primers{b}', 'box for primers', 'minus20', (4,4))
+            inventory = im.add_box(box, inventory)
+            sample = Sample(f'p{b}', f'pcr primer{b}', Concentration.uM10, f'o{b}', Culture.primary, '1')
+            inventory = im.add_sample(sample, (1, b), f'primers{b}', inventory)
+
+        # first export writes every box
+        written = im.export_inventory(inventory, tmpdir.name, max_workers=2)
+        self.assertEqual(sorted(os.path.basename(path) for path in written),
+                         ['primers0.tsv', 'primers1.tsv', 'primers2.tsv'])
+        # check files can be loaded back
+        loaded = im.load_inventory(tmpdir.name)
+        for box in inventory.boxes:
+            self.assertEqual(loaded.boxes.get(box.name), box)
+        # no temporary files are left
+        self.assertEqual(sorted(os.listdir(tmpdir.name)), 
+                         ['.inventory_manifest.json', 'primers0.tsv', 'primers1.tsv', 'primers2.tsv'])
+
+        # nothing changed, nothing is written
+        self.assertEqual(im.export_inventory(inventory, tmpdir.name), [])
+
+        # change one box and remove another
+        sample = Sample('p9', 'pcr primer9', Concentration.uM10, 'o9', None, '1')
+        inventory = im.add_sample(sample, (3, 3), 'primers1', inventory)
+        inventory = im.remove_box('primers2', inventory)
+        written = im.export_inventory(inventory, tmpdir.name)
+        # only the changed box is written, file of removed box is gone
+        self.assertEqual([os.path.basename(path) for path in written], ['primers1.tsv'])
+        self.assertFalse(os.path.exists(os.path.join(tmpdir.name, 'primers2.tsv')))
+        self.assertEqual(im.tsv_to_box(written[0]), inventory.boxes.get('primers1'))
+
+        # file deleted by hand is written again
+        os.remove(os.path.join(tmpdir.name, 'primers0.tsv'))
+        written = im.export_inventory(inventory, tmpdir.name)
+        self.assertEqual([os.path.basename(path) for path in written], ['primers0.tsv'])
+
     def test_box_to_tsv(self):
         im = InventoryManager()
         # create inventory, box, samples
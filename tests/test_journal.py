@@ -0,0 +1,195 @@
+import os
+import tempfile
+import threading
+import unittest
+from inventory_manager_py import Inventory, Sample, Concentration, Culture
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.directory = tmpdir.name
+
+    def open(self, **kwargs):
+        # manager w/ a journal, as after a restart
+        journal = Journal(self.directory, **kwargs)
+        self.addCleanup(journal.close)
+        im = InventoryManager(journal=journal)
+        return im, im.recover()
+
+    def make_changes(self, im, inventory):
+        # every kind of change
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (4,4)), inventory)
+        inventory = im.add_box(im.make_empty_box('lysis', 'lysates', 'minus80', (2,2)), inventory)
+        for i in range(3):
+            sample = Sample(f'p{i}', f'pcr primer{i}', Concentration.uM10, f'o{i}', None, '1')
+            inventory = im.add_sample(sample, (0, i), 'primers1', inventory)
+        inventory = im.remove_sample((0, 1), 'primers1', inventory)
+        inventory = im.update_box('primers1', {'description': 'oligos'}, inventory)
+        inventory = im.update_box('lysis', {'name': 'lysis2'}, inventory)
+        sample = Sample('l1', 'lysate1', Concentration.miniprep, 'pTarg1', Culture.primary, '2')
+        inventory = im.apply_batch([('add_sample', sample, (1, 1), 'lysis2'),
+                                    ('add_box', im.make_empty_box('tmp', '', '', (1,1))),
+                                    ('remove_box', 'tmp')], inventory)
+        return inventory
+
+    def test_recover(self):
+        im, inventory = self.open()
+        # nothing logged yet
+        self.assertEqual(len(inventory.boxes), 0)
+        inventory = self.make_changes(im, inventory)
+
+        # check inventory is rebuilt from the journal alone
+        im2, recovered = self.open()
+        self.assertEqual(recovered, inventory)
+        self.assertEqual(im2.retrieve_box_contents('lysis2', recovered)[1][1].label, 'l1')
+
+        # failed change is not logged
+        with self.assertRaises(ValueError):
+            im2.add_sample(Sample('x', 'x', Concentration.zymo, 'x', None, '1'), (0, 0), 'primers1', recovered)
+        self.assertEqual(self.open()[1], inventory)
+
+    def test_compact(self):
+        im, inventory = self.open()
+        inventory = self.make_changes(im, inventory)
+
+        # compaction saves a snapshot and removes the journal
+        im.compact()
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'inventory.snapshot')))
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith('.tsv')], [])
+        self.assertEqual(sum(os.path.getsize(path) for path in im.journal.segments()), 0)
+        self.assertEqual(self.open()[1], inventory)
+
+        # more changes after compaction
+        inventory = im.remove_sample((0, 0), 'primers1', inventory)
+        inventory = im.remove_box('lysis2', inventory)
+        self.assertEqual(self.open()[1], inventory)
+
+        # compaction stopped after saving the snapshot, before removing the journal
+        # (the journal is replayed on top of the newer snapshot)
+        inventory = im.add_sample(Sample('p9', 'pcr primer9', Concentration.uM10, 'o9', None, '1'),
+                                  (3, 3), 'primers1', inventory)
+        im.save_snapshot(inventory, os.path.join(self.directory, 'inventory.snapshot'))
+        self.assertEqual(self.open()[1], inventory)
+
+    def test_compact_not_recovered(self):
+        im, inventory = self.open()
+        inventory = self.make_changes(im, inventory)
+        im.journal.close()
+
+        # journal opened again w/o recover, its state misses the earlier changes
+        journal = Journal(self.directory, compact_bytes=1)
+        self.addCleanup(journal.close)
+        im2 = InventoryManager(journal=journal)
+        im2.add_box(im2.make_empty_box('other', '', '', (1,1)), Inventory([], {}, {}, {}, {}))
+        with self.assertRaises(ValueError):
+            im2.compact()
+        # not compacted in the background either
+        self.assertIsNone(im2._compaction)
+
+        # check no change was lost
+        journal.close()
+        recovered = self.open()[1]
+        self.assertEqual(recovered.boxes.get('lysis2'), inventory.boxes.get('lysis2'))
+        self.assertIsNotNone(recovered.boxes.get('other'))
+
+        # once recovered it can be compacted
+        im3, recovered = self.open()
+        im3.compact()
+        self.assertEqual(self.open()[1], recovered)
+
+    def test_compact_lossless(self):
+        im, inventory = self.open()
+        inventory = im.add_box(im.make_empty_box('misc', '', '', (2,2)), inventory)
+        # samples a box TSV can't hold
+        inventory = im.add_sample(Sample('', '', None, '', None, ''), (0, 0), 'misc', inventory)
+        inventory = im.add_sample(Sample('a\tb', 'c\nd', Concentration.zymo, 'x', None, '1'), (1, 1), 'misc', inventory)
+
+        # check they are recovered once the journal is gone
+        im.compact()
+        self.assertEqual(sum(os.path.getsize(path) for path in im.journal.segments()), 0)
+        self.assertEqual(self.open()[1], inventory)
+
+    def test_recover_from_tsvs(self):
+        # box TSVs in the directory are the start before the first compaction
+        im = InventoryManager()
+        inventory = self.make_changes(im, Inventory([], {}, {}, {}, {}))
+        im.export_inventory(inventory, self.directory)
+        im, recovered = self.open()
+        self.assertEqual(recovered, inventory)
+
+    def test_background_compaction(self):
+        # compact after every change
+        im, inventory = self.open(compact_bytes=1)
+        inventory = self.make_changes(im, inventory)
+        im._compaction.join()
+        self.assertEqual(self.open()[1], inventory)
+
+        # changes made while a compaction is running don't start another one
+        # (and don't fail after they were logged)
+        started = im.journal.start_compaction()
+        inventory = im.remove_sample((0, 0), 'primers1', inventory)
+        self.assertIsNone(im.journal.try_start_compaction())
+        im.journal.finish_compaction(started[1], False)
+        self.assertEqual(self.open()[1], inventory)
+
+        # many threads changing a big journal at once
+        im, inventory = self.open(compact_bytes=1)
+        inventory = im.add_box(im.make_empty_box('primers2', '', '', (4,8)), inventory)
+        errors = []
+
+        def add_samples(row):
+            try:
+                for col in range(8):
+                    sample = Sample(f'q{row}{col}', 'pcr primer', Concentration.uM10, 'o1', None, '1')
+                    im.add_sample(sample, (row, col), 'primers2', inventory)
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=add_samples, args=(row,)) for row in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        im._compaction.join()
+        self.assertEqual(errors, [])
+
+    def test_torn_write(self):
+        im, inventory = self.open()
+        inventory = self.make_changes(im, inventory)
+        im.journal.close()
+
+        # crash while a frame was being written
+        with open(im.journal.segments()[-1], 'ab') as file:
+            file.write(b'\x01\x02\x03\x04\x05')
+
+        # check partial frame is ignored and new changes are kept
+        im2, recovered = self.open()
+        self.assertEqual(recovered, inventory)
+        recovered = im2.remove_sample((0, 0), 'primers1', recovered)
+        self.assertEqual(self.open()[1], recovered)
+
+    def test_group_commit(self):
+        im, inventory = self.open()
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (8,12)), inventory)
+
+        # many threads logging at once
+        def log_changes(row):
+            for col in range(12):
+                sample = Sample(f'p{row}{col}', 'pcr primer', Concentration.uM10, 'o1', None, '1')
+                im.journal.append([('set_well', 'primers1', (row, col), sample)])
+        threads = [threading.Thread(target=log_changes, args=(row,)) for row in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # check every change was logged
+        recovered = self.open()[1]
+        self.assertEqual(recovered.boxes.get('primers1').get_num_samples(), 96)
+        self.assertEqual(len(recovered.label_to_locations), 96)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from inventory_manager_py import Inventory, Sample, Concentration
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_operations_measured(self):
+        im = InventoryManager(metrics=Metrics())
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (8,12)),
+                               Inventory([], {}, {}, {}, {}))
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        inventory = im.add_sample(sample, (0, 0), 'primers1', inventory)
+        im.find_sample({'construct': 'o1'}, inventory)
+        with self.assertRaises(ValueError):
+            im.remove_sample((1, 1), 'primers1', inventory)
+
+        ops = im.metrics.to_dict()
+        # calls and errors of each operation
+        self.assertEqual(ops['add_box']['calls'], 1)
+        self.assertEqual(ops['remove_sample']['errors'], 1)
+        self.assertNotIn('remove_box', ops)
+        # every call is in the last (+Inf) bucket of the histogram
+        self.assertEqual(ops['add_sample']['buckets'][float('inf')], 1)
+        # work done by each call
+        self.assertEqual(ops['add_box']['counts']['wells_scanned'], 96)
+        # 6 sets of locations and the loc -> conc/clone/culture entries
+        self.assertEqual(ops['add_sample']['counts']['index_entries_written'], 9)
+        self.assertEqual(ops['find_sample']['counts']['locations_checked'], 1)
+
+        # same totals as Prometheus text
+        text = im.metrics.to_prometheus()
+        self.assertIn('inventory_manager_calls_total{operation="add_sample"} 1\n', text)
+        self.assertIn('inventory_manager_errors_total{operation="remove_sample"} 1\n', text)
+        self.assertIn('inventory_manager_duration_seconds_bucket{operation="add_box",le="+Inf"} 1\n', text)
+        self.assertIn('inventory_manager_wells_scanned_total{operation="add_box"} 96\n', text)
+
+        im.metrics.reset()
+        self.assertEqual(im.metrics.to_dict(), {})
+
+    def test_slow_calls(self):
+        im = InventoryManager(metrics=Metrics(slow_threshold=0))
+        # every call is slower than 0 seconds
+        with self.assertLogs('inventory_manager_py.metrics', level='WARNING') as logs:
+            im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (2,2)),
+                       Inventory([], {}, {}, {}, {}))
+        self.assertIn('Slow add_box', logs.output[0])
+        operation, seconds, counts = im.metrics.slow_calls[0]
+        self.assertEqual(operation, 'add_box')
+        self.assertEqual(counts['wells_scanned'], 4)
+
+    def test_disabled(self):
+        # w/o metrics the methods of the class are called as they are
+        im = InventoryManager()
+        self.assertIsNone(im.metrics)
+        self.assertNotIn('add_sample', vars(im))
+
+if __name__ == '__main__':
+    unittest.main()
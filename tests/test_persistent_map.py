@@ -0,0 +1,147 @@
+import unittest
+from inventory_manager_py import PersistentMap, PersistentSet
+
+
+class CollidingKey:
+    '''
+    Key whose hash collides with many other keys
+    '''
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return self.value % 3
+
+    def __eq__(self, other):
+        return isinstance(other, CollidingKey) and other.value == self.value
+
+
+class TestPersistentMap(unittest.TestCase):
+    def test_set_and_delete(self):
+        # build map one key at a time, keeping every version
+        versions = [PersistentMap()]
+        for i in range(200):
+            versions.append(versions[-1].set(str(i), i))
+
+        # check newest version has every key
+        pmap = versions[-1]
+        self.assertEqual(len(pmap), 200)
+        self.assertEqual(pmap['150'], 150)
+        self.assertEqual(pmap, {str(i): i for i in range(200)})
+
+        # check old versions are unchanged
+        for n, version in enumerate(versions):
+            self.assertEqual(len(version), n)
+            self.assertNotIn(str(n), version)
+
+        # delete half the keys
+        smaller = pmap
+        for i in range(0, 200, 2):
+            smaller = smaller.delete(str(i))
+        self.assertEqual(len(smaller), 100)
+        self.assertNotIn('10', smaller)
+        self.assertEqual(smaller['11'], 11)
+        self.assertEqual(len(pmap), 200)
+
+        # deleting a missing key errors
+        with self.assertRaises(KeyError):
+            smaller.delete('10')
+
+    def test_hash_collisions(self):
+        keys = [CollidingKey(i) for i in range(30)]
+        pmap = PersistentMap((key, key.value) for key in keys)
+        self.assertEqual(len(pmap), 30)
+        for key in keys:
+            self.assertEqual(pmap[CollidingKey(key.value)], key.value)
+
+        # remove all keys again
+        for key in keys:
+            pmap = pmap.delete(key)
+        self.assertEqual(len(pmap), 0)
+
+    def test_evolver(self):
+        pmap = PersistentMap({'a': 1, 'b': 2})
+        evolver = pmap.evolver()
+        evolver['c'] = 3
+        del evolver['a']
+        new_map = evolver.persistent()
+
+        # check new map has changes and original does not
+        self.assertEqual(new_map, {'b': 2, 'c': 3})
+        self.assertEqual(pmap, {'a': 1, 'b': 2})
+
+        # later edits do not change the map already made
+        evolver['d'] = 4
+        self.assertNotIn('d', new_map)
+
+    def test_diff(self):
+        pmap = PersistentMap({str(i): i for i in range(1000)})
+        new_map = pmap.set('5', 50).delete('7').set('new', None)
+
+        # check only the changed keys are returned
+        changes = sorted(pmap.diff(new_map, missing='-'), key=lambda change: change[0])
+        self.assertEqual(changes, [('5', 5, 50), ('7', 7, '-'), ('new', '-', None)])
+        self.assertEqual(list(pmap.diff(pmap)), [])
+
+        # maps that share nothing are compared key by key
+        self.assertEqual(sorted(PersistentMap({'a': 1, 'b': 2}).diff(PersistentMap({'b': 2, 'c': 3}))),
+                         [('a', 1, None), ('c', None, 3)])
+        keys = [CollidingKey(i) for i in range(5)]
+        colliding = PersistentMap((key, key.value) for key in keys)
+        changes = list(colliding.diff(colliding.delete(keys[3]).set(keys[1], 10)))
+        self.assertEqual(sorted((key.value, old, new) for key, old, new in changes), [(1, 1, 10), (3, 3, None)])
+
+    def test_changes_on_dict(self):
+        items = {str(i): i for i in range(100)}
+        pmap = PersistentMap(items)
+        # map keeps its own copy of the dict
+        items['0'] = 'changed'
+        self.assertEqual(pmap['0'], 0)
+
+        # set, delete and set again keys of the dict and new keys
+        evolver = pmap.evolver()
+        evolver['1'] = 'one'
+        del evolver['2']
+        del evolver['3']
+        evolver['3'] = 3
+        evolver['new'] = None
+        new_map = evolver.persistent()
+        with self.assertRaises(KeyError):
+            new_map.delete('2')
+        self.assertEqual(len(new_map), 100)
+        self.assertEqual(new_map, {**{str(i): i for i in range(100) if i != 2}, '1': 'one', 'new': None})
+        self.assertCountEqual(new_map.values(), [i for i in range(100) if i not in (1, 2)] + ['one', None])
+        self.assertEqual(len(list(new_map.items())), 100)
+        # setting the value a key already has makes no new map
+        self.assertIs(new_map.set('5', 5), new_map)
+        # check original map is unchanged
+        self.assertEqual(pmap, {str(i): i for i in range(100)})
+
+        # check only the changed keys are returned, in both directions
+        changes = sorted(pmap.diff(new_map, missing='-'), key=lambda change: change[0])
+        self.assertEqual(changes, [('1', 1, 'one'), ('2', 2, '-'), ('new', '-', None)])
+        self.assertEqual(sorted(new_map.diff(pmap, missing='-'), key=lambda change: change[0]),
+                         [('1', 'one', 1), ('2', '-', 2), ('new', None, '-')])
+        # maps made from different dicts are compared key by key
+        self.assertEqual(sorted(PersistentMap(dict(new_map.items())).diff(pmap, missing='-'), key=lambda change: change[0]),
+                         [('1', 'one', 1), ('2', '-', 2), ('new', None, '-')])
+
+        # delete every key
+        for key in list(new_map):
+            new_map = new_map.delete(key)
+        self.assertEqual(len(new_map), 0)
+        self.assertEqual(list(new_map), [])
+
+    def test_persistent_set(self):
+        locs = PersistentSet([1, 2])
+        more_locs = locs.add(3)
+        fewer_locs = more_locs.remove(1)
+
+        self.assertEqual(locs, {1, 2})
+        self.assertEqual(more_locs, {1, 2, 3})
+        self.assertEqual(fewer_locs, {2, 3})
+        # copy gives a mutable set
+        self.assertIsInstance(locs.copy(), set)
+
+if __name__ == '__main__':
+    unittest.main()
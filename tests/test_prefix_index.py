@@ -0,0 +1,83 @@
+import unittest
+from inventory_manager_py import PrefixIndex
+
+
+class TestPrefixIndex(unittest.TestCase):
+    def test_with_prefix(self):
+        index = PrefixIndex(['pTarg1', 'pTarg2', 'pTarget', 'pBad', 'oVT1'])
+
+        # check keys w/ prefix are found in sorted order
+        self.assertEqual(list(index.with_prefix('pTarg')), ['pTarg1', 'pTarg2', 'pTarget'])
+        self.assertEqual(list(index.with_prefix('pTarg1')), ['pTarg1'])
+        self.assertEqual(list(index.with_prefix('x')), [])
+        # empty prefix gives every key
+        self.assertEqual(len(list(index.with_prefix(''))), 5)
+
+    def test_add_and_remove(self):
+        index = PrefixIndex(['pTarg1'])
+        bigger = index.add('pTarg2').add('pTarg')
+        smaller = bigger.remove('pTarg1')
+
+        # check each version has the right keys
+        self.assertEqual(list(index), ['pTarg1'])
+        self.assertEqual(list(bigger), ['pTarg', 'pTarg1', 'pTarg2'])
+        self.assertEqual(list(smaller), ['pTarg', 'pTarg2'])
+        self.assertEqual(len(smaller), 2)
+        self.assertIn('pTarg', smaller)
+        self.assertNotIn('pTar', smaller)
+
+        # removing a missing key errors
+        with self.assertRaises(KeyError):
+            smaller.remove('pTarg1')
+
+    def test_evolver(self):
+        index = PrefixIndex(['a'])
+        evolver = index.evolver()
+        evolver.add('ab')
+        evolver.add('ab')
+        evolver.remove('a')
+        new_index = evolver.persistent()
+
+        # check new index has changes and original does not
+        self.assertEqual(list(new_index), ['ab'])
+        self.assertEqual(len(new_index), 1)
+        self.assertEqual(list(index), ['a'])
+
+    def test_key_and_longer_key(self):
+        # key followed by a longer key w/ the same start, in one evolver
+        index = PrefixIndex(['pTarg1', 'pTarg10', 'pTarg11'])
+        other = PrefixIndex(['oVT1', 'oVT12'])
+
+        # check neither index sees keys of the other
+        self.assertEqual(list(index), ['pTarg1', 'pTarg10', 'pTarg11'])
+        self.assertEqual(list(other), ['oVT1', 'oVT12'])
+        self.assertEqual(list(PrefixIndex()), [])
+
+    def test_changes_on_made_keys(self):
+        index = PrefixIndex(['pTarg1', 'pTarg3', 'oVT1', 5])
+        # remove and add back keys the index was made from, add new keys
+        changed = index.remove('pTarg1').add('pTarg2').add('pTarg').remove('oVT1').add('oVT1')
+        evolver = changed.evolver()
+        evolver.add('pTarg1')
+        evolver.remove('pTarg3')
+        evolver.remove('pTarg2')
+        evolver.add('pTarg4')
+        evolved = evolver.persistent()
+
+        # check each version has the right keys in sorted order
+        self.assertEqual(list(index), ['oVT1', 'pTarg1', 'pTarg3'])
+        self.assertEqual(list(changed.with_prefix('pTarg')), ['pTarg', 'pTarg2', 'pTarg3'])
+        self.assertEqual(list(evolved), ['oVT1', 'pTarg', 'pTarg1', 'pTarg4'])
+        self.assertEqual([len(index), len(changed), len(evolved)], [3, 4, 4])
+        self.assertNotIn('pTarg1', changed)
+        self.assertIn('pTarg1', evolved)
+        self.assertNotIn(5, index)
+
+        # removing a removed key errors
+        with self.assertRaises(KeyError):
+            changed.remove('pTarg1')
+        with self.assertRaises(KeyError):
+            evolved.evolver().remove('pTarg3')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import tempfile
+import threading
+import unittest
+from inventory_manager_py import Inventory, Sample, Concentration
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.journal import Journal
+from inventory_manager_py.shared_inventory import SharedInventory, ConflictError
+
+
+class TestSharedInventory(unittest.TestCase):
+    def make_shared(self, manager=None):
+        im = manager if manager is not None else InventoryManager()
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (8,12)),
+                               Inventory([], {}, {}, {}, {}))
+        return SharedInventory(inventory, im)
+
+    def test_concurrent_writers(self):
+        shared = self.make_shared()
+        first = shared.current
+
+        # many threads adding to the same box at once
+        def add_row(row):
+            for col in range(12):
+                sample = Sample(f'p{row}{col}', 'pcr primer', Concentration.uM10, 'o1', None, '1')
+                shared.add_sample(sample, (row, col), 'primers1')
+        threads = [threading.Thread(target=add_row, args=(row,)) for row in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # check no change was lost
+        self.assertEqual(shared.version, 96)
+        self.assertEqual(shared.current.boxes.get('primers1').get_num_samples(), 96)
+        self.assertEqual(len(shared.find_sample({'construct': 'o1'})), 96)
+        self.assertEqual(shared.retrieve_box_contents('primers1')[7][11].label, 'p711')
+        # readers of the first version still see it unchanged
+        self.assertEqual(first.boxes.get('primers1').get_num_samples(), 0)
+
+    def test_conflict(self):
+        shared = self.make_shared()
+        im = shared.manager
+        sample1 = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        sample2 = Sample('p2', 'pcr primer2', Concentration.uM10, 'o2', None, '1')
+
+        # another writer swaps in a change while this one is made
+        calls = []
+        def change(inventory):
+            calls.append(inventory)
+            if len(calls) == 1:
+                shared.add_sample(sample2, (0, 1), 'primers1')
+            return im.add_sample(sample1, (0, 0), 'primers1', inventory)
+
+        # change is made again on the newer version
+        inventory = shared.update(change)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(shared.conflicts, 1)
+        self.assertEqual(im.find_sample({'construct': 'o2'}, inventory)[0].label, 'p2')
+        self.assertEqual(im.find_sample({'construct': 'o1'}, inventory)[0].label, 'p1')
+
+        # w/o retries the conflict is reported and nothing is swapped in
+        calls.clear()
+        shared.remove_sample((0, 0), 'primers1')
+        shared.remove_sample((0, 1), 'primers1')
+        version = shared.version
+        with self.assertRaises(ConflictError):
+            shared.update(change, max_retries=0)
+        self.assertEqual(shared.version, version + 1)
+        self.assertIsNone(shared.current.boxes.get('primers1').samples[0][0])
+
+        # invalid change is raised as it is
+        with self.assertRaises(ValueError):
+            shared.remove_sample((5, 5), 'primers1')
+
+    def test_reservations(self):
+        shared = self.make_shared()
+        im = shared.manager
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        (boxname, position), = im.reserve_wells(shared.current)
+
+        # change filling the reserved well is thrown away
+        def change(inventory):
+            im.add_sample(sample, position, boxname, inventory)
+            raise ValueError('label printer is out of labels')
+        with self.assertRaises(ValueError):
+            shared.update(change)
+        # check well is still reserved
+        self.assertEqual(im.find_free_wells(shared.current), [('primers1', (0, 1))])
+
+        # change made again after a conflict
+        calls = []
+        def change(inventory):
+            calls.append(inventory)
+            if len(calls) == 1:
+                shared.add_sample(sample, (1, 0), 'primers1')
+            return im.add_sample(sample, position, boxname, inventory)
+        shared.update(change)
+        # check reservation ends once the change is swapped in
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(im._reserved, {})
+
+    def test_journal_and_change_feed(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        journal = Journal(tmpdir.name)
+        self.addCleanup(journal.close)
+        shared = self.make_shared(InventoryManager(journal=journal))
+        events = []
+        shared.manager.subscribe(events.append)
+
+        # several changes made as one, and a change that had to be made again
+        sample = Sample('p1', 'pcr primer1', Concentration.uM10, 'o1', None, '1')
+        def change(inventory):
+            if not events:
+                shared.remove_box('primers1')
+            inventory = shared.manager.add_box(shared.manager.make_empty_box('primers2', '', 'minus20', (2,2)), inventory)
+            return shared.manager.add_sample(sample, (0, 0), 'primers2', inventory)
+        shared.update(change)
+
+        # only swapped in changes are logged and published, in order
+        self.assertEqual([event.operation for event in events], ['remove_box', 'add_box', 'add_sample'])
+        self.assertEqual(events[-1].inventory, shared.current)
+        im = InventoryManager(journal=Journal(tmpdir.name))
+        self.addCleanup(im.journal.close)
+        self.assertEqual(im.recover(), shared.current)
+
+    def test_subscriber_makes_changes(self):
+        shared = self.make_shared()
+        events = []
+
+        # subscriber copying every sample added to row 0 into row 1
+        def copy_to_row1(event):
+            events.append(event)
+            for loc in event.added:
+                if loc.row == 0:
+                    sample = event.inventory.boxes.get(loc.boxname).samples[0][loc.col]
+                    shared.add_sample(sample, (1, loc.col), loc.boxname)
+        shared.manager.subscribe(copy_to_row1)
+
+        # changes made in a thread, so a deadlock fails the test instead of hanging it
+        def add_samples():
+            for col in range(3):
+                shared.add_sample(Sample(f'p{col}', 'pcr primer', Concentration.uM10, 'o1', None, '1'),
+                                  (0, col), 'primers1')
+        thread = threading.Thread(target=add_samples, daemon=True)
+        thread.start()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+
+        # check every change was swapped in and published once, in order
+        self.assertEqual(shared.current.boxes.get('primers1').get_num_samples(), 6)
+        self.assertEqual([(loc.row, loc.col) for event in events for loc in event.added],
+                         [(0, 0), (1, 0), (0, 1), (1, 1), (0, 2), (1, 2)])
+        self.assertIs(events[-1].inventory, shared.current)
+
+if __name__ == '__main__':
+    unittest.main()
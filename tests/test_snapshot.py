@@ -0,0 +1,166 @@
+import os
+import tempfile
+import unittest
+from inventory_manager_py import Inventory, Sample, Concentration, Culture, Location, Prefix, Glob, Regex
+from inventory_manager_py.inventory_manager import InventoryManager
+from inventory_manager_py.snapshot import INDEXED_VERSION, SNAPSHOT_VERSION, read_snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.filepath = os.path.join(tmpdir.name, 'inventory.snapshot')
+
+    def make_inventory(self):
+        im = InventoryManager()
+        # boxes of different sizes, one of them empty
+        inventory = Inventory([], {}, {}, {}, {})
+        inventory = im.add_box(im.make_empty_box('primers1', 'box for primers', 'minus20', (8,12)), inventory)
+        inventory = im.add_box(im.make_empty_box('lysis', '', 'minus80', (2,3)), inventory)
+        inventory = im.add_box(im.make_empty_box('empty', 'nothing here', 'room temp', (1,1)), inventory)
+        # samples using every enum value, None and non-ASCII text
+        for i, conc in enumerate(Concentration):
+            sample = Sample(f'p{i}', f'pcr primer {i}', conc, 'pTarg1', None, str(i))
+            inventory = im.add_sample(sample, (i // 12, i % 12), 'primers1', inventory)
+        for i, culture in enumerate(Culture):
+            sample = Sample(f'l{i}', 'lysate µl', Concentration.miniprep, None, culture, '1')
+            inventory = im.add_sample(sample, (i // 3, i % 3), 'lysis', inventory)
+        sample = Sample('x', None, None, 'pTarg1', None, '0')
+        inventory = im.add_sample(sample, (7, 11), 'primers1', inventory)
+        return inventory
+
+    def test_round_trip(self):
+        im = InventoryManager()
+        inventory = self.make_inventory()
+
+        # save and load
+        self.assertEqual(im.save_snapshot(inventory, self.filepath), self.filepath)
+        loaded = im.load_snapshot(self.filepath)
+
+        # check inventory is exactly the same, boxes and indexes
+        self.assertEqual(loaded, inventory)
+        self.assertEqual(loaded.boxes.get('primers1').samples[7][11], Sample('x', None, None, 'pTarg1', None, '0'))
+        self.assertEqual(len(im.find_sample({'construct': 'pTarg1'}, loaded)), len(Concentration) + 1)
+        # equal strings are loaded as one object
+        samples = [im.retrieve_box_contents('primers1', loaded)[0][i] for i in range(2)]
+        self.assertIs(samples[0].construct, samples[1].construct)
+
+        # empty inventory
+        im.save_snapshot(Inventory([], {}, {}, {}, {}), self.filepath)
+        self.assertEqual(im.load_snapshot(self.filepath), Inventory([], {}, {}, {}, {}))
+
+    def test_layouts(self):
+        im = InventoryManager()
+        inventory = self.make_inventory()
+        indexed_path = os.path.join(os.path.dirname(self.filepath), 'indexed.snapshot')
+        im.save_snapshot(inventory, self.filepath)
+        im.save_snapshot(inventory, indexed_path, search_indexes=True)
+
+        # check version of each layout
+        for filepath, version in [(self.filepath, SNAPSHOT_VERSION), (indexed_path, INDEXED_VERSION)]:
+            with open(filepath, 'rb') as file:
+                data = file.read()
+            self.assertEqual(int.from_bytes(data[8:12], 'little'), version)
+            # same boxes and inventory from both
+            self.assertEqual(read_snapshot(data), sorted(inventory.boxes, key=lambda box: box.name))
+            self.assertEqual(im.load_snapshot(filepath), inventory)
+        # compact one is smaller
+        self.assertLess(os.path.getsize(self.filepath), os.path.getsize(indexed_path))
+
+        # many samples w/ the same and w/ different values
+        box = im.make_empty_box('big', '', 'minus80', (8,12))
+        inventory = im.add_box(box, Inventory([], {}, {}, {}, {}))
+        for i in range(96):
+            sample = Sample(f'b{95 - i}', f'side {i % 7}', Concentration.miniprep, f'pTarg{i % 5}', Culture.primary, None)
+            if i % 5:
+                inventory = im.add_sample(sample, (i // 12, i % 12), 'big', inventory)
+        im.save_snapshot(inventory, self.filepath)
+        loaded = im.load_snapshot(self.filepath)
+        self.assertEqual(loaded, inventory)
+        self.assertEqual(len(im.find_sample({'sidelabel': 'side 3'}, loaded)), 11)
+
+    def test_errors(self):
+        im = InventoryManager()
+        # not a snapshot
+        with self.assertRaises(ValueError):
+            read_snapshot(b'>name\tbox\n')
+
+        for search_indexes in (False, True):
+            im.save_snapshot(self.make_inventory(), self.filepath, search_indexes)
+            with open(self.filepath, 'rb') as file:
+                data = file.read()
+            with self.assertRaises(ValueError):
+                read_snapshot(b'X' + data[1:])
+            # unsupported version
+            version = (SNAPSHOT_VERSION + 1).to_bytes(4, 'little')
+            with self.assertRaises(ValueError):
+                read_snapshot(data[:8] + version + data[12:])
+            # truncated file
+            with self.assertRaises(ValueError):
+                read_snapshot(data[:-1])
+            with self.assertRaises(ValueError):
+                read_snapshot(data[:20])
+            # changed byte
+            with self.assertRaises(ValueError):
+                read_snapshot(data[:-1] + bytes([data[-1] ^ 1]))
+
+        # text that is not a string can't be saved
+        inventory = self.make_inventory()
+        sample = Sample('y', 'side', Concentration.zymo, 'pTarg2', None, 3)
+        inventory = im.add_sample(sample, (1, 2), 'lysis', inventory)
+        with self.assertRaises(ValueError):
+            im.save_snapshot(inventory, self.filepath)
+        # failed save leaves the old snapshot
+        self.assertEqual(os.listdir(os.path.dirname(self.filepath)), ['inventory.snapshot'])
+        self.assertEqual(im.load_snapshot(self.filepath), self.make_inventory())
+
+    def test_snapshot_inventory(self):
+        im = InventoryManager()
+        inventory = self.make_inventory()
+        im.save_snapshot(inventory, self.filepath, search_indexes=True)
+        view = im.open_snapshot(self.filepath, verify=True)
+        self.addCleanup(view.close)
+
+        # check searches give the same locations as the inventory
+        queries = [{}, {'label': 'p1'}, {'label': 'missing'}, {'sidelabel': None},
+                   {'construct': 'pTarg1', 'concentration': Concentration.uM10},
+                   {'culture': Culture.primary}, {'concentration': None}, {'clone': '1'},
+                   {'label': Prefix('l')}, {'label': Glob('p[12]')}, {'construct': Regex('Targ')},
+                   {'label': Prefix(''), 'culture': None, 'clone': '0'},
+                   {'concentration': [Concentration.uM10]}, {'construct': 'pTarg1', 'label': ['p1']}]
+        sort_key = lambda loc: (loc.boxname, loc.row, loc.col)
+        for query in queries:
+            self.assertEqual(im.find_sample(query, view), sorted(im.find_sample(query, inventory), key=sort_key))
+        self.assertEqual(im.find_sample({'label': 'x'}, view), [Location('primers1', 7, 11, 'x', None)])
+
+        # check box contents are the same
+        self.assertEqual(view.box_names(), ['empty', 'lysis', 'primers1'])
+        for box in inventory.boxes:
+            self.assertEqual(im.retrieve_box_contents(box.name, view), box.samples)
+        with self.assertRaises(ValueError):
+            im.retrieve_box_contents('missing', view)
+        # invalid query
+        with self.assertRaises(ValueError):
+            im.find_sample({'concentration': Prefix('u')}, view)
+
+        # inventory can't be changed
+        sample = Sample('y', 'side', Concentration.zymo, 'pTarg2', None, '1')
+        with self.assertRaises(ValueError):
+            im.add_sample(sample, (1, 2), 'lysis', view)
+        with self.assertRaises(ValueError):
+            im.add_box(im.make_empty_box('new', '', '', (1,1)), view)
+
+        # not a snapshot
+        filepath = os.path.join(os.path.dirname(self.filepath), 'box.tsv')
+        with open(filepath, 'wb') as file:
+            file.write(b'>name\tbox\n')
+        with self.assertRaises(ValueError):
+            im.open_snapshot(filepath)
+        # compact snapshot has no search indexes
+        im.save_snapshot(inventory, filepath)
+        with self.assertRaises(ValueError):
+            im.open_snapshot(filepath)
+
+if __name__ == '__main__':
+    unittest.main()